@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark sync REST: urllib sequenziale (una connessione per richiesta) vs asyncio con pool keep-alive.
+Usa il server HTTP locale di fake_http.py con latenza per richiesta e costo di handshake per connessione.
+
+Uso: python3 benchmarks/bench_async_sync.py [--latency 0.05] [--handshake 0.05] [--counts 10,50,200]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gmail import FakeGmailService  # noqa: E402
+from fake_http import FakeGoogleServer  # noqa: E402
+from rocketbook import cache, rest  # noqa: E402
+from rocketbook.aio import sync_rest  # noqa: E402
+from rocketbook.notes import parse_message  # noqa: E402
+
+QUERY = "from:notes@email.getrocketbook.com"
+
+
+def run_urllib(server, n):
+    """Percorso di rocketbook/rest.py: urlopen sequenziale, anche per gli allegati."""
+    token = 'fake-token'
+    params = urllib.parse.urlencode({'q': QUERY, 'maxResults': n})
+    ids = [m['id'] for m in rest._get_json(token, f"{server.gmail_api}/messages?{params}")['messages']]
+    notes = []
+    for msg_id in ids:
+        note = parse_message(rest._get_json(token, f"{server.gmail_api}/messages/{msg_id}"))
+        for att in note['attachments']:
+            data = rest._get_json(token, f"{server.gmail_api}/messages/{msg_id}/attachments/{att['id']}")
+            cache.get_attachment_cache().put_encoded(msg_id, att['filename'], data['data'], att['filename'])
+        notes.append(note)
+    return notes
+
+
+def run_async(server, n, concurrency, upload):
+    notes, _, _ = asyncio.run(sync_rest('fake-token', QUERY, n, upload=upload, concurrency=concurrency,
+                                        client_options=server.client_options()))
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.05, help='secondi per richiesta')
+    parser.add_argument('--handshake', type=float, default=0.05, help='secondi per nuova connessione (TCP+TLS)')
+    parser.add_argument('--counts', default='10,50,200')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--attachment-kb', type=int, default=64)
+    args = parser.parse_args()
+
+    modes = {
+        'urllib': lambda server, n: run_urllib(server, n),
+        'asyncio': lambda server, n: run_async(server, n, args.concurrency, False),
+        'asyncio + Drive': lambda server, n: run_async(server, n, args.concurrency, True),
+    }
+
+    print(f"Latenza {args.latency * 1000:.0f} ms/richiesta, handshake {args.handshake * 1000:.0f} ms, "
+          f"concurrency {args.concurrency}")
+    print(f"{'messaggi':>8}  {'modalità':<16} {'tempo (s)':>10} {'richieste':>10} {'connessioni':>12}")
+    for n in (int(c) for c in args.counts.split(',')):
+        for name, func in modes.items():
+            gmail = FakeGmailService(n_messages=n, latency=0, attachment_size=args.attachment_kb * 1024)
+            with tempfile.TemporaryDirectory() as workdir, \
+                    FakeGoogleServer(gmail, latency=args.latency, handshake=args.handshake) as server:
+                # Cache allegati vuota a ogni giro: tutti gli allegati vengono scaricati
+                cache._default_cache = cache.AttachmentCache(Path(workdir))
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    notes = func(server, n)
+                elapsed = time.perf_counter() - start
+                assert len(notes) == n, (name, len(notes))
+                print(f"{n:>8}  {name:<16} {elapsed:>10.3f} {server.requests:>10} {server.connections:>12}")
+
+
+if __name__ == '__main__':
+    main()
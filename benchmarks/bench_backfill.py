@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark backfill: tutta la casella in memoria (fetch + download in un colpo) vs generatore a blocchi.
+Misura tempo, throughput e picco di memoria (tracemalloc) sul fake Gmail; la quota locale è disattivata
+per misurare solo il client (con la quota reale il limite è ~25 email/s).
+
+Uso: python3 benchmarks/bench_backfill.py [--messages 2000] [--batch-size 100] [--attachment-kb 64]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gmail import FakeGmailService  # noqa: E402
+from rocketbook import cache, gmail, ratelimit  # noqa: E402
+
+
+def run_all_at_once(service, n, workdir):
+    notes = gmail.fetch_rocketbook_emails(service, max_results=n)
+    paths = gmail.download_note_attachments(service, notes, dest_dir=None, verbose=False)
+    return len(notes), len(paths)
+
+
+def run_backfill(service, n, workdir, batch_size):
+    count = files = 0
+    for notes, paths in gmail.backfill(service, batch_size=batch_size, state_file=Path(workdir) / 'state.json'):
+        count += len(notes)
+        files += len(paths)
+    return count, files
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--attachment-kb', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.01, help='secondi per round trip')
+    args = parser.parse_args()
+
+    ratelimit._default_limiter = ratelimit.RateLimiter(rates={})
+    modes = {
+        'tutto in memoria': lambda service, workdir: run_all_at_once(service, args.messages, workdir),
+        'backfill': lambda service, workdir: run_backfill(service, args.messages, workdir, args.batch_size),
+    }
+
+    print(f"{args.messages} email, allegati da {args.attachment_kb} KB, blocchi da {args.batch_size}\n")
+    print(f"{'modalità':<18} {'tempo (s)':>10} {'email/s':>9} {'MB/s':>7} {'picco MB':>9}")
+    for name, func in modes.items():
+        service = FakeGmailService(n_messages=args.messages, latency=args.latency,
+                                   attachment_size=args.attachment_kb * 1024)
+        with tempfile.TemporaryDirectory() as workdir:
+            cache._default_cache = cache.AttachmentCache(Path(workdir) / 'cache', max_bytes=1 << 40)
+            elapsed, peak, (count, files) = measure(func, service, workdir)
+            assert count == files == args.messages, (name, count, files)
+            mb = args.messages * args.attachment_kb / 1024
+            print(f"{name:<18} {elapsed:>10.2f} {count / elapsed:>9.0f} {mb / elapsed:>7.1f} "
+                  f"{peak / (1024 * 1024):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
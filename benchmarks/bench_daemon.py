@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark daemon: freschezza (arrivo email → nota nello storico) e quota Gmail consumata.
+La casella finta riceve raffiche di scansioni separate da pause; il daemon gira in un thread:
+- polling fisso ogni --poll-min secondi
+- polling adattivo tra --poll-min e --poll-max
+- webhook: ogni email nuova arriva anche come notifica Pub/Sub POST al webhook locale
+Per confronto, il cron giornaliero ha un'attesa media di 12 ore (massima 24).
+
+Uso: python3 benchmarks/bench_daemon.py [--bursts 3] [--burst-size 3] [--gap 5] [--poll-min 0.1] [--poll-max 1.6]
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix='bench_daemon_'))
+SITE = WORKDIR / 'site'
+# Prima di importare rocketbook: checkout, cache e storico nella directory temporanea, quote locali spente
+os.environ.update(ROCKETBOOK_DASHBOARD_DIR=str(SITE), XDG_CACHE_HOME=str(WORKDIR / 'cache'),
+                  XDG_DATA_HOME=str(WORKDIR / 'data'), ROCKETBOOK_GMAIL_QUOTA='0')
+
+from fake_gmail import FakeGmailService  # noqa: E402
+from rocketbook.config import SYNC_STATE_FILE  # noqa: E402
+from rocketbook.daemon import SyncDaemon  # noqa: E402
+from rocketbook.metrics import get_metrics  # noqa: E402
+from rocketbook.ratelimit import QUOTA_UNITS  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def post_notification(address, history_id):
+    """Consegna come la subscription push di Pub/Sub."""
+    data = base64.b64encode(json.dumps({'emailAddress': 'me', 'historyId': history_id}).encode()).decode()
+    body = json.dumps({'message': {'data': data, 'messageId': str(history_id)}}).encode()
+    request = urllib.request.Request(f"http://{address[0]}:{address[1]}/", data=body, method='POST')
+    urllib.request.urlopen(request, timeout=5).close()
+
+
+def quota_units(before, after):
+    return sum((after.get(m, 0) - before.get(m, 0)) * QUOTA_UNITS.get(m, 1) for m in after)
+
+
+def run_mode(name, args):
+    SYNC_STATE_FILE.unlink(missing_ok=True)
+    service = FakeGmailService(n_messages=5, latency=args.latency, attachment_size=4096)
+    webhook = name == 'webhook'
+    min_interval = args.poll_min
+    max_interval = args.poll_min if name == 'polling fisso' else args.poll_max
+    daemon = SyncDaemon(service, min_interval=min_interval, max_interval=max_interval, topic=None,
+                        webhook_port=free_port() if webhook else 0, publish=lambda: None)
+
+    synced = {}
+    sync = daemon.sync
+
+    def timed_sync():
+        new_notes = sync()
+        now = time.perf_counter()
+        for note in new_notes:
+            synced.setdefault(note['id'], now)
+        return new_notes
+    daemon.sync = timed_sync
+
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    while not daemon.checkpoint:
+        time.sleep(0.01)
+
+    calls_before = dict(get_metrics().snapshot()['api_calls'])
+    arrivals = {}
+    for _ in range(args.bursts):
+        time.sleep(args.gap)
+        for _ in range(args.burst_size):
+            message = service.add_message()
+            arrivals[message['id']] = time.perf_counter()
+            if webhook:
+                post_notification(daemon.webhook_address, service.history_id)
+            time.sleep(0.2)
+    deadline = time.perf_counter() + args.poll_max * 2 + 2
+    while len(synced.keys() & arrivals.keys()) < len(arrivals) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    daemon.stop()
+    thread.join()
+
+    calls = get_metrics().snapshot()['api_calls']
+    delays = sorted(synced[msg_id] - t for msg_id, t in arrivals.items() if msg_id in synced)
+    return {
+        'delivered': len(delays),
+        'mean': sum(delays) / len(delays) if delays else float('nan'),
+        'max': delays[-1] if delays else float('nan'),
+        'checks': daemon.cycles['idle'] + daemon.cycles['sync'],
+        'units': quota_units(calls_before, calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bursts', type=int, default=3)
+    parser.add_argument('--burst-size', type=int, default=3)
+    parser.add_argument('--gap', type=float, default=5.0, help='secondi di quiete prima di ogni raffica')
+    parser.add_argument('--poll-min', type=float, default=0.1)
+    parser.add_argument('--poll-max', type=float, default=1.6)
+    parser.add_argument('--latency', type=float, default=0.005, help='secondi per round trip')
+    args = parser.parse_args()
+
+    SITE.mkdir(parents=True)
+    shutil.copy(ROOT / 'index.html', SITE / 'index.html')
+    total = args.bursts * args.burst_size
+    print(f"{total} email in {args.bursts} raffiche, pause di {args.gap:g}s, "
+          f"polling {args.poll_min:g}-{args.poll_max:g}s\n")
+    print(f"{'modalità':<18} {'arrivate':>9} {'attesa media (s)':>17} {'max (s)':>8} {'controlli':>10} {'unità quota':>12}")
+    try:
+        for name in ('polling fisso', 'polling adattivo', 'webhook'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_mode(name, args)
+            print(f"{name:<18} {result['delivered']:>5}/{total:<3} {result['mean']:>17.2f} {result['max']:>8.2f} "
+                  f"{result['checks']:>10} {result['units']:>12}")
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
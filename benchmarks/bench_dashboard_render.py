@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark aggiornamento index.html: tre re.sub sull'intero documento
+(percorso originale) vs DashboardTemplate (analisi una volta, render in un join).
+Il documento reale viene ingrandito con contenuto di riempimento prima del footer.
+Verifica anche che una scrittura fallita non alteri il template in cache.
+
+Uso: python3 benchmarks/bench_dashboard_render.py [--sizes 120,1000,5000] [--runs 50]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rocketbook import dashboard  # noqa: E402
+from rocketbook.dashboard import DashboardTemplate  # noqa: E402
+
+NOTES_HTML = '''            <div class="rocketbook-grid">
+            <a href="#" target="_blank" class="rocketbook-item">
+                <div class="rocketbook-thumb">📝</div>
+                <div class="rocketbook-info">
+                    <div class="rocketbook-title">Benchmark</div>
+                    <div class="rocketbook-date">18 Feb 2026</div>
+                </div>
+            </a>
+            </div>'''
+NOW = '18/02/2026 09:00'
+
+
+def legacy_update(content, html, count):
+    """Percorso originale di rocketbook_gmail.update_dashboard (prima del pacchetto)."""
+    pattern = r'(<div id="rocketbook-container">)(.*?)(</div>\s*</div>\s*</div>\s*<footer>)'
+    content = re.sub(pattern, f'\\1\n{html}\n\\3', content, flags=re.DOTALL)
+    content = re.sub(
+        r'(<div class="kpi-value" id="rocketbook-count">)\d+(</div>)',
+        f'\\g<1>{count}\\g<2>',
+        content
+    )
+    return re.sub(r'(<span id="last-updated">).*?(</span>)', f'\\g<1>{NOW}\\g<2>', content)
+
+
+def make_document(size_kb):
+    base = (ROOT / 'index.html').read_text(encoding='utf-8')
+    filler = '<div class="news-item"><span>riempimento</span></div>\n'
+    missing = max(0, size_kb * 1024 - len(base.encode('utf-8')))
+    head, sep, tail = base.partition('<!-- Rocketbook Notes -->')
+    return head + filler * (missing // len(filler)) + sep + tail
+
+
+def timed(func, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def check_failed_write():
+    """Regressione: se la scrittura di index.html fallisce, il template in cache descrive ancora il file."""
+    with tempfile.TemporaryDirectory() as workdir:
+        index_file = Path(workdir) / 'index.html'
+        shutil.copy(ROOT / 'index.html', index_file)
+        before = dashboard.get_template(index_file).value('updated')
+
+        def fail(src, dst):
+            raise OSError('disco pieno')
+        replace, os.replace = os.replace, fail
+        try:
+            dashboard.render_dashboard(index_file, NOTES_HTML, 99, NOW)
+        except OSError:
+            pass
+        finally:
+            os.replace = replace
+        assert dashboard.get_template(index_file).value('updated') == before, 'template modificato senza scrittura'
+        dashboard.render_dashboard(index_file, NOTES_HTML, 99, NOW)
+        assert dashboard.get_template(index_file).value('updated') == NOW
+        assert DashboardTemplate(index_file.read_text(encoding='utf-8')).value('updated') == NOW
+    print("✅ Scrittura fallita: template in cache invariato\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='120,1000,5000', help='dimensioni documento in KB')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    check_failed_write()
+    print(f"{'KB':>6} {'re.sub x3 (ms)':>15} {'analisi (ms)':>13} {'render (ms)':>12}")
+    for size_kb in (int(s) for s in args.sizes.split(',')):
+        content = make_document(size_kb)
+        template = DashboardTemplate(content)
+        assert template.render(rocketbook=f'\n{NOTES_HTML}\n', count=3, updated=NOW) == \
+            legacy_update(content, NOTES_HTML, 3)
+
+        legacy_ms = timed(lambda: legacy_update(content, NOTES_HTML, 3), args.runs)
+        parse_ms = timed(lambda: DashboardTemplate(content), args.runs)
+        render_ms = timed(lambda: template.render(rocketbook=f'\n{NOTES_HTML}\n', count=3, updated=NOW), args.runs)
+        print(f"{len(content) // 1024:>6} {legacy_ms:>15.3f} {parse_ms:>13.3f} {render_ms:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark memoria del download allegati: decodifica completa in RAM (percorso
+originale) vs decodifica a blocchi su disco (AttachmentCache.put_encoded).
+Ogni misura gira in un processo separato; riporta il picco RSS e il picco
+tracemalloc oltre alla stringa base64 già ricevuta dalla API.
+
+Uso: python3 benchmarks/bench_decode_memory.py [--sizes 1,10,50]
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def peak_rss_mb():
+    # ru_maxrss è in KB su Linux, in byte su macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_child(mode, size_mb):
+    """Eseguito nel processo figlio: misura un solo percorso."""
+    from fake_gmail import make_pdf_bytes
+    from rocketbook.cache import AttachmentCache
+
+    # Stringa base64 costruita a blocchi: il baseline RSS non include il PDF decodificato
+    block = make_pdf_bytes(3 * 64 * 1024)
+    encoded = base64.urlsafe_b64encode(block).decode('ascii') * (size_mb * 1024 * 1024 // len(block))
+    workdir = Path(tempfile.mkdtemp())
+    baseline = peak_rss_mb()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'in-memory':
+        data = base64.urlsafe_b64decode(encoded)
+        with open(workdir / 'scan.pdf', 'wb') as f:
+            f.write(data)
+        del data
+    else:
+        AttachmentCache(workdir / 'cache').put_encoded('msg', 'scan.pdf', encoded)
+    elapsed = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({
+        'rss_delta_mb': peak_rss_mb() - baseline,
+        'traced_peak_mb': traced_peak / (1024 * 1024),
+        'seconds': elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1,10,50', help='dimensioni PDF in MB')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'SIZE_MB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'PDF (MB)':>8}  {'modalità':<10} {'picco RSS +MB':>13} {'tracemalloc MB':>14} {'tempo (s)':>9}")
+    for size_mb in (int(s) for s in args.sizes.split(',')):
+        for mode in ('in-memory', 'streaming'):
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', mode, str(size_mb)],
+                capture_output=True, text=True, check=True, env={**os.environ, 'PYTHONHASHSEED': '0'}
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{size_mb:>8}  {mode:<10} {r['rss_delta_mb']:>13.1f} {r['traced_peak_mb']:>14.1f} {r['seconds']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark upload Drive: chiamate API e tempo per file.
+"prima": il percorso originale di rocketbook_drive_upload.upload_to_drive_via_zapier
+(copiato sotto, con build e MediaFileUpload del fake): per ogni file build del servizio,
+ricerca della cartella, query di esistenza, upload, condivisione e files.get del link;
+"dopo": un solo DriveClient per il run, con ID cartella e indice dei file in cache.
+
+Uso: python3 benchmarks/bench_drive_client.py [--files 50] [--latency 0.02]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_drive import FakeDriveService, fake_build  # noqa: E402
+from fake_gmail import make_pdf_bytes  # noqa: E402
+from rocketbook import drive  # noqa: E402
+from rocketbook.pipeline import ApiStats, InstrumentedService  # noqa: E402
+
+
+def make_files(workdir, count):
+    paths = []
+    for i in range(count):
+        path = Path(workdir) / f"RB scan {i:04d}.pdf"
+        path.write_bytes(make_pdf_bytes(4096, seed=i))
+        paths.append(path)
+    return paths
+
+
+# Percorso originale (rocketbook_drive_upload.py prima di DriveClient), stesse chiamate API.
+# Uniche differenze: `build` al posto di googleapiclient.discovery.build con le credenziali,
+# il path del file al posto di MediaFileUpload, nessun traceback in caso di errore.
+
+def legacy_upload_to_drive_via_zapier(build, filepath, filename, folder_name="Rocketbook Scans"):
+    uploaded = legacy_upload_file_to_drive(build, filepath, filename, folder_name)
+    if not uploaded:
+        return None
+
+    service, file_id = uploaded
+    return legacy_share_drive_file(service, file_id)
+
+
+def legacy_upload_file_to_drive(build, filepath, filename, folder_name="Rocketbook Scans"):
+    print(f"📤 Upload su Google Drive: {filename}")
+    try:
+        service = build()
+
+        # Cerca o crea la cartella
+        folder_id = legacy_get_or_create_folder(service, folder_name)
+        if not folder_id:
+            print(f"❌ Impossibile trovare/creare cartella: {folder_name}")
+            return None
+
+        # Verifica se il file esiste già
+        existing_file = legacy_find_file_in_folder(service, filename, folder_id)
+        if existing_file:
+            print(f"ℹ️ File già esistente: {filename}")
+            file_id = existing_file['id']
+        else:
+            file_metadata = {
+                'name': filename,
+                'parents': [folder_id]
+            }
+            file = service.files().create(
+                body=file_metadata,
+                media_body=filepath,
+                fields='id, name, webViewLink'
+            ).execute()
+            file_id = file.get('id')
+            print(f"✅ Upload completato: {file.get('name')} (ID: {file_id})")
+
+        return service, file_id
+
+    except Exception as e:
+        print(f"❌ Errore upload Drive: {e}")
+        return None
+
+
+def legacy_share_drive_file(service, file_id):
+    try:
+        legacy_make_file_shareable(service, file_id)
+        file_info = service.files().get(
+            fileId=file_id,
+            fields='webViewLink, webContentLink'
+        ).execute()
+        share_link = file_info.get('webViewLink')
+        print(f"🔗 Link condivisibile: {share_link}")
+        return share_link
+
+    except Exception as e:
+        print(f"❌ Errore condivisione Drive: {e}")
+        return None
+
+
+def legacy_get_or_create_folder(service, folder_name):
+    try:
+        query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
+        results = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+        items = results.get('files', [])
+        if items:
+            return items[0]['id']
+
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': 'application/vnd.google-apps.folder'
+        }
+        folder = service.files().create(body=file_metadata, fields='id').execute()
+        print(f"📁 Creata cartella: {folder_name}")
+        return folder.get('id')
+
+    except Exception as e:
+        print(f"❌ Errore gestione cartella: {e}")
+        return None
+
+
+def legacy_find_file_in_folder(service, filename, folder_id):
+    try:
+        query = f"name='{filename}' and '{folder_id}' in parents and trashed=false"
+        results = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+        items = results.get('files', [])
+        return items[0] if items else None
+    except Exception as e:
+        print(f"⚠️ Errore ricerca file: {e}")
+        return None
+
+
+def legacy_make_file_shareable(service, file_id):
+    try:
+        permission = {
+            'type': 'anyone',
+            'role': 'reader'
+        }
+        service.permissions().create(
+            fileId=file_id,
+            body=permission
+        ).execute()
+        print("🔓 File reso condivisibile")
+        return True
+    except Exception as e:
+        print(f"⚠️ Errore condivisione file: {e}")
+        return False
+
+
+def run_legacy(paths, latency, discovery_latency):
+    """Percorso originale: ogni file costruisce il suo servizio e rifà tutte le ricerche."""
+    backend = FakeDriveService(latency=latency)
+    build_backend = fake_build(backend, discovery_latency)
+    stats = ApiStats()
+
+    def build():
+        start = time.perf_counter()
+        service = build_backend()
+        stats.record('discovery.build', time.perf_counter() - start)
+        return InstrumentedService(service, stats, api='drive')
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            assert legacy_upload_to_drive_via_zapier(build, str(path), path.name)
+    return time.perf_counter() - start, stats
+
+
+def run(paths, latency, discovery_latency, state_dir):
+    """Un solo DriveClient per il run."""
+    backend = FakeDriveService(latency=latency)
+    build = fake_build(backend, discovery_latency)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = drive.DriveClient(
+            build_service=build,
+            folder_cache_file=state_dir / 'drive_folders.json',
+            index_file=state_dir / 'drive_index.json',
+        )
+        for path in paths:
+            file = client.upload(str(path), path.name)
+            assert client.share(file)
+    return time.perf_counter() - start, client.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='secondi per round trip')
+    parser.add_argument('--discovery-latency', type=float, default=0.2, help='secondi per build()')
+    args = parser.parse_args()
+
+    # Nel benchmark l'upload resumable è sostituito dal path del file
+    drive.make_media_upload = lambda filepath: filepath
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = make_files(workdir, args.files)
+        runs = {
+            'prima': lambda: run_legacy(paths, args.latency, args.discovery_latency),
+            'dopo': lambda: run(paths, args.latency, args.discovery_latency, Path(workdir)),
+        }
+        for label, run_uploads in runs.items():
+            elapsed, stats = run_uploads()
+            print(f"[{label}] {elapsed:.2f}s totali, {elapsed / args.files * 1000:.0f} ms/file")
+            print(stats.summary('Drive API', files=args.files))
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark end to end degli script: rocketbook_gmail.main, rocketbook_drive_upload.main, rocketbook_sync.main.
+Ogni esecuzione gira in un processo separato con checkout, cache e storico temporanei, una
+repository bare locale come origin (commit e push reali) e una casella finta di N email:
+- Gmail e Drive via googleapiclient: fake_gmail / fake_drive nel processo, `--latency` per round trip
+- rocketbook_sync.py (REST): server HTTP locale di fake_http.py con la stessa latenza
+
+Con `--recording messaggi.json` (risposte messages.get registrate) la casella usa quei messaggi.
+Quote locali disattivate salvo `--quota`: si misura il client, non il limite di Google.
+Riporta tempo, email/s e i percentili per stadio raccolti da rocketbook.metrics.
+
+Uso: python3 benchmarks/bench_e2e.py [--sizes 10,1000] [--entries gmail,backfill,drive_upload,sync]
+     [--latency 0.005] [--attachment-kb 16] [--recording messaggi.json] [--quota]
+     (100k email: --sizes 100000 --attachment-kb 1, qualche minuto per script)
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+RESULT_PREFIX = 'BENCH_RESULT '
+
+# Script e argomenti per ogni scenario (N = dimensione della casella)
+ENTRIES = {
+    'gmail': ('rocketbook_gmail', lambda n: ['--full']),
+    'backfill': ('rocketbook_gmail', lambda n: ['--backfill']),
+    'drive_upload': ('rocketbook_drive_upload', lambda n: ['--max-results', str(n)]),
+    'sync': ('rocketbook_sync', lambda n: ['--upload']),
+}
+
+
+def git(*args, cwd):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+
+def setup_checkout(workdir):
+    """Origin bare + checkout della dashboard con l'index.html reale."""
+    origin, site = workdir / 'origin.git', workdir / 'site'
+    git('init', '-q', '--bare', '-b', 'main', str(origin), cwd=workdir)
+    git('clone', '-q', str(origin), str(site), cwd=workdir)
+    git('checkout', '-q', '-b', 'main', cwd=site)
+    shutil.copy(ROOT / 'index.html', site / 'index.html')
+    git('add', '-A', cwd=site)
+    git('-c', 'user.email=bench@local', '-c', 'user.name=bench', 'commit', '-q', '-m', 'init', cwd=site)
+    git('push', '-q', 'origin', 'main', cwd=site)
+    return site
+
+
+def run_worker(args):
+    """Un'esecuzione nel processo corrente; stampa il risultato come JSON."""
+    workdir = Path(args.workdir)
+    site = setup_checkout(workdir)
+    # Configurazione via ambiente, prima di importare rocketbook
+    os.environ.update(
+        ROCKETBOOK_DASHBOARD_DIR=str(site),
+        XDG_CACHE_HOME=str(workdir / 'cache'),
+        XDG_DATA_HOME=str(workdir / 'data'),
+        ROCKETBOOK_MAX_RESULTS=str(args.size),
+        GITHUB_TOKEN='bench',
+    )
+    if not args.quota:
+        os.environ.update(ROCKETBOOK_GMAIL_QUOTA='0', ROCKETBOOK_DRIVE_QUOTA='0')
+
+    from fake_drive import FakeDriveService
+    from fake_gmail import FakeGmailService
+    from fake_http import FakeGoogleServer
+    from rocketbook import drive, metrics
+    from rocketbook.aio import sync_rest
+
+    def mailbox(latency):
+        if args.recording:
+            return FakeGmailService.from_recording(args.recording, args.size, latency=latency,
+                                                   attachment_size=args.attachment_kb * 1024)
+        return FakeGmailService(n_messages=args.size, latency=latency,
+                                attachment_size=args.attachment_kb * 1024)
+
+    module_name, make_argv = ENTRIES[args.worker]
+    module = __import__(module_name)
+    server = contextlib.nullcontext()
+    if args.worker == 'sync':
+        server = FakeGoogleServer(mailbox(0), FakeDriveService(latency=0), latency=args.latency)
+    else:
+        gmail_service = mailbox(args.latency)
+        module.get_gmail_service = lambda: gmail_service
+        drive.make_media_upload = lambda filepath: filepath
+        drive_service = FakeDriveService(latency=args.latency)
+        drive._drive_clients[drive.DRIVE_FOLDER_NAME] = drive.DriveClient(build_service=lambda: drive_service)
+
+    with server:
+        if args.worker == 'sync':
+            module.get_gcloud_access_token = lambda: 'fake-token'
+            module.sync_rest = functools.partial(sync_rest, client_options=server.client_options())
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.main(make_argv(args.size))
+        elapsed = time.perf_counter() - start
+
+    snapshot = metrics.get_metrics().snapshot()
+    print(RESULT_PREFIX + json.dumps({'elapsed': elapsed, **snapshot}))
+
+
+def run_entry(entry, size, args):
+    """Lancia il worker in un processo nuovo (stato di modulo e cache puliti)."""
+    with tempfile.TemporaryDirectory(prefix='bench_e2e_') as workdir:
+        command = [sys.executable, __file__, '--worker', entry, '--size', str(size), '--workdir', workdir,
+                   '--latency', str(args.latency), '--attachment-kb', str(args.attachment_kb)]
+        if args.recording:
+            command += ['--recording', str(Path(args.recording).resolve())]
+        if args.quota:
+            command.append('--quota')
+        result = subprocess.run(command, capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"{entry} ({size}) fallito:\n{result.stderr[-2000:]}")
+
+
+def stage_ms(result, stage):
+    s = result['stages'].get(stage)
+    if not s or not s['count']:
+        return f"{'-':>15}"
+    return f"{s['p50'] * 1000:>7.1f}/{s['p95'] * 1000:<7.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='10,1000', help='email nella casella (es. 10,1000,100000)')
+    parser.add_argument('--entries', default=','.join(ENTRIES))
+    parser.add_argument('--latency', type=float, default=0.005, help='secondi per round trip')
+    parser.add_argument('--attachment-kb', type=int, default=16)
+    parser.add_argument('--recording', help='JSON con risposte messages.get registrate')
+    parser.add_argument('--quota', action='store_true', help='applica le quote Gmail/Drive locali')
+    parser.add_argument('--worker', choices=ENTRIES, help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f"Latenza {args.latency * 1000:.0f} ms/round trip, allegati da {args.attachment_kb} KB, "
+          f"quote {'attive' if args.quota else 'disattivate'}\n")
+    print(f"{'script':<13} {'email':>7} {'tempo (s)':>10} {'email/s':>8} {'chiamate':>9} "
+          f"{'get p50/p95 ms':>15} {'download ms':>15} {'upload ms':>15} {'push (s)':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for entry in args.entries.split(','):
+            result = run_entry(entry, size, args)
+            push = result['stages'].get('push', {}).get('seconds', 0.0)
+            print(f"{entry:<13} {size:>7} {result['elapsed']:>10.2f} {size / result['elapsed']:>8.1f} "
+                  f"{sum(result['api_calls'].values()):>9} {stage_ms(result, 'get')} "
+                  f"{stage_ms(result, 'download')} {stage_ms(result, 'upload')} {push:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
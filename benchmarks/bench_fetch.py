@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark fetch messaggi Gmail: sequenziale vs batch vs thread pool.
+Usa il fake Gmail locale; mostra tempo totale e round trip per numero di messaggi.
+
+Uso: python3 benchmarks/bench_fetch.py [--latency 0.05] [--counts 1,10,50,100]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rocketbook import gmail, ratelimit  # noqa: E402
+from fake_gmail import FakeGmailService  # noqa: E402
+
+
+def run_sequential(service, n):
+    """Percorso originale: un messages().get per messaggio."""
+    query = "from:notes@email.getrocketbook.com"
+    ids = gmail.list_message_ids(service, query, n)
+    return [gmail.get_message(service, msg_id) for msg_id in ids]
+
+
+def run_batch(service, n):
+    return gmail.fetch_rocketbook_emails(service, max_results=n)
+
+
+MODES = {
+    'sequenziale': (run_sequential, {}),
+    'batch': (run_batch, {}),
+    'thread pool': (run_batch, {'batch': False}),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.05, help='secondi per round trip')
+    parser.add_argument('--counts', default='1,10,50,100,200')
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.counts.split(',')]
+    # Solo round trip: senza quota locale (con 250 unità/s Gmail il limite sarebbe 50 email/s)
+    ratelimit._default_limiter = ratelimit.RateLimiter(rates={})
+
+    print(f"Latenza simulata: {args.latency * 1000:.0f} ms/round trip")
+    print(f"{'messaggi':>8}  {'modalità':<12} {'tempo (s)':>10} {'round trip':>10}")
+    for n in counts:
+        for name, (func, options) in MODES.items():
+            service = FakeGmailService(n_messages=n, latency=args.latency, **options)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                notes = func(service, n)
+            elapsed = time.perf_counter() - start
+            assert len(notes) == n, (name, len(notes))
+            print(f"{n:>8}  {name:<12} {elapsed:>10.3f} {service.round_trips:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark estrazione testo dai PDF: un processo vs pool di processi vs cache per contenuto.
+Genera PDF sintetici con testo incorporato (FlateDecode) e uno stream immagine per pagina.
+
+Uso: python3 benchmarks/bench_pdf_text.py [--pdfs 64] [--pages 8] [--workers N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gmail import make_text_pdf  # noqa: E402
+from rocketbook.pdftext import PdfTextCache, extract_texts  # noqa: E402
+
+
+def run(paths, workers, cache):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = extract_texts(paths, workers=workers, cache=cache)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pdfs', type=int, default=64)
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--words', type=int, default=300, help='parole per pagina')
+    parser.add_argument('--image-kb', type=int, default=200, help='KB di immagine per pagina')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for i in range(args.pdfs):
+            path = Path(workdir) / f"scan {i:04d}.pdf"
+            path.write_bytes(make_text_pdf(args.pages, args.words, seed=i, image_bytes=args.image_kb * 1024))
+            paths.append(path)
+        size_mb = sum(p.stat().st_size for p in paths) / (1024 * 1024)
+        print(f"{args.pdfs} PDF da {args.pages} pagine ({size_mb:.0f} MB), {args.workers} processi\n")
+
+        sequential_s, expected = run(paths, 1, PdfTextCache(Path(workdir) / 'seq.json'))
+        pool_cache = PdfTextCache(Path(workdir) / 'pool.json')
+        pool_s, results = run(paths, args.workers, pool_cache)
+        cached_s, cached = run(paths, args.workers, pool_cache)
+        assert results == expected == cached
+        assert all(r['pages'] == args.pages and r['text'] for r in results.values())
+
+        print(f"{'modalità':<14} {'tempo (s)':>10} {'PDF/s':>8}")
+        for label, elapsed in (('un processo', sequential_s), ('pool', pool_s), ('cache', cached_s)):
+            print(f"{label:<14} {elapsed:>10.3f} {args.pdfs / elapsed:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
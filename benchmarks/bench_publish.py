@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark pubblicazione: `add` + push immediato (un commit e un push per nota) vs coda con debounce.
+Usa un repository bare locale come origin e una checkout con l'index.html reale;
+misura add al secondo, tempo fino al push dell'ultima nota, commit e push arrivati all'origin.
+Poi confronta il costo di un commit con `git add -A` (percorso originale) e con i comandi
+plumbing di rocketbook.publish sui soli file scritti, al crescere dei file nella checkout.
+
+Uso: python3 benchmarks/bench_publish.py [--adds 30] [--debounce 0.5] [--checkout-files 0,2000,10000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix='bench_publish_'))
+SITE = WORKDIR / 'site'
+# Prima di importare rocketbook: checkout, cache e storico nella directory temporanea
+os.environ.update(ROCKETBOOK_DASHBOARD_DIR=str(SITE), XDG_CACHE_HOME=str(WORKDIR / 'cache'),
+                  XDG_DATA_HOME=str(WORKDIR / 'data'), GITHUB_TOKEN='bench')
+
+import rocketbook_cli  # noqa: E402
+from rocketbook import publish  # noqa: E402
+
+
+def git(*args, cwd=SITE):
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def setup_repos():
+    origin = WORKDIR / 'origin.git'
+    git('init', '-q', '--bare', '-b', 'main', str(origin), cwd=WORKDIR)
+    git('config', 'core.logAllRefUpdates', 'always', cwd=origin)
+    git('clone', '-q', str(origin), str(SITE), cwd=WORKDIR)
+    git('checkout', '-q', '-b', 'main')
+    shutil.copy(ROOT / 'index.html', SITE / 'index.html')
+    git('add', '-A')
+    git(*publish.BOT_IDENTITY, 'commit', '-q', '-m', 'init')
+    git('push', '-q', 'origin', 'main')
+    return origin
+
+
+def pushes(origin):
+    """Aggiornamenti di main ricevuti dall'origin (reflog del repository bare)."""
+    return len(git('reflog', 'show', '--format=%H', 'main', cwd=origin).splitlines())
+
+
+def legacy_commit(site):
+    """Percorso originale di push_to_github: stage di tutta la checkout e commit."""
+    git('add', '-A', cwd=site)
+    if subprocess.run(['git', 'diff', '--cached', '--quiet'], cwd=site).returncode:
+        git(*publish.BOT_IDENTITY, 'commit', '-q', '-m', 'legacy', cwd=site)
+
+
+def plumbing_commit(site, paths=('index.html',)):
+    """Commit di rocketbook.publish con l'elenco dei file scritti dall'esecuzione."""
+    def run(*args, **kwargs):
+        return subprocess.run(['git', *args], cwd=site, capture_output=True, text=True, **kwargs)
+    publish._commit_changes(run, site, list(paths), 'plumbing')
+
+
+def bench_checkout_size(n_files, rounds):
+    """Checkout con `n_files` PDF da 64 KB già pubblicati; tempo medio per commit di index.html."""
+    site = WORKDIR / f'checkout_{n_files}'
+    (site / 'rocketbook_pdfs').mkdir(parents=True)
+    git('init', '-q', '-b', 'main', cwd=site)
+    shutil.copy(ROOT / 'index.html', site / 'index.html')
+    payload = os.urandom(64 * 1024)
+    for i in range(n_files):
+        (site / 'rocketbook_pdfs' / f'scan_{i}.pdf').write_bytes(payload + i.to_bytes(4, 'big'))
+    legacy_commit(site)
+
+    times = {'git add -A': 0.0, 'plumbing': 0.0}
+    for i in range(rounds):
+        for name, commit in (('git add -A', legacy_commit), ('plumbing', plumbing_commit)):
+            with open(site / 'index.html', 'a', encoding='utf-8') as f:
+                f.write(f'<!-- {name} {i} -->\n')
+            start = time.perf_counter()
+            commit(site)
+            times[name] += time.perf_counter() - start
+    assert not git('status', '--porcelain', cwd=site), 'checkout non pulita dopo il commit'
+    return {name: elapsed / rounds for name, elapsed in times.items()}
+
+
+def check_overwrite():
+    """
+    Regressione: PDF riscritto sul posto e miniatura sostituita con lo stesso nome finiscono
+    nel commit; un file scritto ma non indicato no, e un file rimosso esce dall'albero.
+    """
+    site = WORKDIR / 'checkout_overwrite'
+    (site / 'rocketbook_pdfs').mkdir(parents=True)
+    (site / 'rocketbook_thumbs').mkdir()
+    git('init', '-q', '-b', 'main', cwd=site)
+    shutil.copy(ROOT / 'index.html', site / 'index.html')
+    pdf, thumb = site / 'rocketbook_pdfs' / 'scan.pdf', site / 'rocketbook_thumbs' / 'scan.webp'
+    pdf.write_bytes(b'%PDF v1')
+    thumb.write_bytes(b'thumb v1')
+    written = ('index.html', 'rocketbook_pdfs/scan.pdf', 'rocketbook_thumbs/scan.webp')
+    plumbing_commit(site, written)
+    for version in (b'v2', b'v3'):
+        pdf.write_bytes(b'%PDF ' + version)  # stessa directory, stesso nome: mtime della directory invariato
+        tmp_file = thumb.with_name('.scan.webp.tmp')
+        tmp_file.write_bytes(b'thumb ' + version)
+        os.replace(tmp_file, thumb)
+        plumbing_commit(site, written)
+        assert git('show', 'HEAD:rocketbook_pdfs/scan.pdf', cwd=site) == '%PDF ' + version.decode(), 'PDF riscritto non committato'
+        assert git('show', 'HEAD:rocketbook_thumbs/scan.webp', cwd=site) == 'thumb ' + version.decode(), \
+            'miniatura sostituita non committata'
+        assert not git('status', '--porcelain', cwd=site), 'checkout non pulita dopo il commit'
+    (site / 'notes.txt').write_text('bozza')
+    pdf.unlink()
+    plumbing_commit(site, ('rocketbook_pdfs/scan.pdf',))
+    assert git('ls-tree', '-r', '--name-only', 'HEAD', cwd=site).split() == ['index.html', 'rocketbook_thumbs/scan.webp'], \
+        'albero del commit diverso dai file pubblicati'
+    print("✅ File riscritti con lo stesso nome committati, file rimossi tolti, altri file esclusi")
+
+
+def wait_queue(state_file):
+    """Attendi che il publisher in background abbia svuotato la coda."""
+    while True:
+        state = publish._read_state(state_file)
+        if state['requested'] <= state['published'] and not state['publisher']:
+            return
+        time.sleep(0.02)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--adds', type=int, default=30)
+    parser.add_argument('--debounce', type=float, default=0.5, help='secondi di quiete prima del commit')
+    parser.add_argument('--checkout-files', default='0,2000,10000', help='PDF già pubblicati nella checkout')
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    origin = setup_repos()
+    state_file = WORKDIR / 'cache' / 'rocketbook' / 'publish_queue.json'
+    modes = {
+        'push immediato': (lambda: publish.push_to_github(SITE, state_file), 'immediata'),
+        'coda': (lambda: publish.request_publish(SITE, args.debounce, state_file), 'in coda'),
+        'coda, note già presenti': (lambda: publish.request_publish(SITE, args.debounce, state_file), 'in coda'),
+    }
+
+    print(f"{args.adds} add, debounce {args.debounce:g}s, origin {origin}\n")
+    print(f"{'modalità':<24} {'add/s':>8} {'fino al push (s)':>17} {'commit':>7} {'push':>5}")
+    try:
+        for offset, (name, (publish_call, prefix)) in enumerate(modes.items()):
+            commits, pushed = int(git('rev-list', '--count', 'main', cwd=origin)), pushes(origin)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(args.adds):
+                    # Date crescenti: ogni nota nuova entra in cima alla dashboard
+                    day = date(2026, 1, 1) + timedelta(days=min(offset, 1) * args.adds + i)
+                    rocketbook_cli.add_note(f"Nota {prefix} {i}", day.strftime('%d %b %Y'))
+                    publish_call()
+            adds_elapsed = time.perf_counter() - start
+            wait_queue(state_file)
+            total = time.perf_counter() - start
+            print(f"{name:<24} {args.adds / adds_elapsed:>8.1f} {total:>17.2f} "
+                  f"{int(git('rev-list', '--count', 'main', cwd=origin)) - commits:>7} "
+                  f"{pushes(origin) - pushed:>5}")
+
+        check_overwrite()
+        print(f"\n{'file checkout':>13} {'git add -A (ms)':>16} {'plumbing (ms)':>14}")
+        for n in (int(c) for c in args.checkout_files.split(',')):
+            times = bench_checkout_size(n, args.rounds)
+            print(f"{n:>13} {times['git add -A'] * 1000:>16.1f} {times['plumbing'] * 1000:>14.1f}")
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark quota Gmail: senza retry vs solo retry con backoff vs token bucket + retry.
+Il server locale (fake_http.py) risponde 429 con Retry-After oltre la quota e 503 casuali;
+misura note recuperate, risposte limitate, retry e throughput del sync asincrono.
+Verifica anche che un files.create con risposta persa (file creato, 503) non crei duplicati
+su Drive, con DriveClient e con il sync asincrono.
+
+Uso: python3 benchmarks/bench_ratelimit.py [--messages 200] [--quota 500] [--error-rate 0.02]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_drive import FOLDER_MIME, FakeDriveService, fake_build  # noqa: E402
+from fake_gmail import FakeGmailService  # noqa: E402
+from fake_http import FakeGoogleServer  # noqa: E402
+from rocketbook import cache, drive, ratelimit  # noqa: E402
+from rocketbook.aio import sync_rest  # noqa: E402
+from rocketbook.ratelimit import RateLimiter  # noqa: E402
+
+
+def created(backend):
+    """(cartelle, file) creati sul fake Drive."""
+    files = list(backend.store.values())
+    return ([f['name'] for f in files if f['mimeType'] == FOLDER_MIME],
+            sorted(f['name'] for f in files if f['mimeType'] != FOLDER_MIME))
+
+
+def check_lost_create(lost=3):
+    """
+    Regressione: le prime `lost` files.create (cartella, poi PDF) creano la risorsa e
+    rispondono 503; nessuna cartella né file duplicati.
+    """
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        ratelimit._default_limiter = RateLimiter(rates={}, backoff_base=0.01)
+        backend = FakeDriveService(latency=0, lost_creates=lost)
+        client = drive.DriveClient(build_service=fake_build(backend, 0), folder_cache_file=None, index_file=None)
+        path = Path(workdir) / 'scan.pdf'
+        path.write_bytes(b'%PDF scan')
+        drive.make_media_upload = lambda filepath: filepath
+        file = client.upload(str(path), path.name)
+        ratelimit._default_limiter = None
+        assert file and created(backend) == ([drive.DRIVE_FOLDER_NAME], ['scan.pdf']), f"DriveClient: {created(backend)}"
+
+        cache._default_cache = cache.AttachmentCache(Path(workdir) / 'cache')
+        backend = FakeDriveService(latency=0, lost_creates=lost)
+        gmail = FakeGmailService(n_messages=3, latency=0, attachment_size=1024)
+        with FakeGoogleServer(gmail, drive=backend, latency=0) as server:
+            notes, _, _ = asyncio.run(sync_rest('fake-token', 'from:notes', 3, upload=True,
+                                                limiter=RateLimiter(rates={}, backoff_base=0.01),
+                                                client_options=server.client_options()))
+        folders, files = created(backend)
+        assert len(notes) == 3 and len(folders) == 1 and len(files) == len(set(files)) == 3, \
+            f"sync asincrono: {folders}, {files}"
+    print(f"✅ files.create con {lost} risposte perse: nessuna cartella o file duplicati su Drive\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--quota', type=int, default=500, help='unità Gmail al secondo concesse dal server')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='frazione di risposte 503')
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    check_lost_create()
+    modes = {
+        'senza retry': lambda: RateLimiter(rates={}, max_retries=0),
+        'solo retry': lambda: RateLimiter(rates={}, backoff_base=0.5),
+        'bucket + retry': lambda: RateLimiter(rates={'gmail': args.quota}, backoff_base=0.5),
+    }
+
+    print(f"{args.messages} email, quota {args.quota} unità/s, {args.error_rate:.0%} errori 503, "
+          f"concurrency {args.concurrency}\n")
+    print(f"{'modalità':<16} {'tempo (s)':>10} {'note':>6} {'email/s':>8} {'429':>6} {'retry':>6} {'fallite':>8}")
+    for name, make_limiter in modes.items():
+        gmail = FakeGmailService(n_messages=args.messages, latency=0, attachment_size=16 * 1024)
+        limiter = make_limiter()
+        with tempfile.TemporaryDirectory() as workdir, \
+                FakeGoogleServer(gmail, latency=args.latency, quota=args.quota,
+                                 error_rate=args.error_rate) as server:
+            cache._default_cache = cache.AttachmentCache(Path(workdir))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    notes, _, _ = asyncio.run(sync_rest('fake-token', 'from:notes', args.messages,
+                                                        concurrency=args.concurrency, limiter=limiter,
+                                                        client_options=server.client_options()))
+                except Exception:
+                    notes = []  # la lista stessa è fallita
+            elapsed = time.perf_counter() - start
+            s = limiter.stats
+            print(f"{name:<16} {elapsed:>10.2f} {len(notes):>6} {len(notes) / elapsed:>8.1f} "
+                  f"{server.throttled:>6} {s['retried']:>6} {s['failed']:>8}")
+
+
+if __name__ == '__main__':
+    main()
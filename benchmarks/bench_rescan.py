@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark full scan dopo un sync incrementale: tempo di rocketbook_gmail.run per primo sync,
+sync delta, full scan di ripiego (history scaduta), --full e --backfill, e verifica che il full
+scan non cancelli il testo già estratto dai PDF né le miniature delle note salvate, e che il
+backfill salvi note con testo e miniatura.
+Gli allegati della casella finta sono PDF con testo incorporato e una piccola immagine JPEG
+(miniatura anche senza Pillow); push disattivato.
+
+Uso: python3 benchmarks/bench_rescan.py [--messages 10] [--latency 0.005]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix='bench_rescan_'))
+SITE = WORKDIR / 'site'
+# Prima di importare rocketbook: checkout, cache e storico nella directory temporanea, quote locali spente
+os.environ.update(ROCKETBOOK_DASHBOARD_DIR=str(SITE), XDG_CACHE_HOME=str(WORKDIR / 'cache'),
+                  XDG_DATA_HOME=str(WORKDIR / 'data'), ROCKETBOOK_GMAIL_QUOTA='0')
+
+import rocketbook_gmail  # noqa: E402
+from fake_gmail import FakeGmailService, make_text_pdf  # noqa: E402
+from rocketbook.store import recent_notes  # noqa: E402
+from rocketbook.thumbnails import THUMB_WIDTH  # noqa: E402
+
+
+def sync(full=False, backfill=False):
+    args = argparse.Namespace(daemon=False, backfill=backfill, full=full, batch_size=4)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rocketbook_gmail.run(args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.005, help='secondi per round trip')
+    args = parser.parse_args()
+
+    SITE.mkdir(parents=True)
+    shutil.copy(ROOT / 'index.html', SITE / 'index.html')
+    service = FakeGmailService(n_messages=args.messages, latency=args.latency,
+                               make_pdf=lambda index: make_text_pdf(1, 40, seed=index, image_bytes=8 * 1024,
+                                                                    image_size=(THUMB_WIDTH, THUMB_WIDTH * 4 // 3)))
+    rocketbook_gmail.get_gmail_service = lambda: service
+    rocketbook_gmail.push_to_github = lambda: None
+    try:
+        print(f"{'sync':<16} {'tempo (s)':>10} {'note':>6} {'con testo':>10} {'con miniatura':>14}")
+        phases = (('primo', False, False), ('delta', False, False), ('history scaduta', False, False),
+                  ('--full', True, False), ('--backfill', False, True))
+        for name, full, backfill in phases:
+            if name == 'delta':
+                service.add_message()
+            elif name == 'history scaduta':
+                # Il checkpoint resta con le email già elaborate: per il full scan non sono nuove
+                service.expire_history()
+            elif name == '--backfill':
+                # Email mai sincronizzate: le importa il backfill, insieme al resto della casella
+                for _ in range(3):
+                    service.add_message()
+            elapsed = sync(full, backfill)
+            notes = recent_notes('dashboard', None)
+            described = sum(1 for n in notes if n.get('content'))
+            thumbnails = sum(1 for n in notes if n.get('thumbnail'))
+            print(f"{name:<16} {elapsed:>10.3f} {len(notes):>6} {described:>10} {thumbnails:>14}")
+            assert described == len(notes), f"{name}: {len(notes) - described} note senza testo"
+            assert thumbnails == len(notes), f"{name}: {len(notes) - thumbnails} note senza miniatura"
+        print("\n✅ Full scan dopo il sync incrementale e backfill: testo dei PDF e miniature su tutte le note")
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark ricerca full-text: SQLite FTS5 vs indice invertito del journal.
+Genera note sintetiche con titoli, anteprime e tag variabili e misura il tempo
+medio per query (parola, prefisso, tag, combinata).
+
+Uso: python3 benchmarks/bench_search.py [--notes 100000] [--runs 20]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rocketbook.db import SQLiteNoteStore  # noqa: E402
+from rocketbook.journal import JournalNoteStore  # noqa: E402
+from rocketbook.notes import make_note  # noqa: E402
+from rocketbook.search import parse_query  # noqa: E402
+from rocketbook.store import note_key  # noqa: E402
+
+WORDS = ("riunione progetto budget cliente idee schema lavagna appunti sprint revisione "
+         "marketing vendite design architettura database roadmap obiettivi priorità "
+         "formazione colloquio fornitore contratto fattura scadenza bozza").split()
+TAGS = ["Rocketbook", "Scan", "PDF", "Manuale", "Lavoro", "Personale", "Idee", "Urgente"]
+
+QUERIES = ['riunione', 'archit*', 'tag:Urgente', 'progetto budg* tag:Lavoro', 'priorita', 'inesistente']
+
+
+def make_notes(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1, 9)
+    notes = []
+    for i in range(count):
+        title = ' '.join(rng.sample(WORDS, 3)).capitalize()
+        preview = f"Scansione Rocketbook: {' '.join(rng.sample(WORDS, 8))}"
+        tags = rng.sample(TAGS, 3)
+        notes.append(make_note(title, start + timedelta(hours=i), note_id=f"msg-{i:08x}",
+                               tags=tags, preview=preview))
+    return notes
+
+
+def timed(func, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return (time.perf_counter() - start) / runs * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20, help='risultati per query')
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes)
+    with tempfile.TemporaryDirectory() as workdir:
+        stores = {
+            'SQLite FTS5': SQLiteNoteStore(Path(workdir) / 'notes.db'),
+            'journal': JournalNoteStore(Path(workdir) / 'journal', compact_lines=0),
+        }
+        for name, store in stores.items():
+            elapsed, _ = timed(lambda: store.upsert('dashboard', notes, note_key), 1)
+            store.search('dashboard', parse_query('warmup'), 1)  # il journal costruisce l'indice qui
+            print(f"{name}: {args.notes} note caricate in {elapsed / 1000:.1f}s")
+
+        print(f"\n{'query':<28} " + ' '.join(f"{name + ' (ms)':>18}" for name in stores) + f" {'risultati':>10}")
+        for text in QUERIES:
+            query = parse_query(text)
+            row = []
+            found = None
+            for store in stores.values():
+                ms, results = timed(lambda: store.search('dashboard', query, args.limit), args.runs)
+                keys = [note_key(n) for n in results]
+                assert found is None or keys == found, text
+                found = keys
+                row.append(ms)
+            print(f"{text:<28} " + ' '.join(f"{ms:>18.2f}" for ms in row) + f" {len(found):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark avvio degli entry point: tempo di import (-X importtime) per sottocomando.
+Ogni comando gira in un processo nuovo su una dashboard temporanea; mostra import
+totali, tempo reale, moduli caricati e se le librerie Google sono state importate.
+Fallisce se un comando importa moduli che non gli servono (LAZY_MODULES).
+
+Uso: python3 benchmarks/bench_startup.py [--runs 5] [--top 3]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    'cli list': ['rocketbook_cli.py', 'list'],
+    'cli add': ['rocketbook_cli.py', 'add', 'Benchmark', '17 Feb 2026'],
+    'gmail --help': ['rocketbook_gmail.py', '--help'],
+    'drive --help': ['rocketbook_drive_upload.py', '--help'],
+    'sync (import)': ['-c', 'import rocketbook_sync'],
+}
+
+# Moduli che il comando non deve importare: li caricano solo i comandi che li usano
+LAZY_MODULES = {
+    'cli list': ('rocketbook.dashboard', 'rocketbook.publish'),
+}
+
+# Riferimento: costo del solo import del client Google (se installato)
+GOOGLE_REFERENCE = ['-c', 'import googleapiclient.discovery']
+GOOGLE_PREFIXES = ('google', 'googleapiclient', 'httplib2')
+
+
+def parse_importtime(stderr):
+    """Restituisce (totale µs, moduli caricati, import di primo livello) dall'output -X importtime."""
+    total = 0
+    modules = []
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        modules.append(module)
+        # I sotto-import sono indentati di due spazi per livello
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+            top_level.append((int(cumulative), module))
+    return total, modules, sorted(top_level, reverse=True)
+
+
+def run_command(argv, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', *argv], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='esecuzioni per comando (mediana)')
+    parser.add_argument('--top', type=int, default=3, help='import più costosi mostrati')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        dashboard = Path(workdir) / 'dashboard'
+        dashboard.mkdir()
+        shutil.copy(ROOT / 'index.html', dashboard / 'index.html')
+        env = dict(os.environ, ROCKETBOOK_DASHBOARD_DIR=str(dashboard),
+                   XDG_CACHE_HOME=str(Path(workdir) / 'cache'), GITHUB_TOKEN='')
+
+        commands = dict(COMMANDS)
+        _, probe = run_command(GOOGLE_REFERENCE, env)
+        if probe.returncode == 0:
+            commands['googleapiclient'] = GOOGLE_REFERENCE
+        else:
+            print("ℹ️ google-api-python-client non installato: riga di riferimento omessa\n")
+
+        print(f"{'comando':<16} {'import (ms)':>11} {'reale (ms)':>11} {'moduli':>7} {'google':>7}  più costosi")
+        for label, argv in commands.items():
+            imports, walls = [], []
+            for _ in range(args.runs):
+                elapsed, result = run_command(argv, env)
+                total, modules, top_level = parse_importtime(result.stderr)
+                imports.append(total / 1000)
+                walls.append(elapsed * 1000)
+            loaded = sorted(set(LAZY_MODULES.get(label, ())) & set(modules))
+            assert not loaded, f"{label}: importati {', '.join(loaded)}"
+            google = sum(1 for m in modules if m.split('.')[0] in GOOGLE_PREFIXES)
+            heaviest = ', '.join(f"{name} {us / 1000:.1f}" for us, name in top_level[:args.top])
+            print(f"{label:<16} {statistics.median(imports):>11.1f} {statistics.median(walls):>11.1f} "
+                  f"{len(modules):>7} {google:>7}  {heaviest}")
+
+
+if __name__ == '__main__':
+    main()
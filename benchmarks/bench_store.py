@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark store delle note: file JSON riscritto a ogni aggiunta vs SQLite (WAL) vs journal JSONL.
+Per ogni dimensione dello storico misura aggiunta singola, lettura delle 10 note
+più recenti e upsert a blocchi dell'intero storico. Prima verifica che due istanze del
+journal (come due processi) vedano le aggiunte e le compattazioni l'una dell'altra.
+
+Uso: python3 benchmarks/bench_store.py [--sizes 100,10000,50000] [--adds 20]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rocketbook.db import SQLiteNoteStore  # noqa: E402
+from rocketbook.journal import JournalNoteStore  # noqa: E402
+from rocketbook.notes import make_note  # noqa: E402
+from rocketbook.store import load_notes, note_key, save_notes  # noqa: E402
+
+
+def make_notes(count, prefix='Nota'):
+    start = datetime(2020, 1, 1, 9)
+    return [make_note(f"{prefix} {i}", start + timedelta(hours=i), note_id=f"{prefix}-{i:08x}")
+            for i in range(count)]
+
+
+def json_add(path, note):
+    """Percorso originale di rocketbook_cli.add_note, senza il taglio a 10 (storico completo)."""
+    notes = load_notes(path)
+    for existing in notes:
+        if existing['title'] == note['title'] and existing['date'] == note['date']:
+            return False
+    notes.insert(0, note)
+    save_notes(path, notes)
+    return True
+
+
+def timed(func, runs=1):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def check_shared():
+    """Due JournalNoteStore sulla stessa directory: le aggiunte dell'uno compaiono nell'altro."""
+    with tempfile.TemporaryDirectory() as workdir:
+        first, second = (JournalNoteStore(Path(workdir), compact_lines=0) for _ in range(2))
+        notes = make_notes(4)
+        first.upsert('dashboard', notes[:1], note_key)
+        assert second.count('dashboard') == 1
+        assert second.add('dashboard', notes[1], note_key)
+        assert not first.add('dashboard', notes[1], note_key)
+        second.compact('dashboard')
+        first.upsert('dashboard', notes[2:3], note_key)
+        second.add('dashboard', notes[3], note_key)
+        assert [n['title'] for n in first.recent('dashboard', 2)] == [notes[3]['title'], notes[2]['title']]
+        assert second.count('dashboard') == first.count('dashboard') == JournalNoteStore(Path(workdir)).count('dashboard') == 4
+    print("✅ Journal condiviso: aggiunte e compattazioni visibili tra istanze\n")
+
+
+def check_retitle():
+    """Nota aggiornata con un nuovo titolo: titolo e data vecchi tornano liberi per add."""
+    with tempfile.TemporaryDirectory() as workdir:
+        store = JournalNoteStore(Path(workdir), compact_lines=0)
+        note = make_notes(1)[0]
+        store.upsert('dashboard', [note], note_key)
+        store.upsert('dashboard', [{**note, 'title': 'Nota rinominata'}], note_key)
+        manual = {**note, 'id': None}
+        assert store.add('dashboard', manual, note_key), 'titolo e data della versione precedente rifiutati'
+        assert JournalNoteStore(Path(workdir)).count('dashboard') == 2
+    print("✅ Journal: titolo e data di una nota aggiornata non bloccano nuove note\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='100,10000,50000', help='note nello storico')
+    parser.add_argument('--adds', type=int, default=20, help='aggiunte misurate per dimensione')
+    args = parser.parse_args()
+
+    check_shared()
+    check_retitle()
+    print(f"{'storico':>8} {'JSON add (ms)':>14} {'SQLite add (ms)':>16} {'journal add (ms)':>17} "
+          f"{'JSON ultime 10':>15} {'SQLite ultime 10':>17} {'journal ultime 10':>18} {'upsert (s)':>11}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        history = make_notes(size)
+        added = make_notes(args.adds, prefix='Nuova')
+        with tempfile.TemporaryDirectory() as workdir:
+            json_file = Path(workdir) / 'rocketbook_data.json'
+            save_notes(json_file, history)
+            json_add_ms = timed(lambda: [json_add(json_file, n) for n in added]) / args.adds
+            json_read_ms = timed(lambda: sorted(load_notes(json_file), key=lambda n: n['date_iso'])[-10:])
+
+            store = SQLiteNoteStore(Path(workdir) / 'notes.db')
+            upsert_s = timed(lambda: store.upsert('dashboard', history, note_key)) / 1000
+            sqlite_add_ms = timed(lambda: [store.add('dashboard', n, note_key) for n in added]) / args.adds
+            sqlite_read_ms = timed(lambda: store.recent('dashboard', 10), runs=20)
+            assert store.count('dashboard') == size + args.adds
+            assert json.loads(json_file.read_text())[0]['title'] == added[-1]['title']
+            store.close()
+
+            # Journal: storico già compattato nello snapshot, poi aggiunte e una lettura a freddo
+            journal = JournalNoteStore(Path(workdir) / 'journal', compact_lines=0)
+            journal.upsert('dashboard', history, note_key)
+            journal.compact('dashboard')
+            journal_add_ms = timed(lambda: [journal.add('dashboard', n, note_key) for n in added]) / args.adds
+            journal_read_ms = timed(lambda: JournalNoteStore(journal.root).recent('dashboard', 10))
+            assert JournalNoteStore(journal.root).count('dashboard') == size + args.adds
+
+        print(f"{size:>8} {json_add_ms:>14.2f} {sqlite_add_ms:>16.2f} {journal_add_ms:>17.2f} "
+              f"{json_read_ms:>15.2f} {sqlite_read_ms:>17.2f} {journal_read_ms:>18.2f} {upsert_s:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
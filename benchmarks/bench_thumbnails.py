@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark miniature: prima generazione (un processo vs pool) e sync successivo (indice per hash).
+Genera PDF sintetici con un'immagine JPEG per pagina, come le scansioni Rocketbook.
+Senza renderer (PyMuPDF, pdftoppm, Pillow) le immagini sono già grandi quanto una miniatura:
+il JPEG a piena risoluzione non verrebbe pubblicato.
+
+Uso: python3 benchmarks/bench_thumbnails.py [--pdfs 64] [--pages 4] [--workers N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_gmail import make_text_pdf  # noqa: E402
+from rocketbook import thumbnails  # noqa: E402
+
+
+def run(paths, workers, thumb_dir):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        thumbs = thumbnails.make_thumbnails(paths, workers=workers, thumb_dir=thumb_dir)
+    return time.perf_counter() - start, thumbs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pdfs', type=int, default=64)
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--image-kb', type=int, default=120, help='KB di immagine per pagina')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    renderers = thumbnails.available_renderers()
+    image_size = (1240, 1754) if renderers else (thumbnails.THUMB_WIDTH, thumbnails.THUMB_WIDTH * 4 // 3)
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        paths = []
+        for i in range(args.pdfs):
+            path = workdir / f"scan {i:04d}.pdf"
+            path.write_bytes(make_text_pdf(args.pages, 50, seed=i, image_bytes=args.image_kb * 1024,
+                                           image_size=image_size))
+            paths.append(path)
+        print(f"{args.pdfs} PDF da {args.pages} pagine, immagini {image_size[0]}x{image_size[1]}, "
+              f"renderer: {', '.join(renderers) or 'JPEG incorporato'}, {args.workers} processi\n")
+
+        timings = []
+        for label, workers, name in (('un processo', 1, 'seq'), ('pool', args.workers, 'pool'),
+                                     ('sync successivo', args.workers, 'pool')):
+            # Indice separato per modalità: solo il sync successivo lo ritrova
+            thumbnails._index = None
+            thumbnails.THUMB_INDEX = workdir / f"{name}.json"
+            elapsed, thumbs = run(paths, workers, workdir / f"thumbs-{name}")
+            assert len(thumbs) == args.pdfs, f"{label}: {len(thumbs)} miniature"
+            timings.append((label, elapsed))
+
+        print(f"{'modalità':<16} {'tempo (s)':>10} {'PDF/s':>8}")
+        for label, elapsed in timings:
+            print(f"{label:<16} {elapsed:>10.3f} {args.pdfs / elapsed:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Fake Google Drive API v3 locale per benchmark senza account Google.
+Imita files().list/create/get e permissions().create di googleapiclient,
+con latenza configurabile per round trip e per il caricamento del
+discovery document (build). Con `lost_creates` le prime N files.create
+creano il file ma rispondono 503, come una risposta persa dopo il commit.
+"""
+
+import hashlib
+import itertools
+import re
+import threading
+import time
+
+from fake_gmail import FakeHttpError
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+
+class FakeRequest:
+    """Richiesta differita: esegue la funzione solo su execute(). methodId come googleapiclient."""
+
+    def __init__(self, service, func, method_id=None):
+        self._service = service
+        self._func = func
+        self.methodId = method_id
+
+    def execute(self, http=None, num_retries=0):
+        self._service._round_trip()
+        return self._func()
+
+
+class _Files:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, q='', spaces='drive', fields=None, pageSize=100, pageToken=None, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._list(q, pageSize, pageToken),
+                           'drive.files.list')
+
+    def create(self, body, media_body=None, fields=None):
+        return FakeRequest(self._service, lambda: self._service._create(body, media_body),
+                           'drive.files.create')
+
+    def get(self, fileId, fields=None):
+        return FakeRequest(self._service, lambda: dict(self._service.store[fileId]), 'drive.files.get')
+
+
+class _Permissions:
+    def __init__(self, service):
+        self._service = service
+
+    def create(self, fileId, body):
+        return FakeRequest(self._service, lambda: self._service._share(fileId, body),
+                           'drive.permissions.create')
+
+
+class _Changes:
+    def __init__(self, service):
+        self._service = service
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(self._service, lambda: {'startPageToken': str(len(self._service.changes_log))},
+                           'drive.changes.getStartPageToken')
+
+    def list(self, pageToken, fields=None, pageSize=100, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._changes(pageToken, pageSize),
+                           'drive.changes.list')
+
+
+class FakeDriveService:
+    """
+    Stand-in per il servizio restituito da build('drive', 'v3').
+    `store` contiene i file creati; conta i round trip e simula `latency`
+    secondi per ciascuno.
+    """
+
+    def __init__(self, latency=0.05, lost_creates=0):
+        self.latency = latency
+        self.lost_creates = lost_creates
+        self.store = {}
+        self.shared = {}
+        self.changes_log = []
+        self.round_trips = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _Files(self)
+
+    def permissions(self):
+        return _Permissions(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _list(self, query, page_size, page_token):
+        name = re.search(r"name='((?:[^'\\]|\\.)*)'", query)
+        parent = re.search(r"'([^']+)' in parents", query)
+        folders_only = f"mimeType='{FOLDER_MIME}'" in query
+        with self._lock:
+            matches = [
+                dict(f) for f in self.store.values()
+                if not f.get('trashed')
+                and (not name or f['name'] == name.group(1))
+                and (not parent or parent.group(1) in f.get('parents', []))
+                and (not folders_only or f['mimeType'] == FOLDER_MIME)
+            ]
+        start = int(page_token or 0)
+        page = matches[start:start + page_size]
+        result = {'files': page}
+        if start + len(page) < len(matches):
+            result['nextPageToken'] = str(start + len(page))
+        return result
+
+    def _create(self, body, media_body=None, content=b''):
+        if media_body is not None:
+            with open(getattr(media_body, 'filepath', media_body), 'rb') as f:
+                content = f.read()
+        with self._lock:
+            file_id = f"file{next(self._ids):06d}"
+            record = {
+                'id': file_id,
+                'name': body['name'],
+                'mimeType': body.get('mimeType', 'application/pdf'),
+                'parents': body.get('parents', []),
+                'md5Checksum': hashlib.md5(content).hexdigest(),
+                'size': str(len(content)),
+                'webViewLink': f"https://drive.google.com/file/d/{file_id}/view",
+            }
+            self.store[file_id] = record
+            self.changes_log.append({'fileId': file_id, 'removed': False})
+            if self.lost_creates:
+                self.lost_creates -= 1
+                raise FakeHttpError(503, 'Backend Error')
+        return dict(record)
+
+    def trash(self, file_id):
+        """Simula il cestino di un file da parte dell'utente."""
+        with self._lock:
+            self.store[file_id]['trashed'] = True
+            self.changes_log.append({'fileId': file_id, 'removed': False})
+
+    def _changes(self, page_token, page_size):
+        start = int(page_token)
+        with self._lock:
+            page = self.changes_log[start:start + page_size]
+            changes = [
+                {**change, 'file': dict(self.store[change['fileId']])}
+                for change in page
+            ]
+            end = start + len(page)
+            result = {'changes': changes}
+            if end < len(self.changes_log):
+                result['nextPageToken'] = str(end)
+            else:
+                result['newStartPageToken'] = str(end)
+        return result
+
+    def _share(self, file_id, body):
+        with self._lock:
+            self.shared.setdefault(file_id, []).append(body)
+        return {'id': f"perm-{file_id}", **body}
+
+
+def fake_build(service, discovery_latency=0.2):
+    """Simula build('drive', 'v3'): carica il discovery document e restituisce il service."""
+    def build():
+        if discovery_latency:
+            time.sleep(discovery_latency)
+        return service
+    return build
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Fake Gmail API locale per benchmark senza account Google.
+Imita la catena di googleapiclient (users().messages().list/get/attachments)
+e il batch endpoint, con una latenza configurabile per ogni round trip.
+"""
+
+import base64
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+ROCKETBOOK_SENDER = "notes@email.getrocketbook.com"
+WORDS = ("riunione progetto budget cliente idee schema lavagna appunti sprint revisione "
+         "marketing vendite design architettura database roadmap obiettivi").split()
+
+
+def make_message(index, attachment_size=64 * 1024, sender=ROCKETBOOK_SENDER):
+    """Genera un messaggio Rocketbook sintetico in formato Gmail API (con `sender`: altra posta)."""
+    msg_id = f"{index + 1:016x}"
+    sent = datetime(2026, 1, 1, 9, 0) + timedelta(hours=index)
+    stamp = sent.strftime('%Y-%m-%d %H.%M.%S')
+    return {
+        'id': msg_id,
+        'threadId': msg_id,
+        'historyId': str(1000 + index),
+        'payload': {
+            'headers': [
+                {'name': 'From', 'value': f"Rocketbook <{sender}>"},
+                {'name': 'Subject', 'value': f"Rocketbook - Scan {stamp}"},
+                {'name': 'Date', 'value': sent.strftime('%a, %d %b %Y %H:%M:%S +0000')},
+            ],
+            'parts': [
+                {'filename': '', 'body': {'size': 120}},
+                {
+                    'filename': f"RB {stamp}.pdf",
+                    'body': {'attachmentId': f"att-{msg_id}", 'size': attachment_size},
+                },
+            ],
+        },
+    }
+
+
+def make_pdf_bytes(size, seed=0):
+    """Bytes pseudo-PDF deterministici della dimensione richiesta."""
+    header = b"%PDF-1.4\n"
+    block = bytes((seed + i) % 251 for i in range(251))
+    body = (block * (size // len(block) + 1))[:max(0, size - len(header))]
+    return header + body
+
+
+def make_jpeg_bytes(width, height, size, seed=0):
+    """Pseudo-JPEG: header SOF0 valido (dimensioni leggibili) e dati casuali, `size` byte."""
+    sof = b"\xff\xc0\x00\x11\x08" + height.to_bytes(2, 'big') + width.to_bytes(2, 'big') + b"\x03" + b"\x01\x22\x00" * 3
+    header = b"\xff\xd8" + sof + b"\xff\xda\x00\x02"
+    return header + make_pdf_bytes(max(0, size - len(header) - 2), seed=seed) + b"\xff\xd9"
+
+
+def make_text_pdf(pages, words_per_page=200, seed=0, image_bytes=0, image_size=(1240, 1754)):
+    """
+    PDF valido con testo incorporato (stream FlateDecode) su `pages` pagine,
+    come le scansioni Rocketbook con testo riconosciuto; `image_bytes` aggiunge
+    a ogni pagina uno stream binario non testuale, come l'immagine della scansione
+    (JPEG di `image_size` pixel).
+    """
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    for page in range(pages):
+        words = ' '.join(rng.choice(WORDS) for _ in range(words_per_page))
+        stream = zlib.compress(f"BT /F1 11 Tf 40 800 Td (Pagina {page + 1}: {words}) Tj ET".encode('latin-1'))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        if image_bytes:
+            width, height = image_size
+            image = make_jpeg_bytes(width, height, image_bytes, seed=seed + page)
+            objects.append(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /Length %d "
+                           b"/Filter /DCTDecode >>\nstream\n" % (width, height, len(image)) + image + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R >>" % content_ref)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class FakeHttpError(Exception):
+    """Come googleapiclient.errors.HttpError: lo status è in resp (dict di header, come httplib2)."""
+
+    class _Response(dict):
+        status = None
+
+    def __init__(self, status, message=''):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.resp = self._Response(status=str(status))
+        self.resp.status = status
+
+
+class FakeRequest:
+    """Richiesta differita: esegue la funzione solo su execute(). methodId come googleapiclient."""
+
+    def __init__(self, service, func, method_id=None):
+        self._service = service
+        self._func = func
+        self.methodId = method_id
+
+    def execute(self, http=None, num_retries=0):
+        self._service._round_trip()
+        return self._func()
+
+
+class FakeBatch:
+    """Batch HTTP: tutte le richieste aggiunte costano un solo round trip."""
+
+    def __init__(self, service, callback=None):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id))
+
+    def execute(self, http=None):
+        self._service._round_trip()
+        for request, callback, request_id in self._requests:
+            try:
+                response, exception = request._func(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _Attachments:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, userId, messageId, id):
+        return FakeRequest(self._service, lambda: self._service._attachment(messageId, id),
+                           'gmail.users.messages.attachments.get')
+
+
+class _Messages:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId, q=None, maxResults=100, pageToken=None, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._list(maxResults, pageToken),
+                           'gmail.users.messages.list')
+
+    def get(self, userId, id, format='full', metadataHeaders=None, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._get(id, format, metadataHeaders),
+                           'gmail.users.messages.get')
+
+    def attachments(self):
+        return _Attachments(self._service)
+
+
+class _History:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId, startHistoryId, historyTypes=None, pageToken=None, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._history(startHistoryId, pageToken),
+                           'gmail.users.history.list')
+
+
+class _Users:
+    def __init__(self, service):
+        self._service = service
+
+    def messages(self):
+        return _Messages(self._service)
+
+    def history(self):
+        return _History(self._service)
+
+    def getProfile(self, userId):
+        return FakeRequest(self._service, lambda: {'historyId': str(self._service.history_id)},
+                           'gmail.users.getProfile')
+
+    def watch(self, userId, body):
+        expiration = int((time.time() + 7 * 24 * 3600) * 1000)
+        return FakeRequest(self._service, lambda: {'historyId': str(self._service.history_id),
+                                                   'expiration': str(expiration)},
+                           'gmail.users.watch')
+
+
+class FakeGmailService:
+    """
+    Stand-in per il servizio restituito da build('gmail', 'v1').
+    Conta i round trip HTTP e simula `latency` secondi per ciascuno.
+    """
+
+    def __init__(self, n_messages=10, latency=0.05, attachment_size=64 * 1024, batch=True, make_pdf=None):
+        self.latency = latency
+        self.attachment_size = attachment_size
+        # Contenuto degli allegati: funzione (indice del messaggio) -> bytes; default pseudo-PDF
+        self.make_pdf = make_pdf or (lambda index: make_pdf_bytes(self.attachment_size, seed=index))
+        self.messages = []
+        self._by_id = {}
+        self.history_id = 1000
+        self.history_floor = 0  # historyId più vecchio ancora disponibile (expire_history)
+        for _ in range(n_messages):
+            self.add_message()
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.batch = batch
+
+    @classmethod
+    def from_recording(cls, path, n_messages, **kwargs):
+        """
+        Casella di `n_messages` email ricavata da risposte registrate di
+        messages.get (format=full): un file JSON con una lista di messaggi,
+        o {"messages": [...]}. I messaggi sono ripetuti con ID nuovi fino
+        a n_messages; gli allegati restano sintetici (attachment_size byte).
+        """
+        import copy
+        import json
+
+        with open(path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        if isinstance(recorded, dict):
+            recorded = recorded['messages']
+        service = cls(n_messages=0, **kwargs)
+        for index in range(n_messages):
+            message = copy.deepcopy(recorded[index % len(recorded)])
+            message['id'] = message['threadId'] = f"{index + 1:016x}"
+            for part in message.get('payload', {}).get('parts', []):
+                if part.get('body', {}).get('attachmentId'):
+                    part['body']['attachmentId'] = f"att-{message['id']}"
+                    if index >= len(recorded):
+                        # Nomi file distinti per le ripetizioni (PDF_DIR e Drive deduplicano per nome)
+                        part['filename'] = f"{index // len(recorded)}-{part['filename']}"
+            service.history_id += 1
+            message['historyId'] = str(service.history_id)
+            service.messages.insert(0, message)
+            service._by_id[message['id']] = message
+        return service
+
+    def new_batch_http_request(self, callback=None):
+        if not self.batch:
+            # Simula un batch endpoint non disponibile (forza il fallback a thread)
+            raise NotImplementedError("batch endpoint disabilitato")
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return _Users(self)
+
+    def add_message(self, sender=ROCKETBOOK_SENDER):
+        """Simula l'arrivo di una nuova scansione (la più recente in cima) o di altra posta."""
+        message = make_message(len(self.messages), self.attachment_size, sender)
+        self.history_id += 1
+        message['historyId'] = str(self.history_id)
+        self.messages.insert(0, message)
+        self._by_id[message['id']] = message
+        return message
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _list(self, max_results, page_token):
+        start = int(page_token or 0)
+        page = self.messages[start:start + min(max_results, 500)]
+        result = {
+            'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page],
+            'resultSizeEstimate': len(self.messages),
+        }
+        if start + len(page) < len(self.messages):
+            result['nextPageToken'] = str(start + len(page))
+        return result
+
+    def expire_history(self):
+        """Simula una history scaduta: i checkpoint esistenti ricevono 404 e serve un full scan."""
+        self.history_floor = self.history_id + 1
+
+    def _history(self, start_history_id, page_token):
+        start = int(start_history_id)
+        if start < self.history_floor:
+            raise FakeHttpError(404, 'Requested entity was not found.')
+        added = [m for m in reversed(self.messages) if int(m['historyId']) > start]
+        return {
+            'history': [
+                {'id': m['historyId'], 'messagesAdded': [{'message': {'id': m['id']}}]}
+                for m in added
+            ],
+            'historyId': str(self.history_id),
+        }
+
+    def _get(self, msg_id, format='full', metadata_headers=None):
+        if msg_id not in self._by_id:
+            raise KeyError(f"Messaggio {msg_id} non trovato")
+        message = self._by_id[msg_id]
+        if format == 'metadata':
+            # Solo gli header richiesti, senza parti né allegati
+            wanted = {h.lower() for h in metadata_headers or ()}
+            headers = [h for h in message['payload']['headers'] if not wanted or h['name'].lower() in wanted]
+            return {**{k: message[k] for k in ('id', 'threadId', 'historyId')}, 'payload': {'headers': headers}}
+        return message
+
+    def _attachment(self, msg_id, attachment_id):
+        index = int(msg_id, 16)
+        data = self.make_pdf(index)
+        return {
+            'size': len(data),
+            'data': base64.urlsafe_b64encode(data).decode('ascii'),
+        }
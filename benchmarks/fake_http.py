@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Server HTTP locale che espone il fake Gmail e il fake Drive come API REST
+(gli stessi path di gmail/v1, drive/v3 e upload/drive/v3), per provare e
+misurare i client HTTP veri (urllib, rocketbook.aio) senza rete.
+
+HTTP/1.1 con keep-alive; `latency` secondi per richiesta (round trip) e
+`handshake` secondi per ogni nuova connessione (costo di TCP + TLS).
+Con `quota` (unità Gmail al secondo) le richieste oltre quota ricevono 429
+con Retry-After; `error_rate` è la frazione di risposte 503 casuali.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_drive import FakeDriveService
+from fake_gmail import FakeGmailService, FakeHttpError
+
+_GMAIL = re.compile(r'^/gmail/v1/users/me/messages(?:/([^/]+)(?:/attachments/([^/]+))?)?$')
+_PERMISSIONS = re.compile(r'^/drive/v3/files/([^/]+)/permissions$')
+GMAIL_UNITS = 5  # messages.list / get / attachments.get
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        server = self.server.fake
+        with server.lock:
+            server.connections += 1
+        if server.handshake:
+            time.sleep(server.handshake)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _round_trip(self):
+        """Latenza, poi quota ed errori simulati; False se la risposta è già stata inviata."""
+        server = self.server.fake
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            self._reply(503, {'error': {'code': 503, 'message': 'Backend Error'}})
+            return False
+        if server.quota and self.path.startswith('/gmail/'):
+            retry_after = server.consume(GMAIL_UNITS)
+            if retry_after:
+                self._reply(429, {'error': {'code': 429, 'message': 'User-rate limit exceeded',
+                                            'status': 'RESOURCE_EXHAUSTED'}},
+                            {'Retry-After': str(retry_after)})
+                return False
+        return True
+
+    def do_GET(self):
+        if not self._round_trip():
+            return
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        match = _GMAIL.match(url.path)
+        try:
+            if match and match.group(2):
+                self._reply(200, fake.gmail._attachment(match.group(1), match.group(2)))
+            elif match and match.group(1):
+                self._reply(200, fake.gmail._get(match.group(1)))
+            elif match:
+                self._reply(200, fake.gmail._list(int(params.get('maxResults', 100)), params.get('pageToken')))
+            elif url.path == '/drive/v3/files':
+                self._reply(200, fake.drive._list(params.get('q', ''), int(params.get('pageSize', 100)),
+                                                  params.get('pageToken')))
+            else:
+                self._reply(404, {'error': {'code': 404, 'message': 'Not Found'}})
+        except KeyError as e:
+            self._reply(404, {'error': {'code': 404, 'message': str(e)}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self._round_trip():
+            return
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        match = _PERMISSIONS.match(url.path)
+        try:
+            if match:
+                self._reply(200, fake.drive._share(match.group(1), json.loads(body)))
+            elif url.path == '/drive/v3/files':
+                self._reply(200, fake.drive._create(json.loads(body)))
+            elif url.path == '/upload/drive/v3/files':
+                metadata, content = _parse_multipart(self.headers['Content-Type'], body)
+                self._reply(200, fake.drive._create(metadata, content=content))
+            else:
+                self._reply(404, {'error': {'code': 404, 'message': 'Not Found'}})
+        except FakeHttpError as e:
+            self._reply(e.resp.status, {'error': {'code': e.resp.status, 'message': str(e)}})
+
+
+def _parse_multipart(content_type, body):
+    """(metadati JSON, contenuto) di un upload multipart/related di Drive."""
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+    parts = body.split(b'--' + boundary)[1:-1]
+    metadata, content = (part.split(b'\r\n\r\n', 1)[1][:-2] for part in parts[:2])
+    return json.loads(metadata), content
+
+
+class FakeGoogleServer:
+    """
+    Avvia il server in un thread: `with FakeGoogleServer(gmail) as server:`
+    e usa server.gmail_api, server.drive_api, server.upload_api come base URL.
+    """
+
+    def __init__(self, gmail=None, drive=None, latency=0.05, handshake=0.0, quota=None, error_rate=0.0):
+        self.gmail = gmail or FakeGmailService(latency=0)
+        self.drive = drive or FakeDriveService(latency=0)
+        self.latency = latency
+        self.handshake = handshake
+        self.quota = quota
+        self.error_rate = error_rate
+        self.connections = 0
+        self.requests = 0
+        self.throttled = 0
+        self._window = (0, 0)  # (secondo corrente, unità usate)
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        base = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self.gmail_api = f"{base}/gmail/v1/users/me"
+        self.drive_api = f"{base}/drive/v3"
+        self.upload_api = f"{base}/upload/drive/v3"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def consume(self, units):
+        """Quota a finestre di un secondo: 0 se concessa, altrimenti i secondi di Retry-After."""
+        with self.lock:
+            second, used = self._window
+            now = int(time.monotonic())
+            if now != second:
+                second, used = now, 0
+            if used + units > self.quota:
+                self.throttled += 1
+                return 1
+            self._window = (second, used + units)
+            return 0
+
+    def client_options(self):
+        """Base URL per rocketbook.aio.GoogleRest."""
+        return {'gmail_api': self.gmail_api, 'drive_api': self.drive_api, 'upload_api': self.upload_api}
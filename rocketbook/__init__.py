@@ -0,0 +1,15 @@
+"""
+Rocketbook → Daily Brief Dashboard.
+Pipeline condivisa dagli script rocketbook_*.py: Gmail, allegati, Google Drive,
+note e dashboard. I client Google sono importati solo al primo uso di rete.
+"""
+
+from rocketbook.notes import clean_subject, make_note, normalize_note, parse_email_date, parse_message
+
+__all__ = [
+    "clean_subject",
+    "make_note",
+    "normalize_note",
+    "parse_email_date",
+    "parse_message",
+]
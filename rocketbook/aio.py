@@ -0,0 +1,388 @@
+"""
+Sync Rocketbook asincrono via REST: lista, dettagli, download degli allegati e
+upload su Drive in parallelo, su un pool di connessioni HTTP/1.1 keep-alive.
+
+Solo libreria standard (asyncio + ssl). Ogni connessione (e il suo handshake
+TLS) viene aperta una volta e riusata, invece di una per richiesta come con
+urllib; le richieste in volo sono limitate da un semaforo e ognuna ha il suo
+timeout. Con N messaggi il tempo passa da N×RTT a circa RTT×N/concurrency.
+"""
+
+import asyncio
+import json
+import ssl
+import urllib.parse
+import uuid
+from pathlib import Path
+
+from rocketbook.cache import get_attachment_cache
+from rocketbook.config import DRIVE_FOLDER_NAME, HTTP_CONCURRENCY, HTTP_TIMEOUT
+from rocketbook.drive import DriveFolderIndex, drive_query_string, file_md5
+from rocketbook.metrics import get_metrics
+from rocketbook.notes import parse_message
+from rocketbook.profiling import memory_section
+from rocketbook.ratelimit import get_rate_limiter, is_retryable, is_throttled
+from rocketbook.rest import GMAIL_API
+from rocketbook.settings import gmail_query, max_results as configured_max_results
+
+DRIVE_API = "https://www.googleapis.com/drive/v3"
+DRIVE_UPLOAD_API = "https://www.googleapis.com/upload/drive/v3"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id,name,md5Checksum,webViewLink"
+LIST_PAGE_SIZE = 500
+
+
+class HttpError(Exception):
+    """Risposta HTTP con status >= 400."""
+
+    def __init__(self, status, reason, body=b'', headers=None):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}  # Retry-After per il rate limiter
+
+
+class Response:
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # nomi in minuscolo
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode())
+
+
+class HttpPool:
+    """
+    Pool di connessioni keep-alive per host, al massimo `max_connections`
+    richieste in volo. Una connessione inattiva chiusa dal server viene
+    sostituita in modo trasparente (un solo nuovo tentativo).
+    """
+
+    def __init__(self, max_connections=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.opened = 0      # connessioni aperte (= handshake)
+        self.requests = 0
+        self._idle = {}      # (scheme, host, port) -> [(reader, writer)]
+        self._slots = asyncio.Semaphore(max_connections)
+        self._ssl = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _connect(self, scheme, host, port):
+        if scheme == 'https' and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        conn = await asyncio.open_connection(host, port, ssl=self._ssl if scheme == 'https' else None)
+        self.opened += 1
+        return conn
+
+    async def request(self, method, url, headers=None, body=None, timeout=None):
+        """Esegui una richiesta e restituisci la Response (qualsiasi status)."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        head = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", "Connection: keep-alive",
+                f"Content-Length: {len(body or b'')}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode() + (body or b'')
+
+        async with self._slots:
+            async with asyncio.timeout(timeout or self.timeout):
+                idle = self._idle.get(key)
+                reused = bool(idle)
+                conn = idle.pop() if idle else await self._connect(*key)
+                while True:
+                    try:
+                        response, keep_alive = await self._exchange(conn, method, payload)
+                        break
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        conn[1].close()
+                        if not reused:
+                            raise
+                        # Connessione inattiva chiusa dal server: riprova su una nuova
+                        reused = False
+                        conn = await self._connect(*key)
+                    except BaseException:
+                        # Timeout o cancellazione a metà risposta: connessione inutilizzabile
+                        conn[1].close()
+                        raise
+        self.requests += 1
+        if keep_alive:
+            self._idle.setdefault(key, []).append(conn)
+        else:
+            conn[1].close()
+        return response
+
+    async def _exchange(self, conn, method, payload):
+        reader, writer = conn
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connessione chiusa dal server")
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()  # trailer vuoto
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return Response(status, reason, headers, body), keep_alive
+
+    async def close(self):
+        conns = [conn for idle in self._idle.values() for conn in idle]
+        self._idle.clear()
+        for _, writer in conns:
+            writer.close()
+        for _, writer in conns:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+
+class GoogleRest:
+    """
+    Chiamate JSON a Gmail e Drive con il token di gcloud, sul pool condiviso.
+    Ogni chiamata passa dal rate limiter con il methodId dell'API (quota e retry).
+    """
+
+    def __init__(self, access_token, pool, gmail_api=GMAIL_API, drive_api=DRIVE_API,
+                 upload_api=DRIVE_UPLOAD_API, limiter=None):
+        self.pool = pool
+        self.limiter = limiter or get_rate_limiter()
+        self.gmail_api = gmail_api
+        self.drive_api = drive_api
+        self.upload_api = upload_api
+        self._auth = {"Authorization": f"Bearer {access_token}"}
+
+    async def call(self, method_id, http_method, url, params=None, body=None, content_type='application/json'):
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        headers = dict(self._auth)
+        if body is not None:
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            headers['Content-Type'] = content_type
+
+        async def attempt():
+            response = await self.pool.request(http_method, url, headers, body)
+            if response.status >= 400:
+                raise HttpError(response.status, response.reason, response.body, response.headers)
+            return response.json() if response.body else {}
+
+        return await self.limiter.acall(method_id, attempt)
+
+    async def list_message_ids(self, query, max_results):
+        """ID dei messaggi, seguendo nextPageToken fino a max_results."""
+        ids = []
+        page_token = None
+        while len(ids) < max_results:
+            params = {'q': query, 'maxResults': min(LIST_PAGE_SIZE, max_results - len(ids))}
+            if page_token:
+                params['pageToken'] = page_token
+            data = await self.call('gmail.users.messages.list', 'GET', f"{self.gmail_api}/messages", params)
+            ids.extend(m['id'] for m in data.get('messages', []))
+            page_token = data.get('nextPageToken')
+            if not page_token:
+                break
+        return ids[:max_results]
+
+    async def get_message(self, msg_id):
+        return await self.call('gmail.users.messages.get', 'GET', f"{self.gmail_api}/messages/{msg_id}",
+                               {'format': 'full'})
+
+    async def get_attachment(self, msg_id, attachment_id):
+        return await self.call('gmail.users.messages.attachments.get', 'GET',
+                               f"{self.gmail_api}/messages/{msg_id}/attachments/{attachment_id}")
+
+    async def create_once(self, create, find):
+        """Come rocketbook.drive.create_once: dopo un 5xx o un errore di rete find() prima di ritentare create()."""
+        attempt = 0
+        while True:
+            try:
+                return await create()
+            except Exception as e:
+                if is_throttled(e) or not is_retryable(e) or attempt >= self.limiter.max_retries:
+                    raise
+            await asyncio.sleep(self.limiter.retry_delay(attempt))
+            attempt += 1
+            existing = await find()
+            if existing:
+                return existing
+
+    async def get_or_create_folder(self, folder_name):
+        query = f"mimeType='{FOLDER_MIME}' and name='{folder_name}' and trashed=false"
+
+        async def find():
+            data = await self.call('drive.files.list', 'GET', f"{self.drive_api}/files",
+                                   {'q': query, 'fields': 'files(id,name)'})
+            return data['files'][0] if data.get('files') else None
+
+        folder = await find()
+        if folder:
+            return folder['id']
+        folder = await self.create_once(
+            lambda: self.call('drive.files.create', 'POST', f"{self.drive_api}/files", {'fields': 'id'},
+                              {'name': folder_name, 'mimeType': FOLDER_MIME}),
+            find)
+        print(f"📁 Creata cartella: {folder_name}")
+        return folder['id']
+
+    async def list_folder(self, folder_id):
+        """File già presenti nella cartella, in un DriveFolderIndex (per md5 e nome) solo in memoria."""
+        index = DriveFolderIndex(folder_id, index_file=None)
+        page_token = None
+        while True:
+            params = {'q': f"'{folder_id}' in parents and trashed=false",
+                      'fields': f"nextPageToken,files({FILE_FIELDS})", 'pageSize': 1000}
+            if page_token:
+                params['pageToken'] = page_token
+            data = await self.call('drive.files.list', 'GET', f"{self.drive_api}/files", params)
+            for file in data.get('files', []):
+                index.add(file)
+            page_token = data.get('nextPageToken')
+            if not page_token:
+                return index
+
+    async def find_file(self, folder_id, filename, md5):
+        """File della cartella con questo nome e contenuto (md5Checksum); None se non c'è."""
+        query = f"name='{drive_query_string(filename)}' and '{folder_id}' in parents and trashed=false"
+        data = await self.call('drive.files.list', 'GET', f"{self.drive_api}/files",
+                               {'q': query, 'fields': f"files({FILE_FIELDS})"})
+        return next((f for f in data.get('files', []) if f.get('md5Checksum') == md5), None)
+
+    async def upload(self, folder_id, filename, content, md5):
+        """
+        Upload multipart (metadati + PDF) in una sola richiesta. files.create non è
+        idempotente: dopo un 5xx o un errore di rete, prima di ritentare, il file
+        viene cercato nella cartella per nome e md5 (come DriveClient.upload).
+        """
+        boundary = uuid.uuid4().hex
+        metadata = json.dumps({'name': filename, 'parents': [folder_id]})
+        body = (f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{metadata}\r\n"
+                f"--{boundary}\r\nContent-Type: application/pdf\r\n\r\n").encode() + content + \
+            f"\r\n--{boundary}--\r\n".encode()
+        return await self.create_once(
+            lambda: self.call('drive.files.create', 'POST', f"{self.upload_api}/files",
+                              {'uploadType': 'multipart', 'fields': FILE_FIELDS}, body,
+                              content_type=f"multipart/related; boundary={boundary}"),
+            lambda: self.find_file(folder_id, filename, md5))
+
+    async def share(self, file_id):
+        await self.call('drive.permissions.create', 'POST', f"{self.drive_api}/files/{file_id}/permissions", None,
+                        {'type': 'anyone', 'role': 'reader'})
+
+
+async def _download(client, att):
+    """Path dell'allegato nella cache locale, scaricandolo solo se manca."""
+    cache = get_attachment_cache()
+    cached = cache.get(att['message_id'], att['filename'])
+    if cached is None:
+        data = await client.get_attachment(att['message_id'], att['id'])
+        get_metrics().add_bytes('download', len(data['data']))
+        # Decodifica e scrittura su disco fuori dall'event loop
+        cached = await asyncio.to_thread(cache.put_encoded, att['message_id'], att['filename'],
+                                         data['data'], att['filename'])
+        print(f"📥 Scaricato: {att['filename']} ({cached.stat().st_size} bytes)")
+    return str(cached)
+
+
+async def _upload(client, folder, path, filename):
+    """
+    Link Drive dell'allegato: caricato e condiviso solo se non è già nella cartella
+    (stesso contenuto, o stesso nome con md5 ignoto; vedi DriveFolderIndex.lookup).
+    Un lock per nome serializza i task con lo stesso file: il secondo trova il primo nell'indice.
+    """
+    folder_id, index, locks = folder
+    md5 = await asyncio.to_thread(file_md5, path)
+    async with locks.setdefault(filename, asyncio.Lock()):
+        file = index.lookup(filename, md5)
+        if file is None:
+            content = await asyncio.to_thread(Path(path).read_bytes)
+            get_metrics().add_bytes('upload', len(content))
+            file = await client.upload(folder_id, filename, content, md5)
+            await client.share(file['id'])
+            index.add(file)
+            print(f"📤 Caricato su Drive: {filename}")
+    return file.get('webViewLink')
+
+
+async def _sync_message(client, msg_id, folder, paths):
+    try:
+        note = parse_message(await client.get_message(msg_id))
+        if not note:
+            return None
+        links = []
+        for att in note.get('attachments', []):
+            path = await _download(client, att)
+            paths[(att['message_id'], att['filename'])] = path
+            if folder is not None:
+                links.append(await _upload(client, folder, path, att['filename']))
+        # Con l'upload la card apre il PDF su Drive invece del messaggio
+        if any(links):
+            note['url'] = next(link for link in links if link)
+        return note
+    except Exception as e:
+        print(f"⚠️ Errore sync messaggio {msg_id}: {e}")
+        return None
+
+
+async def sync_rest(access_token, query=None, max_results=None, upload=False,
+                    folder_name=DRIVE_FOLDER_NAME, concurrency=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT,
+                    limiter=None, client_options=None):
+    """
+    Sync completo su un unico pool: lista, poi per ogni messaggio dettagli,
+    download degli allegati e (con upload=True) caricamento su Drive, tutti
+    in parallelo. Restituisce (note nell'ordine della lista,
+    {(message_id, filename): path}, statistiche del pool).
+    Query e max_results di default: rocketbook-config.json (email recenti).
+    """
+    if query is None:
+        query = gmail_query(recent=True)
+    if max_results is None:
+        max_results = configured_max_results()
+    async with HttpPool(concurrency, timeout) as pool:
+        client = GoogleRest(access_token, pool, limiter=limiter, **(client_options or {}))
+        msg_ids = await client.list_message_ids(query, max_results)
+        print(f"📧 Trovate {len(msg_ids)} email")
+
+        folder = None
+        if upload and msg_ids:
+            folder_id = await client.get_or_create_folder(folder_name)
+            folder = (folder_id, await client.list_folder(folder_id), {})
+
+        paths = {}
+        with memory_section('allegati'):
+            results = await asyncio.gather(*(_sync_message(client, msg_id, folder, paths) for msg_id in msg_ids))
+        get_attachment_cache().save()
+        stats = {'requests': pool.requests, 'connections': pool.opened}
+    return [note for note in results if note], paths, stats
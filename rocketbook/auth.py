@@ -0,0 +1,130 @@
+"""
+Autenticazione OAuth e costruzione dei client Google.
+Le librerie Google sono importate dentro le funzioni: i comandi che non
+usano la rete non pagano il loro tempo di import.
+"""
+
+import json
+import threading
+
+from rocketbook.config import CREDENTIALS_FILE, DISCOVERY_DIR, DRIVE_TOKEN_FILE, TOKEN_FILE
+
+GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+INSTALL_HINT = "pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-python-client"
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/{name}/{version}/rest"
+
+# I worker delle pipeline non devono avviare login o refresh in parallelo
+_auth_lock = threading.Lock()
+
+# Discovery document già letti nel processo, per (nome, versione)
+_discovery_docs = {}
+
+
+def load_credentials(scopes, token_file, credentials_file=CREDENTIALS_FILE):
+    """Carica (o rinnova, o richiedi via browser) le credenziali OAuth; None se mancano."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    creds = None
+
+    with _auth_lock:
+        # Carica token esistente
+        if token_file.exists():
+            creds = Credentials.from_authorized_user_file(str(token_file), scopes)
+
+        # Se non ci sono credenziali valide, fai login
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            elif credentials_file.exists():
+                flow = InstalledAppFlow.from_client_secrets_file(str(credentials_file), scopes)
+                creds = flow.run_local_server(port=0)
+            else:
+                print("❌ File credentials.json non trovato")
+                print("📋 Scarica le credenziali da Google Cloud Console:")
+                print("   https://console.cloud.google.com/apis/credentials")
+                return None
+
+            # Salva token
+            with open(token_file, 'w') as token:
+                token.write(creds.to_json())
+
+    return creds
+
+
+def _fetch_discovery_document(name, version):
+    """Scarica il discovery document (nessuna autenticazione richiesta); None se fallisce."""
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(DISCOVERY_URL.format(name=name, version=version), timeout=30) as response:
+            return response.read().decode('utf-8')
+    except OSError as e:
+        print(f"⚠️ Discovery document {name} {version} non scaricabile: {e}")
+        return None
+
+
+def discovery_document(name, version, cache_dir=DISCOVERY_DIR):
+    """
+    Discovery document statico per l'API, letto una volta per processo.
+    Ordine: cache locale, copia inclusa in google-api-python-client (>= 2.0),
+    download. La prima copia trovata fuori cache viene salvata in cache_dir.
+    """
+    key = (name, version)
+    if key in _discovery_docs:
+        return _discovery_docs[key]
+
+    path = cache_dir / f"{name}.{version}.json"
+    doc = path.read_text() if path.exists() else None
+
+    if doc is None:
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            doc = get_static_doc(name, version)
+        except ImportError:
+            doc = None
+        if doc is None:
+            doc = _fetch_discovery_document(name, version)
+        if doc is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = path.with_name(path.name + '.tmp')
+            tmp_file.write_text(doc)
+            tmp_file.replace(path)
+
+    _discovery_docs[key] = json.loads(doc) if doc is not None else None
+    return _discovery_docs[key]
+
+
+def build_service(name, version, creds):
+    """Costruisci un client googleapiclient dal discovery document statico."""
+    from googleapiclient.discovery import build, build_from_document
+
+    doc = discovery_document(name, version)
+    if doc is None:
+        # Nessuna copia locale: lascia che googleapiclient la recuperi
+        return build(name, version, credentials=creds)
+    return build_from_document(doc, credentials=creds)
+
+
+def get_gmail_service():
+    """Autentica e restituisci servizio Gmail API."""
+    try:
+        creds = load_credentials(GMAIL_SCOPES, TOKEN_FILE)
+        return build_service('gmail', 'v1', creds) if creds else None
+    except ImportError as e:
+        print(f"❌ Modulo mancante: {e}")
+        print(f"📦 Installa con: {INSTALL_HINT}")
+        return None
+
+
+def get_drive_credentials():
+    """Credenziali OAuth per Drive API."""
+    return load_credentials(DRIVE_SCOPES, DRIVE_TOKEN_FILE)
+
+
+def build_drive_service():
+    """Autentica e costruisci il servizio Drive API (carica il discovery document)."""
+    creds = get_drive_credentials()
+    return build_service('drive', 'v3', creds) if creds else None
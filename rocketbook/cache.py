@@ -0,0 +1,240 @@
+"""
+Cache su disco degli allegati PDF Rocketbook.
+I file sono salvati per contenuto (SHA-256) e indicizzati per messaggio/allegato,
+così i sync successivi non riscaricano né ridecodificano gli stessi PDF.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from rocketbook.config import CACHE_ROOT
+from rocketbook.metrics import get_metrics
+
+# Configurazione (fuori dalla checkout della dashboard: `git add -A` non deve vederla)
+CACHE_DIR = Path(os.environ.get("ROCKETBOOK_CACHE_DIR", CACHE_ROOT / "attachments"))
+CACHE_MAX_BYTES = int(os.environ.get("ROCKETBOOK_CACHE_MAX_MB", "512")) * 1024 * 1024
+DECODE_CHUNK = 1024 * 1024  # caratteri base64 decodificati per blocco (multiplo di 4)
+
+
+def decode_base64url_to_file(encoded, fileobj, chunk_size=DECODE_CHUNK):
+    """
+    Decodifica base64url a blocchi scrivendo direttamente su fileobj.
+    Non crea mai il buffer decodificato completo. Restituisce (sha256, size).
+    """
+    chunk_size -= chunk_size % 4
+    digest = hashlib.sha256()
+    size = 0
+
+    for start in range(0, len(encoded), chunk_size):
+        chunk = encoded[start:start + chunk_size]
+        # Solo l'ultimo blocco può avere padding mancante
+        if len(chunk) % 4:
+            chunk += "=" * (-len(chunk) % 4)
+        data = base64.urlsafe_b64decode(chunk)
+        digest.update(data)
+        fileobj.write(data)
+        size += len(data)
+
+    return digest.hexdigest(), size
+
+
+def atomic_write_path(path):
+    """Path temporaneo univoco accanto a `path`, da rinominare con os.replace."""
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+class AttachmentCache:
+    """
+    Store content-addressed degli allegati.
+
+    - objects/<sha[:2]>/<sha>.pdf contiene i byte (un solo file per contenuto)
+    - index.json mappa "<message_id>/<chiave allegato>" -> sha256, size, last_used
+    - oltre max_bytes vengono rimossi i contenuti usati meno di recente (LRU);
+      il totale dei byte è tenuto aggiornato a ogni aggiunta e rimozione, quindi
+      l'indice viene scorso solo quando si supera il limite
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_file = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._entries = self._load_index()
+        self._refs = {}   # sha256 -> chiavi che lo puntano
+        self._bytes = 0   # byte dei contenuti indicizzati (i condivisi contano una volta)
+        for entry in self._entries.values():
+            self._track(entry)
+
+    def _load_index(self):
+        if self.index_file.exists():
+            try:
+                with open(self.index_file) as f:
+                    return json.load(f).get("entries", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Indice cache illeggibile, verrà ricreato: {e}")
+        return {}
+
+    def save(self):
+        """Scrive l'indice su disco in modo atomico."""
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.index_file.with_suffix(".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump({"entries": self._entries}, f, indent=2)
+            os.replace(tmp_file, self.index_file)
+
+    def _track(self, entry):
+        refs = self._refs.get(entry["sha256"], 0)
+        if not refs:
+            self._bytes += entry["size"]
+        self._refs[entry["sha256"]] = refs + 1
+
+    def _untrack(self, entry):
+        refs = self._refs.pop(entry["sha256"]) - 1
+        if refs:
+            self._refs[entry["sha256"]] = refs
+        else:
+            self._bytes -= entry["size"]
+
+    @staticmethod
+    def key(message_id, attachment_key):
+        return f"{message_id}/{attachment_key}"
+
+    def object_path(self, sha256):
+        return self.objects_dir / sha256[:2] / f"{sha256}.pdf"
+
+    def get(self, message_id, attachment_key):
+        """Path del PDF in cache, oppure None (miss)."""
+        with self._lock:
+            entry = self._entries.get(self.key(message_id, attachment_key))
+            if entry:
+                path = self.object_path(entry["sha256"])
+                if path.exists():
+                    entry["last_used"] = time.time()
+                    self.hits += 1
+                    get_metrics().count_cache(hit=True)
+                    return path
+                # Oggetto rimosso a mano: l'entry non è più valida
+                self._untrack(self._entries.pop(self.key(message_id, attachment_key)))
+            self.misses += 1
+            get_metrics().count_cache(hit=False)
+            return None
+
+    def put(self, message_id, attachment_key, data, filename=None):
+        """Salva i byte in cache e restituisci il path dell'oggetto."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha256)
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = atomic_write_path(path)
+            with open(tmp_file, "wb") as f:
+                f.write(data)
+            os.replace(tmp_file, path)
+
+        return self.add(message_id, attachment_key, sha256, len(data), filename)
+
+    def put_encoded(self, message_id, attachment_key, encoded, filename=None):
+        """
+        Come put(), ma riceve il base64url della Gmail API e lo decodifica
+        a blocchi direttamente su disco (temp file + rename atomico).
+        """
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = atomic_write_path(self.objects_dir / "incoming")
+        try:
+            start = time.perf_counter()
+            with open(tmp_file, "wb") as f:
+                sha256, size = decode_base64url_to_file(encoded, f)
+            get_metrics().observe("decode", time.perf_counter() - start, size)
+            path = self.object_path(sha256)
+            if path.exists():
+                tmp_file.unlink()
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_file, path)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
+        return self.add(message_id, attachment_key, sha256, size, filename)
+
+    def add(self, message_id, attachment_key, sha256, size, filename=None):
+        """Registra nell'indice un oggetto già presente in objects/."""
+        with self._lock:
+            key = self.key(message_id, attachment_key)
+            if key in self._entries:
+                self._untrack(self._entries[key])
+            self._entries[key] = entry = {
+                "sha256": sha256,
+                "size": size,
+                "filename": filename,
+                "last_used": time.time(),
+            }
+            self._track(entry)
+            if self._bytes > self.max_bytes:
+                self.evict()
+            return self.object_path(sha256)
+
+    def total_bytes(self):
+        """Byte occupati dagli oggetti (i contenuti condivisi contano una volta)."""
+        with self._lock:
+            return self._bytes
+
+    def evict(self):
+        """Rimuovi i contenuti usati meno di recente finché si rientra in max_bytes."""
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return 0
+            # last_used di un contenuto = uso più recente tra le chiavi che lo puntano
+            objects = {}
+            for key, entry in self._entries.items():
+                last_used, keys = objects.setdefault(entry["sha256"], [0, []])
+                objects[entry["sha256"]][0] = max(last_used, entry["last_used"])
+                keys.append(key)
+
+            evicted = 0
+            for sha256, (_, keys) in sorted(objects.items(), key=lambda item: item[1][0]):
+                # Il contenuto appena aggiunto resta sempre in cache
+                if self._bytes <= self.max_bytes or len(objects) - evicted <= 1:
+                    break
+                for key in keys:
+                    self._untrack(self._entries.pop(key))
+                try:
+                    self.object_path(sha256).unlink()
+                except FileNotFoundError:
+                    pass
+                evicted += 1
+            return evicted
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes(),
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"📦 Cache allegati: {s['hits']} hit, {s['misses']} miss, "
+                f"{s['entries']} file ({s['bytes'] / (1024 * 1024):.1f} MB)")
+
+
+_default_cache = None
+
+
+def get_attachment_cache():
+    """Cache condivisa del processo (creata al primo uso)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AttachmentCache()
+    return _default_cache
@@ -0,0 +1,29 @@
+"""
+File della dashboard scritti da questo processo (index.html, JSON delle note,
+PDF e miniature), da passare al commit di rocketbook.publish.
+
+Chi scrive un file pubblicato chiama record(path); il publisher committa solo
+quei percorsi invece di scandire rocketbook_pdfs/ e rocketbook_thumbs/.
+Modulo senza dipendenze: store, dashboard, gmail e thumbnails lo importano
+senza caricare la pubblicazione.
+"""
+
+import os
+import threading
+
+_written = set()
+_lock = threading.Lock()
+
+
+def record(*paths):
+    """Registra i file appena scritti."""
+    with _lock:
+        _written.update(os.path.abspath(path) for path in paths)
+
+
+def drain():
+    """Path registrati dall'ultima chiamata, ordinati; il registro si svuota."""
+    with _lock:
+        paths = sorted(_written)
+        _written.clear()
+    return paths
@@ -0,0 +1,97 @@
+"""
+Configurazione condivisa: percorsi della dashboard, cache locali e costanti Gmail.
+"""
+
+import os
+from pathlib import Path
+
+# Checkout della dashboard (GitHub Pages)
+DASHBOARD_DIR = Path(os.environ.get("ROCKETBOOK_DASHBOARD_DIR", "/tmp/daily-brief-ghpages"))
+INDEX_FILE = DASHBOARD_DIR / "index.html"
+DATA_FILE = DASHBOARD_DIR / "rocketbook_data.json"
+NOTES_FILE = DASHBOARD_DIR / "rocketbook_notes.json"
+PDF_DIR = DASHBOARD_DIR / "rocketbook_pdfs"
+SYNC_STATE_FILE = DASHBOARD_DIR / "rocketbook_sync_state.json"
+
+# Credenziali Google
+CREDENTIALS_FILE = DASHBOARD_DIR / "credentials.json"
+TOKEN_FILE = DASHBOARD_DIR / "token.json"
+DRIVE_TOKEN_FILE = DASHBOARD_DIR / "drive_token.json"
+
+# Stato locale fuori dalla checkout: `git add -A` non deve vederlo
+CACHE_ROOT = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "rocketbook"
+
+# Storico completo delle note (anche questo fuori dalla checkout)
+DATA_ROOT = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "rocketbook"
+NOTES_DB = Path(os.environ.get("ROCKETBOOK_DB", DATA_ROOT / "notes.db"))
+
+# Backend dello storico: "sqlite" oppure "journal" (snapshot JSON + journal JSONL, senza database)
+STORE_BACKEND = os.environ.get("ROCKETBOOK_STORE", "sqlite")
+JOURNAL_DIR = Path(os.environ.get("ROCKETBOOK_JOURNAL_DIR", DATA_ROOT / "journal"))
+JOURNAL_COMPACT_LINES = int(os.environ.get("ROCKETBOOK_JOURNAL_COMPACT_LINES", "1000"))  # 0 = solo manuale
+
+# Discovery document Google in cache: build() non li scarica né cerca a ogni avvio
+DISCOVERY_DIR = Path(os.environ.get("ROCKETBOOK_DISCOVERY_DIR", CACHE_ROOT / "discovery"))
+
+# Testo estratto dai PDF, per hash del contenuto
+PDF_TEXT_CACHE = CACHE_ROOT / "pdf_text.json"
+EXTRACT_WORKERS = int(os.environ.get("ROCKETBOOK_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# Miniature della prima pagina (pubblicate con la dashboard), indice in cache
+THUMB_DIR = DASHBOARD_DIR / "rocketbook_thumbs"
+THUMB_INDEX = CACHE_ROOT / "thumbnails.json"
+THUMB_WORKERS = int(os.environ.get("ROCKETBOOK_THUMB_WORKERS", EXTRACT_WORKERS))
+
+# Gmail
+GMAIL_USER = "anselmoacquah@gmail.com"
+ROCKETBOOK_SENDER = "notes@email.getrocketbook.com"
+# Query, maxResults e pianificazione: rocketbook-config.json (rocketbook.settings, letto al primo uso)
+SETTINGS_FILE = Path(os.environ.get("ROCKETBOOK_CONFIG", DASHBOARD_DIR / "rocketbook-config.json"))
+MAX_RESULTS = int(os.environ["ROCKETBOOK_MAX_RESULTS"]) if os.environ.get("ROCKETBOOK_MAX_RESULTS") else None
+
+# Quote per utente (unità al secondo) e tentativi per le risposte 429/5xx
+GMAIL_QUOTA_PER_SECOND = float(os.environ.get("ROCKETBOOK_GMAIL_QUOTA", "250"))
+DRIVE_QUOTA_PER_SECOND = float(os.environ.get("ROCKETBOOK_DRIVE_QUOTA", "200"))
+MAX_RETRIES = int(os.environ.get("ROCKETBOOK_MAX_RETRIES", "5"))
+
+# Sync REST asincrono (rocketbook_sync.py): richieste in volo e timeout per richiesta
+HTTP_CONCURRENCY = int(os.environ.get("ROCKETBOOK_HTTP_CONCURRENCY", "8"))
+HTTP_TIMEOUT = float(os.environ.get("ROCKETBOOK_HTTP_TIMEOUT", "30"))
+
+# Import storico (rocketbook_gmail.py --backfill): email per blocco e checkpoint per riprendere
+BACKFILL_BATCH = int(os.environ.get("ROCKETBOOK_BACKFILL_BATCH", "100"))
+BACKFILL_STATE_FILE = DATA_ROOT / "backfill_state.json"
+
+# Note esportate nei JSON della dashboard (lo storico resta nello store)
+EXPORT_LIMIT = int(os.environ.get("ROCKETBOOK_EXPORT_LIMIT", "10"))
+
+# Google Drive
+DRIVE_FOLDER_NAME = "Rocketbook Scans"
+
+# GitHub
+GITHUB_REPO = "slemo54/daily-brief-dashboard"
+
+# Coda di pubblicazione: le modifiche entro PUBLISH_DEBOUNCE secondi finiscono in un solo commit
+PUBLISH_DEBOUNCE = float(os.environ.get("ROCKETBOOK_PUBLISH_DEBOUNCE", "10"))
+PUBLISH_STATE = CACHE_ROOT / "publish_queue.json"
+PUBLISH_LOG = CACHE_ROOT / "publish.log"
+
+# Metriche per stadio: una riga JSON per esecuzione, più il textfile Prometheus se indicata la directory
+METRICS_FILE = Path(os.environ.get("ROCKETBOOK_METRICS_FILE", DATA_ROOT / "metrics.jsonl"))
+PROMETHEUS_DIR = Path(os.environ["ROCKETBOOK_PROMETHEUS_DIR"]) if os.environ.get("ROCKETBOOK_PROMETHEUS_DIR") else None
+
+# Profili di `--profile` (pstats o stack collapsed)
+PROFILE_DIR = Path(os.environ.get("ROCKETBOOK_PROFILE_DIR", CACHE_ROOT / "profiles"))
+
+# Daemon (rocketbook_gmail.py --daemon): polling adattivo tra min e max secondi,
+# notifiche Gmail via Pub/Sub (users.watch sul topic) recapitate al webhook locale
+POLL_MIN_INTERVAL = float(os.environ.get("ROCKETBOOK_POLL_MIN", "30"))
+POLL_MAX_INTERVAL = float(os.environ.get("ROCKETBOOK_POLL_MAX", "600"))
+PUBSUB_TOPIC = os.environ.get("ROCKETBOOK_PUBSUB_TOPIC")  # es. projects/<progetto>/topics/gmail
+WEBHOOK_HOST = os.environ.get("ROCKETBOOK_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("ROCKETBOOK_WEBHOOK_PORT", "0"))  # 0 = webhook disattivato
+WEBHOOK_TOKEN = os.environ.get("ROCKETBOOK_WEBHOOK_TOKEN")  # ?token=... della subscription push
+DAEMON_LOCK = CACHE_ROOT / "daemon.lock"
+
+# Scheduler (rocketbook_gmail.py --schedule): lock per job, condiviso con altri processi
+SCHEDULE_LOCK_DIR = CACHE_ROOT / "schedule"
@@ -0,0 +1,239 @@
+"""
+Daemon di sync (`rocketbook_gmail.py --daemon`): un processo residente al posto
+del cron giornaliero, con credenziali e client Gmail costruiti una volta sola.
+
+Un ciclo parte quando:
+- arriva una notifica Gmail: users.watch pubblica su un topic Pub/Sub, la
+  subscription push la consegna al webhook locale (WEBHOOK_PORT), che sveglia
+  il daemon; una POST senza corpo sveglia il daemon comunque (prove, curl)
+- scade l'intervallo di polling: POLL_MIN_INTERVAL dopo un ciclo con email
+  nuove, poi raddoppia a ogni ciclo a vuoto fino a POLL_MAX_INTERVAL. Con il
+  webhook attivo il polling resta come rete di sicurezza, sempre al massimo
+
+Prima del sync, users.getProfile (1 unità di quota) confronta l'historyId
+della casella con il checkpoint: se non è cambiato nulla il ciclo finisce lì.
+Altrimenti sync_notes legge solo il delta dalla history API, come il cron, e
+la pubblicazione passa dalla coda con debounce di rocketbook.publish.
+"""
+
+import base64
+import fcntl
+import json
+import signal
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from rocketbook.config import (DAEMON_LOCK, POLL_MAX_INTERVAL, POLL_MIN_INTERVAL, PUBSUB_TOPIC, WEBHOOK_HOST,
+                               WEBHOOK_PORT, WEBHOOK_TOKEN)
+from rocketbook.dashboard import update_dashboard
+from rocketbook.gmail import download_note_attachments, load_sync_state, sync_notes
+from rocketbook.metrics import flush as flush_metrics
+from rocketbook.pdftext import describe_notes
+from rocketbook.pipeline import execute
+from rocketbook.publish import request_publish
+from rocketbook.store import export_notes, recent_notes, upsert_notes
+from rocketbook.thumbnails import attach_thumbnails
+
+WATCH_RENEW = 24 * 3600  # Google consiglia di rinnovare users.watch ogni giorno (scade dopo 7)
+
+
+def _now():
+    return f"{datetime.now():%H:%M:%S}"
+
+
+def parse_notification(body):
+    """
+    historyId da una notifica push di Pub/Sub ({"message": {"data": base64(JSON)}});
+    None se il corpo è vuoto o la notifica non lo contiene. ValueError se malformata.
+    """
+    if not body.strip():
+        return None
+    envelope = json.loads(body)
+    data = envelope.get('message', {}).get('data')
+    if not data:
+        return None
+    payload = json.loads(base64.b64decode(data))
+    history_id = payload.get('historyId')
+    return int(history_id) if history_id is not None else None
+
+
+class AdaptivePoll:
+    """Intervallo di polling: minimo dopo un ciclo con novità, raddoppiato a ogni ciclo a vuoto."""
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+
+    def update(self, active):
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+        return self.interval
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        daemon = self.server.daemon
+        if daemon.webhook_token:
+            token = parse_qs(urlparse(self.path).query).get('token', [None])[0]
+            if token != daemon.webhook_token:
+                self._reply(403)
+                return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            history_id = parse_notification(body)
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"⚠️ [{_now()}] Notifica non valida: {e}")
+            self._reply(400)
+            return
+        # 2xx subito: Pub/Sub ritenta le consegne non confermate
+        self._reply(204)
+        daemon.notify(history_id)
+
+
+class SyncDaemon:
+    """Loop del daemon: attende notifiche o il timer di polling ed esegue i sync delta."""
+
+    def __init__(self, service, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 topic=PUBSUB_TOPIC, webhook_host=WEBHOOK_HOST, webhook_port=WEBHOOK_PORT,
+                 webhook_token=WEBHOOK_TOKEN, publish=request_publish):
+        self.service = service
+        self.poll = AdaptivePoll(min_interval, max_interval)
+        self.topic = topic
+        self.webhook_token = webhook_token
+        self.publish = publish
+        self.checkpoint = 0        # historyId già sincronizzato
+        self.watch_renewed = None  # time.monotonic() dell'ultimo users.watch
+        self.cycles = {'sync': 0, 'idle': 0, 'errors': 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._server = None
+        if webhook_port:
+            self._server = ThreadingHTTPServer((webhook_host, webhook_port), _WebhookHandler)
+            self._server.daemon = self
+
+    @property
+    def webhook_address(self):
+        return self._server.server_address if self._server else None
+
+    def notify(self, history_id=None):
+        """Notifica dal webhook: sveglia il loop se la casella è andata oltre il checkpoint."""
+        if history_id is None or history_id > self.checkpoint:
+            print(f"🔔 [{_now()}] Notifica Gmail (historyId {history_id or '?'})")
+            self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def renew_watch(self):
+        """users.watch sul topic Pub/Sub, se configurato e non rinnovato nelle ultime 24 ore."""
+        if not self.topic:
+            return
+        if self.watch_renewed is not None and time.monotonic() - self.watch_renewed < WATCH_RENEW:
+            return
+        try:
+            response = execute(self.service.users().watch(userId='me', body={'topicName': self.topic}),
+                               self.service)
+            self.watch_renewed = time.monotonic()
+            expiration = datetime.fromtimestamp(int(response['expiration']) / 1000)
+            print(f"👀 [{_now()}] Watch Gmail su {self.topic} fino al {expiration:%d/%m %H:%M}")
+        except Exception as e:
+            # Senza watch restano le notifiche già attive e il polling
+            print(f"⚠️ [{_now()}] users.watch fallito, solo polling: {e}")
+
+    def has_changes(self):
+        """La casella è cambiata dall'ultimo sync? (users.getProfile, 1 unità di quota)."""
+        if not self.checkpoint:
+            return True
+        profile = execute(self.service.users().getProfile(userId='me'), self.service)
+        return int(profile.get('historyId') or 0) > self.checkpoint
+
+    def sync(self):
+        """Sync delta: email nuove, allegati, storico, dashboard e coda di pubblicazione."""
+        notes, new_notes = sync_notes(self.service)
+        if new_notes:
+            # Tutte le note, come rocketbook_gmail.py: un full scan di ripiego sostituisce quelle salvate
+            paths = download_note_attachments(self.service, notes)
+            describe_notes(notes, paths)
+            attach_thumbnails(notes, paths)
+            upsert_notes('dashboard', notes)
+            if update_dashboard(recent_notes('dashboard')):
+                export_notes('dashboard')
+                self.publish()
+            # Totali e istogrammi cumulativi dall'avvio del daemon, p50/p95 sulle ultime operazioni
+            flush_metrics('daemon')
+        self.checkpoint = int(load_sync_state().get('history_id') or 0)
+        return new_notes
+
+    def cycle(self, notified=False):
+        """Un ciclo; True se ha trovato email nuove."""
+        self.renew_watch()
+        try:
+            if not notified and not self.has_changes():
+                self.cycles['idle'] += 1
+                return False
+            new_notes = self.sync()
+            self.cycles['sync'] += 1
+            print(f"✅ [{_now()}] {len(new_notes)} nuove note")
+            return bool(new_notes)
+        except Exception as e:
+            # Il daemon non si ferma per un errore di rete o di quota: riprova al prossimo ciclo
+            self.cycles['errors'] += 1
+            print(f"⚠️ [{_now()}] Sync fallito: {e}")
+            return False
+
+    def run(self):
+        """Loop fino a stop() (SIGTERM/SIGINT): primo sync all'avvio, poi notifiche e polling."""
+        if self._server:
+            threading.Thread(target=self._server.serve_forever, name='webhook', daemon=True).start()
+            host, port = self.webhook_address[:2]
+            print(f"📡 Webhook Pub/Sub su http://{host}:{port}/")
+        try:
+            active = self.cycle(notified=True)
+            while not self._stop.is_set():
+                interval = self.poll.update(active)
+                if self._server:
+                    interval = self.poll.max_interval
+                notified = self._wake.wait(interval)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                active = self.cycle(notified)
+        finally:
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+        print(f"🛑 Daemon fermato: {self.cycles['sync']} sync, {self.cycles['idle']} controlli a vuoto, "
+              f"{self.cycles['errors']} errori")
+
+
+def run_daemon(service, lock_file=DAEMON_LOCK, **kwargs):
+    """Avvia il daemon in primo piano; un solo daemon per macchina (flock su lock_file)."""
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"❌ Daemon già in esecuzione (lock {lock_file})")
+            return False
+        daemon = SyncDaemon(service, **kwargs)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: daemon.stop())
+        print(f"🔄 Daemon avviato: polling {daemon.poll.min_interval:g}-{daemon.poll.max_interval:g}s"
+              + (f", watch su {daemon.topic}" if daemon.topic else ""))
+        daemon.run()
+    return True
@@ -0,0 +1,207 @@
+"""
+Rendering della sezione Rocketbook di index.html.
+La dashboard viene analizzata una volta sola: gli slot (container Rocketbook,
+contatore KPI, data di aggiornamento) sono individuati seguendo l'annidamento
+dei tag, e ogni aggiornamento ricompone il documento in un unico passaggio.
+"""
+
+import html
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from rocketbook import changes
+from rocketbook.config import INDEX_FILE
+from rocketbook.metrics import timer
+from rocketbook.profiling import memory_section
+
+MAX_VISIBLE_NOTES = 6
+
+# Apertura di ogni slot (id univoci nella pagina) e tag che lo chiude
+SLOT_ANCHORS = {
+    'rocketbook': ('<div id="rocketbook-container">', 'div'),
+    'count': ('<div class="kpi-value" id="rocketbook-count">', 'div'),
+    'updated': ('<span id="last-updated">', 'span'),
+}
+_TAGS = {
+    'div': re.compile(r'<(/?)div\b[^>]*>', re.IGNORECASE),
+    'span': re.compile(r'<(/?)span\b[^>]*>', re.IGNORECASE),
+}
+
+
+def _matching_close(content, tag, start):
+    """Offset del tag di chiusura che bilancia l'apertura terminata in `start`."""
+    depth = 1
+    for match in _TAGS[tag].finditer(content, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return match.start()
+    raise ValueError(f"Tag <{tag}> non chiuso a partire dall'offset {start}")
+
+
+class DashboardTemplate:
+    """
+    Documento diviso in parti statiche e slot con nome.
+    render() ricompone il documento con i nuovi valori in un solo join, senza
+    modificare il template; gli slot non passati mantengono il contenuto attuale.
+    update() registra i nuovi valori quando il documento è stato scritto.
+    """
+
+    def __init__(self, content):
+        self._static = []
+        self._names = []
+        self._values = {}
+
+        anchors = []
+        for name, (anchor, tag) in SLOT_ANCHORS.items():
+            start = content.find(anchor)
+            if start != -1:
+                anchors.append((start + len(anchor), name, tag))
+
+        position = 0
+        for start, name, tag in sorted(anchors):
+            if start < position:
+                continue  # ancora annidata dentro uno slot già trovato
+            end = _matching_close(content, tag, start)
+            self._static.append(content[position:start])
+            self._names.append(name)
+            self._values[name] = content[start:end]
+            position = end
+        self._static.append(content[position:])
+
+    @property
+    def slots(self):
+        return list(self._names)
+
+    def value(self, name):
+        return self._values.get(name)
+
+    def _merged(self, values):
+        return {**self._values, **{name: str(value) for name, value in values.items()
+                                   if name in self._values and value is not None}}
+
+    def render(self, **values):
+        """Documento con gli slot aggiornati; il template resta invariato."""
+        merged = self._merged(values)
+        parts = [self._static[0]]
+        for name, static in zip(self._names, self._static[1:]):
+            parts.append(merged[name])
+            parts.append(static)
+        return ''.join(parts)
+
+    def update(self, **values):
+        """Il template rappresenta d'ora in poi il documento reso con `values`."""
+        self._values = self._merged(values)
+
+
+# Template già analizzati per path, validi finché il file non cambia
+_templates = {}
+
+
+def _stat_key(path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_template(path):
+    """Template della dashboard; rianalizza il file solo se è cambiato su disco."""
+    path = Path(path)
+    key = _stat_key(path)
+    cached = _templates.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        template = DashboardTemplate(f.read())
+    _templates[path] = (key, template)
+    return template
+
+
+def render_dashboard(index_file, rocketbook_html, count, updated=None):
+    """
+    Aggiorna container Rocketbook, contatore e timestamp di index_file
+    con una sola scrittura (atomica: file temporaneo + rename).
+    """
+    index_file = Path(index_file)
+    if updated is None:
+        updated = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+    with timer('render'):
+        template = get_template(index_file)
+        values = {'rocketbook': f'\n{rocketbook_html}\n', 'count': count, 'updated': updated}
+        content = template.render(**values)
+
+        tmp_file = index_file.with_name(f'.{index_file.name}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_file, index_file)
+    changes.record(index_file)
+
+    # Solo dopo il rename riuscito il template descrive il file: niente nuova analisi.
+    # Se la scrittura fallisce resta in cache il template del file precedente, intatto
+    template.update(**values)
+    _templates[index_file] = (_stat_key(index_file), template)
+    return content
+
+
+def thumbnail_html(note):
+    """Miniatura con dimensioni e caricamento lazy, o l'emoji se manca."""
+    thumb = note.get('thumbnail')
+    if not thumb:
+        return '📝'
+    src = html.escape(thumb['src'], quote=True)
+    return f'<img src="{src}" width="{int(thumb["width"])}" height="{int(thumb["height"])}" loading="lazy" decoding="async" alt="">'
+
+
+def generate_notes_html(notes):
+    """Genera HTML griglia note (max MAX_VISIBLE_NOTES)."""
+    items = []
+    for note in notes[:MAX_VISIBLE_NOTES]:
+        url = html.escape(note.get('url') or '#', quote=True)
+        preview = html.escape(note.get('preview') or '', quote=True)
+        items.append(f'''            <a href="{url}" target="_blank" class="rocketbook-item" title="{preview}">
+                <div class="rocketbook-thumb">{thumbnail_html(note)}</div>
+                <div class="rocketbook-info">
+                    <div class="rocketbook-title">{html.escape(note['title'])}</div>
+                    <div class="rocketbook-date">{html.escape(note['date'])}</div>
+                </div>
+            </a>''')
+
+    return '''            <div class="rocketbook-grid">
+''' + '\n'.join(items) + '''
+            </div>'''
+
+
+def generate_empty_html():
+    """Genera HTML stato vuoto."""
+    return '''            <div class="rocketbook-empty">
+                <div class="rocketbook-empty-icon">📭</div>
+                <div>Nessuna scansione recente</div>
+                <div style="font-size: 0.8rem; margin-top: 8px;">Le note da Anselmo Acquah via Rocketbook appariranno qui</div>
+            </div>'''
+
+
+def update_dashboard(notes, index_file=INDEX_FILE):
+    """
+    Aggiorna griglia, contatore e timestamp della dashboard; False se index.html manca.
+    Se griglia e contatore non cambiano il file resta identico byte per byte.
+    """
+    if not index_file.exists():
+        print(f"❌ File {index_file} non trovato")
+        return False
+
+    with memory_section('render'):
+        html_section = generate_notes_html(notes) if notes else generate_empty_html()
+        template = get_template(index_file)
+        # Stesse note: non toccare nemmeno il timestamp, così non c'è nulla da committare
+        unchanged = (template.value('rocketbook') == f'\n{html_section}\n'
+                     and template.value('count') == str(len(notes)))
+        if not unchanged:
+            render_dashboard(index_file, html_section, len(notes))
+    if unchanged:
+        print(f"ℹ️ Dashboard invariata: {len(notes)} note")
+        return True
+
+    print(f"✅ Dashboard aggiornata: {len(notes)} note")
+    return True
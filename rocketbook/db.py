@@ -0,0 +1,175 @@
+"""
+Store SQLite delle note: storico completo, scritture incrementali.
+WAL permette letture concorrenti durante i sync; il limite di note mostrate
+è applicato solo in lettura (recent), nessuna nota viene scartata.
+"""
+
+import json
+import sqlite3
+import threading
+
+from rocketbook.config import NOTES_DB
+from rocketbook.search import fts_match
+
+UPSERT_BATCH = 500  # righe per executemany/transazione
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    collection TEXT NOT NULL,
+    note_key   TEXT NOT NULL,
+    message_id TEXT,
+    title      TEXT NOT NULL,
+    date       TEXT NOT NULL,
+    date_iso   TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    PRIMARY KEY (collection, note_key)
+);
+CREATE INDEX IF NOT EXISTS notes_title_date ON notes (collection, title, date);
+CREATE INDEX IF NOT EXISTS notes_message_id ON notes (message_id);
+CREATE INDEX IF NOT EXISTS notes_date_iso ON notes (collection, date_iso DESC);
+"""
+
+# Indice FTS5 su titolo, anteprima, tag e testo dei PDF (rowid = rowid della nota).
+# Aggiornato da upsert/add e non da trigger: FTS5 svuota i dati pendenti a ogni
+# savepoint, e ogni istruzione di un trigger ne apre uno (scritture ~3x più lente).
+FTS_SCHEMA = """
+DROP TABLE IF EXISTS notes_fts;
+CREATE VIRTUAL TABLE notes_fts USING fts5(
+    title, preview, tags, content, tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+# Database creati prima dell'indice (o con meno colonne): ripopola notes_fts una volta sola
+FTS_BACKFILL = """
+INSERT INTO notes_fts (rowid, title, preview, tags, content)
+SELECT rowid, title, json_extract(data, '$.preview'),
+       (SELECT group_concat(value, ' ') FROM json_each(notes.data, '$.tags')),
+       json_extract(data, '$.content')
+FROM notes
+"""
+SCHEMA_VERSION = 2  # 1: notes_fts, 2: colonna content
+
+# Una nota già presente (stessa chiave) viene aggiornata con i dati più recenti
+UPSERT_SQL = """
+INSERT INTO notes (collection, note_key, message_id, title, date, date_iso, data)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (collection, note_key) DO UPDATE SET
+    message_id = excluded.message_id,
+    title = excluded.title,
+    date = excluded.date,
+    date_iso = excluded.date_iso,
+    data = excluded.data
+RETURNING rowid
+"""
+
+
+class SQLiteNoteStore:
+    """Note per collezione ('dashboard', 'drive'), chiave univoca da `key(note)`."""
+
+    def __init__(self, path=NOTES_DB):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self._conn:
+                self._conn.executescript(FTS_SCHEMA)
+                self._conn.execute(FTS_BACKFILL)
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _row(self, collection, note, key):
+        return (
+            collection,
+            key(note),
+            note.get('id'),
+            note['title'],
+            note['date'],
+            note.get('date_iso') or '',
+            json.dumps(note, ensure_ascii=False),
+        )
+
+    def _write(self, collection, notes, key):
+        """Upsert delle righe e del loro indice full-text (nella transazione del chiamante)."""
+        rowids = [self._conn.execute(UPSERT_SQL, self._row(collection, n, key)).fetchone()[0] for n in notes]
+        self._conn.executemany("DELETE FROM notes_fts WHERE rowid = ?", [(r,) for r in rowids])
+        self._conn.executemany(
+            "INSERT INTO notes_fts (rowid, title, preview, tags, content) VALUES (?, ?, ?, ?, ?)",
+            [(r, n['title'], n.get('preview') or '', ' '.join(n.get('tags') or []), n.get('content') or '')
+             for r, n in zip(rowids, notes)],
+        )
+
+    def upsert(self, collection, notes, key, batch_size=UPSERT_BATCH):
+        """Inserisci o aggiorna le note a blocchi di `batch_size` per transazione."""
+        notes = list(notes)
+        with self._lock:
+            for start in range(0, len(notes), batch_size):
+                with self._conn:
+                    self._write(collection, notes[start:start + batch_size], key)
+        return len(notes)
+
+    def add(self, collection, note, key):
+        """Aggiungi una nota; False se esiste già (stessa chiave o stesso titolo e data)."""
+        with self._lock, self._conn:
+            # Due lookup separati: con OR SQLite non userebbe gli indici
+            duplicate = self._conn.execute(
+                "SELECT 1 FROM notes WHERE collection = ? AND note_key = ? "
+                "UNION ALL SELECT 1 FROM notes WHERE collection = ? AND title = ? AND date = ?",
+                (collection, key(note), collection, note['title'], note['date']),
+            ).fetchone()
+            if duplicate:
+                return False
+            self._write(collection, [note], key)
+        return True
+
+    def recent(self, collection, limit=None):
+        """Note dalla più recente; `limit` è il limite di visualizzazione."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM notes WHERE collection = ? ORDER BY date_iso DESC LIMIT ?",
+                (collection, -1 if limit is None else limit),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def search(self, collection, query, limit=None):
+        """Note che soddisfano la query (vedi rocketbook.search), dalla più recente."""
+        match = fts_match(query)
+        if match is None:
+            return self.recent(collection, limit)
+        with self._lock:
+            rows = self._conn.execute(
+                # Con IN (sottoquery) FTS5 calcola le corrispondenze una volta sola;
+                # con una JOIN il planner valuterebbe MATCH riga per riga lungo l'indice per data
+                "SELECT data FROM notes WHERE rowid IN (SELECT rowid FROM notes_fts WHERE notes_fts MATCH ?) "
+                "AND collection = ? ORDER BY date_iso DESC LIMIT ?",
+                (match, collection, -1 if limit is None else limit),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def by_message(self, message_id):
+        """Note (di qualsiasi collezione) generate da un messaggio Gmail."""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM notes WHERE message_id = ?", (message_id,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def count(self, collection):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def compact(self, collection=None):
+        """Riporta il contenuto del WAL nel database e azzera il file -wal."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if collection is None:
+                return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+        return self.count(collection)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,528 @@
+"""
+Upload dei PDF Rocketbook su Google Drive.
+
+DriveClient vive per tutto il run: credenziali, servizio, ID della cartella
+"Rocketbook Scans" e indice dei file presenti sono creati una sola volta.
+upload_attachments collega download, upload e condivisione in una pipeline.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from rocketbook.auth import build_drive_service
+from rocketbook.cache import get_attachment_cache
+from rocketbook.config import CACHE_ROOT, DRIVE_FOLDER_NAME
+from rocketbook.gmail import download_attachment
+from rocketbook.metrics import get_metrics
+from rocketbook.notes import make_note
+from rocketbook.pdftext import describe_notes
+from rocketbook.thumbnails import attach_thumbnails
+from rocketbook.pipeline import PIPELINE_WORKERS, ApiStats, InstrumentedService, Stage, run_pipeline
+from rocketbook.profiling import memory_section
+from rocketbook.ratelimit import get_rate_limiter, is_retryable, is_throttled
+
+# Stato Drive salvato tra un run e l'altro
+DRIVE_FOLDER_CACHE = CACHE_ROOT / "drive_folders.json"
+DRIVE_INDEX_CACHE = CACHE_ROOT / "drive_index.json"
+
+_drive_clients = {}
+_clients_lock = threading.Lock()
+
+
+def make_media_upload(filepath):
+    """Corpo dell'upload resumable per un PDF."""
+    from googleapiclient.http import MediaFileUpload
+
+    return MediaFileUpload(filepath, mimetype='application/pdf', resumable=True)
+
+
+def file_md5(filepath, chunk_size=1024 * 1024):
+    """MD5 del file locale, confrontabile con md5Checksum di Drive."""
+    digest = hashlib.md5()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DriveFolderIndex:
+    """
+    Indice locale dei file nella cartella Drive, per nome e md5Checksum.
+    La prima volta elenca la cartella (paginato, solo i campi necessari);
+    poi si aggiorna dal feed changes di Drive partendo dal token salvato,
+    così la deduplicazione è un lookup locale invece di una query per file.
+    """
+
+    FILE_FIELDS = 'id, name, md5Checksum, webViewLink'
+
+    def __init__(self, folder_id, index_file=DRIVE_INDEX_CACHE):
+        self.folder_id = folder_id
+        self.index_file = Path(index_file) if index_file else None
+        self.page_token = None
+        self._files = {}
+        self._by_name = {}
+        self._by_md5 = {}
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not self.index_file or not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Un indice di un'altra cartella non è riutilizzabile
+        if state.get('folder_id') == self.folder_id:
+            self.page_token = state.get('page_token')
+            for file in state.get('files', []):
+                self._add(file)
+
+    def save(self):
+        if not self.index_file:
+            return
+        with self._lock:
+            state = {
+                'folder_id': self.folder_id,
+                'page_token': self.page_token,
+                'files': list(self._files.values())
+            }
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.index_file)
+
+    def refresh(self, service):
+        """Aggiorna l'indice: feed changes se c'è un token valido, altrimenti listing completo."""
+        with self._lock:
+            if self.page_token:
+                try:
+                    self._apply_changes(service)
+                    return
+                except Exception as e:
+                    print(f"⚠️ Feed changes non disponibile ({e}), rilisto la cartella")
+            self._full_listing(service)
+
+    def _full_listing(self, service):
+        # Token preso prima del listing: le modifiche concorrenti arrivano dal feed
+        page_token = service.changes().getStartPageToken().execute()['startPageToken']
+
+        self._files, self._by_name, self._by_md5 = {}, {}, {}
+        query = f"'{self.folder_id}' in parents and trashed=false"
+        next_page = None
+        while True:
+            results = service.files().list(
+                q=query,
+                spaces='drive',
+                pageSize=1000,
+                pageToken=next_page,
+                fields=f'nextPageToken, files({self.FILE_FIELDS})'
+            ).execute()
+            for file in results.get('files', []):
+                self._add(file)
+            next_page = results.get('nextPageToken')
+            if not next_page:
+                break
+
+        self.page_token = page_token
+        print(f"🗂️ Indice Drive: {len(self._files)} file nella cartella")
+
+    def _apply_changes(self, service):
+        page_token = self.page_token
+        applied = 0
+        while page_token:
+            results = service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                pageSize=1000,
+                fields=f'nextPageToken, newStartPageToken, '
+                       f'changes(fileId, removed, file({self.FILE_FIELDS}, parents, trashed))'
+            ).execute()
+            for change in results.get('changes', []):
+                file = change.get('file') or {}
+                self._remove(change['fileId'])
+                if (not change.get('removed') and not file.get('trashed')
+                        and self.folder_id in file.get('parents', [])):
+                    self._add({k: file.get(k) for k in ('id', 'name', 'md5Checksum', 'webViewLink')})
+                applied += 1
+            if 'newStartPageToken' in results:
+                self.page_token = results['newStartPageToken']
+            page_token = results.get('nextPageToken')
+        if applied:
+            print(f"🗂️ Indice Drive aggiornato: {applied} modifiche")
+
+    def _add(self, file):
+        self._files[file['id']] = file
+        self._by_name[file['name']] = file
+        if file.get('md5Checksum'):
+            self._by_md5[file['md5Checksum']] = file
+
+    def _remove(self, file_id):
+        file = self._files.pop(file_id, None)
+        if file is None:
+            return
+        if self._by_name.get(file['name']) is file:
+            del self._by_name[file['name']]
+        if file.get('md5Checksum') and self._by_md5.get(file['md5Checksum']) is file:
+            del self._by_md5[file['md5Checksum']]
+
+    def add(self, file):
+        """Registra un file appena caricato."""
+        with self._lock:
+            self._add(file)
+
+    def lookup(self, filename=None, md5=None):
+        """
+        File già presente con lo stesso contenuto (md5) o, in mancanza, lo stesso nome.
+        Con md5 noto, un file omonimo conta solo se il suo md5 è ignoto o uguale:
+        stesso nome e contenuto diverso è una versione nuova, da caricare.
+        """
+        with self._lock:
+            if md5 and md5 in self._by_md5:
+                return self._by_md5[md5]
+            file = self._by_name.get(filename)
+            if file and md5 and file.get('md5Checksum') not in (None, md5):
+                return None
+            return file
+
+    def __len__(self):
+        return len(self._files)
+
+
+class DriveClient:
+    """
+    Client Drive di lunga durata: credenziali, servizio e ID della cartella
+    vengono creati una sola volta e riusati per tutti i file del run.
+    L'ID cartella è salvato su disco, quindi i run successivi non lo cercano.
+    Tutte le chiamate API sono contate e cronometrate in `stats`.
+    """
+
+    def __init__(self, folder_name=DRIVE_FOLDER_NAME, build_service=build_drive_service,
+                 folder_cache_file=DRIVE_FOLDER_CACHE, index_file=DRIVE_INDEX_CACHE):
+        self.folder_name = folder_name
+        self.folder_cache_file = Path(folder_cache_file) if folder_cache_file else None
+        self.index_file = index_file
+        self.stats = ApiStats()
+        self._build_service = build_service
+        self._service = None
+        self._folder_id = None
+        self._folder_index = None
+        self._lock = threading.RLock()
+
+    @property
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                start = time.perf_counter()
+                service = self._build_service()
+                self.stats.record('discovery.build', time.perf_counter() - start)
+                if service is not None:
+                    self._service = InstrumentedService(service, self.stats, api='drive')
+            return self._service
+
+    @property
+    def folder_id(self):
+        with self._lock:
+            if self._folder_id is None:
+                self._folder_id = self._load_folder_cache().get(self.folder_name)
+            if self._folder_id is None and self.service is not None:
+                self._folder_id = get_or_create_folder(self.service, self.folder_name)
+                if self._folder_id:
+                    self._save_folder_cache()
+            return self._folder_id
+
+    @property
+    def folder_index(self):
+        """Indice dei file in cartella, aggiornato una volta per processo."""
+        with self._lock:
+            if self._folder_index is None and self.folder_id:
+                index = DriveFolderIndex(self.folder_id, self.index_file)
+                index.refresh(self.service)
+                self._folder_index = index
+            return self._folder_index
+
+    def save(self):
+        """Salva su disco l'indice della cartella."""
+        with self._lock:
+            if self._folder_index is not None:
+                self._folder_index.save()
+
+    def invalidate_folder(self):
+        """Dimentica l'ID cartella (es. cartella cancellata su Drive)."""
+        with self._lock:
+            self._folder_id = None
+            self._folder_index = None
+            cache = self._load_folder_cache()
+            if cache.pop(self.folder_name, None) is not None:
+                self._write_folder_cache(cache)
+
+    def _load_folder_cache(self):
+        if self.folder_cache_file and self.folder_cache_file.exists():
+            try:
+                with open(self.folder_cache_file) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save_folder_cache(self):
+        cache = self._load_folder_cache()
+        cache[self.folder_name] = self._folder_id
+        self._write_folder_cache(cache)
+
+    def _write_folder_cache(self, cache):
+        if not self.folder_cache_file:
+            return
+        self.folder_cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.folder_cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, self.folder_cache_file)
+
+    def upload(self, filepath, filename):
+        """
+        Carica il file nella cartella (se non già presente).
+        Restituisce {'id', 'webViewLink'} oppure None.
+        """
+        print(f"📤 Upload su Google Drive: {filename}")
+
+        try:
+            if self.service is None:
+                return None
+
+            # Cerca o crea la cartella (una volta per processo, poi da cache)
+            folder_id = self.folder_id
+            if not folder_id:
+                print(f"❌ Impossibile trovare/creare cartella: {self.folder_name}")
+                return None
+
+            # Verifica se il file esiste già (lookup locale per contenuto o nome)
+            md5 = file_md5(filepath)
+            existing_file = self.folder_index.lookup(filename, md5)
+            if existing_file:
+                print(f"ℹ️ File già esistente: {filename}")
+                return existing_file
+
+            # Upload del file
+            file_metadata = {
+                'name': filename,
+                'parents': [folder_id]
+            }
+
+            try:
+                file = self._create(file_metadata, filepath, md5)
+            except Exception as e:
+                # Cartella in cache non più valida: rigenera l'ID e riprova una volta
+                if getattr(getattr(e, 'resp', None), 'status', None) != 404:
+                    raise
+                self.invalidate_folder()
+                file_metadata['parents'] = [self.folder_id]
+                file = self._create(file_metadata, filepath, md5)
+
+            self.folder_index.add(file)
+            get_metrics().add_bytes('upload', os.path.getsize(filepath))
+            print(f"✅ Upload completato: {file.get('name')} (ID: {file.get('id')})")
+            return file
+
+        except Exception as e:
+            print(f"❌ Errore upload Drive: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def _create(self, file_metadata, filepath, md5):
+        """Upload del file; se la risposta va persa, prima di ritentare lo cerca per nome e md5."""
+        return create_once(
+            lambda: self.service.files().create(
+                body=file_metadata,
+                media_body=make_media_upload(filepath),
+                fields=DriveFolderIndex.FILE_FIELDS
+            ).execute(),
+            lambda: find_file(self.service, file_metadata['parents'][0], file_metadata['name'], md5),
+        )
+
+    def share(self, file):
+        """Rendi il file condivisibile e restituisci il suo link."""
+        try:
+            # Rendi il file condivisibile
+            make_file_shareable(self.service, file['id'])
+
+            # Il link arriva già da create/list; altrimenti chiedilo a Drive
+            share_link = file.get('webViewLink')
+            if not share_link:
+                file_info = self.service.files().get(
+                    fileId=file['id'],
+                    fields='webViewLink, webContentLink'
+                ).execute()
+                share_link = file_info.get('webViewLink')
+
+            print(f"🔗 Link condivisibile: {share_link}")
+            return share_link
+
+        except Exception as e:
+            print(f"❌ Errore condivisione Drive: {e}")
+            return None
+
+
+def create_once(create, find):
+    """
+    Esegui create() (files.create, non idempotente) senza duplicati. Il rate limiter
+    non ritenta i 5xx e gli errori di rete di una create, perché Drive può averla
+    eseguita comunque: qui, dopo il backoff, find() cerca la risorsa e la restituisce
+    se esiste già, altrimenti create() viene ritentata.
+    """
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        try:
+            return create()
+        except Exception as e:
+            if is_throttled(e) or not is_retryable(e) or attempt >= limiter.max_retries:
+                raise
+        time.sleep(limiter.retry_delay(attempt))
+        attempt += 1
+        existing = find()
+        if existing:
+            return existing
+
+
+def drive_query_string(value):
+    """Valore tra apici in una query di files.list."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def find_file(service, folder_id, filename, md5):
+    """File della cartella con questo nome e contenuto (md5Checksum); None se non c'è."""
+    query = f"name='{drive_query_string(filename)}' and '{folder_id}' in parents and trashed=false"
+    results = service.files().list(q=query, spaces='drive',
+                                   fields=f"files({DriveFolderIndex.FILE_FIELDS})").execute()
+    return next((f for f in results.get('files', []) if f.get('md5Checksum') == md5), None)
+
+
+def get_or_create_folder(service, folder_name):
+    """Cerca o crea una cartella su Google Drive."""
+    try:
+        # Cerca la cartella
+        query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
+
+        def find():
+            results = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+            items = results.get('files', [])
+            return items[0] if items else None
+
+        folder = find()
+        if folder:
+            return folder['id']
+
+        # Crea la cartella
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': 'application/vnd.google-apps.folder'
+        }
+
+        folder = create_once(lambda: service.files().create(body=file_metadata, fields='id').execute(), find)
+        print(f"📁 Creata cartella: {folder_name}")
+        return folder.get('id')
+
+    except Exception as e:
+        print(f"❌ Errore gestione cartella: {e}")
+        return None
+
+
+def make_file_shareable(service, file_id):
+    """Rendi un file condivisibile con chiunque abbia il link."""
+    try:
+        permission = {
+            'type': 'anyone',
+            'role': 'reader'
+        }
+
+        service.permissions().create(
+            fileId=file_id,
+            body=permission
+        ).execute()
+
+        print(f"🔓 File reso condivisibile")
+        return True
+    except Exception as e:
+        print(f"⚠️ Errore condivisione file: {e}")
+        return False
+
+
+def get_drive_client(folder_name=DRIVE_FOLDER_NAME):
+    """Client Drive condiviso del processo, uno per cartella."""
+    with _clients_lock:
+        if folder_name not in _drive_clients:
+            _drive_clients[folder_name] = DriveClient(folder_name)
+        return _drive_clients[folder_name]
+
+
+def upload_to_drive(filepath, filename, folder_name=DRIVE_FOLDER_NAME):
+    """Carica il file su Google Drive e restituisci il link condivisibile."""
+    client = get_drive_client(folder_name)
+    file = client.upload(filepath, filename)
+    return client.share(file) if file else None
+
+
+def upload_attachments(service, notes, concurrency=PIPELINE_WORKERS, client=None):
+    """
+    Scarica, carica e condividi gli allegati delle note con una pipeline parallela.
+    Download, upload e permessi hanno ciascuno un pool di `concurrency` thread
+    collegati da code limitate. Restituisce una nota per allegato caricato,
+    con url = link Drive, anteprima dal testo del PDF, nell'ordine originale.
+    """
+    if client is None:
+        client = get_drive_client()
+
+    items = [(note, att) for note in notes for att in note.get('attachments', [])]
+    paths = {}
+
+    def download(item):
+        note, att = item
+        filepath = download_attachment(service, att['message_id'], att['id'], att['filename'])
+        if not filepath:
+            return None
+        paths[(att['message_id'], att['filename'])] = filepath
+        return (note, att, filepath)
+
+    def upload(item):
+        note, att, filepath = item
+        file = client.upload(filepath, att['filename'])
+        return (note, att, file) if file else None
+
+    def share(item):
+        note, att, file = item
+        drive_url = client.share(file)
+        if not drive_url:
+            return None
+        # Il PDF resta nella cache allegati per i sync successivi
+        return make_note(
+            note['title'],
+            note['date_iso'],
+            url=drive_url,
+            note_id=note['id'],
+            attachments=[att],
+            tags=note.get('tags'),
+            preview=f"Scansione Rocketbook con allegato {att['filename']} ({att.get('size', 'N/A')} bytes)",
+        )
+
+    stages = [
+        Stage('download', download, concurrency),
+        Stage('upload', upload, concurrency),
+        Stage('share', share, concurrency),
+    ]
+    with memory_section('allegati'):
+        uploaded = [r for r in run_pipeline(items, stages) if r is not None]
+    # Testo, pagine e miniature dei PDF (pool di processi, cache per contenuto)
+    describe_notes(uploaded, paths)
+    attach_thumbnails(uploaded, paths)
+
+    get_attachment_cache().save()
+    client.save()
+    return uploaded
@@ -0,0 +1,478 @@
+"""
+Recupero delle scansioni Rocketbook da Gmail API.
+
+- list_message_ids segue nextPageToken fino a max_results
+- fetch_messages scarica i dettagli con il batch endpoint (thread pool come fallback)
+- sync_notes è incrementale: dal checkpoint historyId legge solo le email nuove
+- backfill scorre tutta la casella a blocchi, con checkpoint per riprendere
+"""
+
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from rocketbook import changes
+from rocketbook.cache import atomic_write_path, get_attachment_cache
+from rocketbook.config import BACKFILL_BATCH, BACKFILL_STATE_FILE, DATA_FILE, PDF_DIR, SYNC_STATE_FILE
+from rocketbook.metrics import get_metrics
+from rocketbook.notes import is_rocketbook_message, is_rocketbook_sender, merge_notes, parse_message
+from rocketbook.pipeline import execute
+from rocketbook.profiling import memory_section
+from rocketbook.ratelimit import QUOTA_UNITS, get_rate_limiter, is_retryable
+from rocketbook.settings import gmail_query, load_settings, max_results as configured_max_results
+from rocketbook.store import load_notes
+
+BATCH_SIZE = 50        # Gmail accetta max 100 chiamate per batch, 50 evita throttling
+FETCH_WORKERS = 8      # Thread per il fallback senza batch endpoint
+LIST_PAGE_SIZE = 500   # Limite massimo di messages.list per pagina
+PROCESSED_IDS_LIMIT = 5000  # ID già elaborati conservati nel checkpoint
+GET_METHOD = 'gmail.users.messages.get'
+FULL = {'format': 'full'}
+FROM_ONLY = {'format': 'metadata', 'metadataHeaders': ['From']}  # solo il mittente, pochi byte
+
+
+def iter_message_pages(service, query, page_token=None, page_size=LIST_PAGE_SIZE):
+    """
+    Genera (page_token, ids) per ogni pagina di risultati, a partire da
+    page_token (None = prima pagina). page_token è quello usato per chiedere
+    la pagina: basta salvarlo per ripartire da lì.
+    """
+    while True:
+        kwargs = {'userId': 'me', 'q': query, 'maxResults': page_size}
+        if page_token:
+            kwargs['pageToken'] = page_token
+        results = execute(service.users().messages().list(**kwargs), service)
+        yield page_token, [m['id'] for m in results.get('messages', [])]
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+
+
+def list_message_ids(service, query, max_results):
+    """Elenca gli ID dei messaggi, seguendo nextPageToken fino a max_results."""
+    ids = []
+    if max_results <= 0:
+        return ids
+    for _, page in iter_message_pages(service, query, page_size=min(LIST_PAGE_SIZE, max_results)):
+        ids.extend(page)
+        if len(ids) >= max_results:
+            break
+    return ids[:max_results]
+
+
+def fetch_messages(service, msg_ids, batch_size=BATCH_SIZE, workers=FETCH_WORKERS, params=FULL):
+    """
+    Recupera i messaggi {id: msg}, completi o nel formato di `params` (es. FROM_ONLY).
+    Usa il batch endpoint di Gmail; se non disponibile ripiega su un
+    pool di thread limitato. I messaggi falliti vengono omessi.
+    """
+    if not msg_ids:
+        return {}
+
+    if hasattr(service, 'new_batch_http_request'):
+        try:
+            return _fetch_messages_batch(service, msg_ids, batch_size, params)
+        except Exception as e:
+            print(f"⚠️ Batch Gmail non disponibile ({e}), uso thread pool")
+
+    return _fetch_messages_threaded(service, msg_ids, workers, params)
+
+
+def _fetch_messages_batch(service, msg_ids, batch_size, params=FULL):
+    """Recupera i messaggi con richieste batch (una chiamata HTTP per blocco)."""
+    results = {}
+    retry = []
+    limiter = get_rate_limiter()
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            results[request_id] = response
+        elif is_retryable(exception):
+            # 429/5xx su una singola chiamata del batch: ritentata dopo, con backoff
+            retry.append(request_id)
+        else:
+            print(f"⚠️ Errore parsing email {request_id}: {exception}")
+
+    for start in range(0, len(msg_ids), batch_size):
+        chunk = msg_ids[start:start + batch_size]
+        batch = service.new_batch_http_request(callback=callback)
+        for msg_id in chunk:
+            batch.add(
+                service.users().messages().get(userId='me', id=msg_id, **params),
+                request_id=msg_id
+            )
+        # Ogni chiamata del batch consuma la sua quota
+        limiter.call(GET_METHOD, batch.execute, units=QUOTA_UNITS[GET_METHOD] * len(chunk))
+
+    retry = [msg_id for msg_id in dict.fromkeys(retry) if msg_id not in results]
+    if retry:
+        print(f"🚦 {len(retry)} email limitate nel batch, nuovo tentativo")
+        results.update(_fetch_messages_threaded(service, retry, FETCH_WORKERS, params))
+    return results
+
+
+def _fetch_messages_threaded(service, msg_ids, workers, params=FULL):
+    """Recupera i messaggi in parallelo con un pool di thread limitato."""
+    def fetch(msg_id):
+        try:
+            request = service.users().messages().get(userId='me', id=msg_id, **params)
+            return msg_id, execute(request, service)
+        except Exception as e:
+            print(f"⚠️ Errore parsing email {msg_id}: {e}")
+            return msg_id, None
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(msg_ids))) as pool:
+        return {msg_id: msg for msg_id, msg in pool.map(fetch, msg_ids) if msg is not None}
+
+
+def fetch_notes(service, msg_ids, only_rocketbook=False, failed=None):
+    """
+    Recupera i dettagli dei messaggi e li converte in note, nell'ordine di msg_ids.
+    Gli ID non recuperati (anche dopo i retry) vengono aggiunti a `failed`.
+    """
+    # Dettagli in un solo round trip (batch) invece di uno per messaggio
+    details = fetch_messages(service, msg_ids)
+
+    notes = []
+    for msg_id in msg_ids:
+        msg = details.get(msg_id)
+        if msg is None:
+            if failed is not None:
+                failed.append(msg_id)
+            continue
+        if only_rocketbook and not is_rocketbook_message(msg):
+            continue
+        note = parse_message(msg)
+        if note:
+            notes.append(note)
+
+    return notes
+
+
+def fetch_rocketbook_emails(service, max_results=None, query=None, failed=None):
+    """Recupera le email da Rocketbook (di default: query e maxResults di rocketbook-config.json, email recenti)."""
+    if not service:
+        return []
+
+    if max_results is None:
+        max_results = configured_max_results()
+    if query is None:
+        query = gmail_query(recent=True)
+
+    print("🔍 Ricerca email da Rocketbook...")
+
+    messages = list_message_ids(service, query, max_results)
+
+    print(f"📧 Trovate {len(messages)} email")
+
+    return fetch_notes(service, messages, failed=failed)
+
+
+def fetch_new_rocketbook_emails(service, state, failed=None):
+    """
+    Sync incrementale: recupera solo le email arrivate dopo il checkpoint.
+    Usa la history API di Gmail a partire da state['history_id'], più le email
+    non recuperate al sync precedente (state['pending_ids']).
+    Restituisce None se il checkpoint non è utilizzabile (serve full scan).
+    """
+    if not service or not state.get('history_id'):
+        return None
+
+    print(f"🔍 Ricerca nuove email dal checkpoint {state['history_id']}...")
+
+    processed = set(state.get('processed_ids', []))
+    added = [msg_id for msg_id in state.get('pending_ids', []) if msg_id not in processed]
+    page_token = None
+
+    try:
+        while True:
+            kwargs = {
+                'userId': 'me',
+                'startHistoryId': state['history_id'],
+                'historyTypes': ['messageAdded'],
+            }
+            if page_token:
+                kwargs['pageToken'] = page_token
+
+            results = execute(service.users().history().list(**kwargs), service)
+            for record in results.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    msg_id = item['message']['id']
+                    if msg_id not in processed and msg_id not in added:
+                        added.append(msg_id)
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+    except Exception as e:
+        # 404: historyId troppo vecchio, Gmail non conserva più la history
+        if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+            print("⚠️ Checkpoint scaduto, serve un full scan")
+            return None
+        raise
+
+    print(f"📧 Trovate {len(added)} nuove email")
+
+    # La history include tutta la posta: prima il solo mittente (metadata),
+    # poi i messaggi completi delle sole email Rocketbook
+    senders = fetch_messages(service, added, params=FROM_ONLY)
+    matches = []
+    for msg_id in added:
+        msg = senders.get(msg_id)
+        if msg is None:
+            if failed is not None:
+                failed.append(msg_id)
+        elif is_rocketbook_sender(msg):
+            matches.append(msg_id)
+    if len(matches) < len(added):
+        print(f"📧 {len(matches)} da Rocketbook")
+
+    return fetch_notes(service, matches, only_rocketbook=True, failed=failed)
+
+
+def get_message(service, msg_id):
+    """Recupera e converte in nota un singolo messaggio; None in caso di errore."""
+    try:
+        msg = execute(service.users().messages().get(userId='me', id=msg_id, format='full'), service)
+    except Exception as e:
+        print(f"⚠️ Errore parsing email {msg_id}: {e}")
+        return None
+
+    return parse_message(msg)
+
+
+def download_attachment(service, message_id, attachment_id, filename, dest_dir=None, verbose=True):
+    """
+    Scarica un allegato da Gmail, o lo prende dalla cache locale se già scaricato.
+    Restituisce il path nella cache, oppure la copia in dest_dir se indicata.
+    """
+    cache = get_attachment_cache()
+
+    try:
+        # Gli attachmentId Gmail non sono stabili tra richieste: chiave = messaggio + nome file
+        cached = cache.get(message_id, filename)
+        if cached is None:
+            request = service.users().messages().attachments().get(
+                userId='me', messageId=message_id, id=attachment_id
+            )
+            attachment = execute(request, service)
+            get_metrics().add_bytes('download', len(attachment['data']))
+
+            # Decodifica a blocchi direttamente su disco, senza buffer completo
+            cached = cache.put_encoded(message_id, filename, attachment['data'], filename)
+            del attachment
+            if verbose:
+                print(f"📥 Scaricato: {filename} ({cached.stat().st_size} bytes)")
+        elif verbose:
+            print(f"📦 In cache: {filename}")
+
+        if dest_dir is None:
+            return str(cached)
+
+        # Copia atomica nella directory di destinazione: mai PDF scritti a metà
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        filepath = dest_dir / filename
+        if not filepath.exists() or filepath.stat().st_size != cached.stat().st_size:
+            tmp_file = atomic_write_path(filepath)
+            shutil.copyfile(cached, tmp_file)
+            os.replace(tmp_file, filepath)
+            changes.record(filepath)
+        return str(filepath)
+
+    except Exception as e:
+        print(f"⚠️ Errore download {filename}: {e}")
+        return None
+
+
+def download_note_attachments(service, notes, dest_dir=PDF_DIR, workers=1, verbose=True):
+    """
+    Scarica gli allegati delle note in dest_dir (None = resta nella cache);
+    salva l'indice della cache. Con workers > 1 i download sono in parallelo.
+    Restituisce {(message_id, filename): path} dei file scaricati.
+    """
+    atts = [att for note in notes for att in note.get('attachments', [])]
+
+    def download(att):
+        return download_attachment(service, att['message_id'], att['id'], att['filename'], dest_dir, verbose)
+
+    with memory_section('allegati'):
+        if workers > 1 and len(atts) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(atts))) as pool:
+                downloaded = list(pool.map(download, atts))
+        else:
+            downloaded = [download(att) for att in atts]
+    paths = {(att['message_id'], att['filename']): path for att, path in zip(atts, downloaded) if path}
+
+    cache = get_attachment_cache()
+    cache.save()
+    if verbose:
+        print(cache.summary())
+    return paths
+
+
+def load_sync_state(path=SYNC_STATE_FILE):
+    """Carica il checkpoint di sync (ultimo historyId e ID già elaborati)."""
+    if path.exists():
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Checkpoint illeggibile, verrà ricreato: {e}")
+    return {}
+
+
+def save_sync_state(history_id, processed_ids, path=SYNC_STATE_FILE, pending_ids=()):
+    """Salva il checkpoint in modo atomico (file temporaneo + rename)."""
+    state = {
+        'history_id': history_id,
+        'processed_ids': list(processed_ids)[-PROCESSED_IDS_LIMIT:],
+        # Email non recuperate (quota esaurita, errori): ritentate al prossimo sync
+        'pending_ids': list(pending_ids),
+        'updated': datetime.now().isoformat()
+    }
+    tmp_file = path.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, path)
+    return state
+
+
+def sync_notes(service, full=False, max_results=None, data_file=DATA_FILE, state_file=SYNC_STATE_FILE):
+    """
+    Recupera le note da Gmail aggiornando il checkpoint.
+    In modalità delta elabora solo le email nuove; con full=True (o senza
+    checkpoint valido) riesegue la scansione completa della finestra recente
+    (gmail_query(recent=True): ultimi `recentDays` giorni di rocketbook-config.json).
+    Restituisce (tutte le note, note nuove).
+    """
+    settings = load_settings()
+    if max_results is None:
+        max_results = configured_max_results(settings)
+
+    state = {} if full else load_sync_state(state_file)
+
+    # historyId letto prima della scansione: nulla va perso tra le due chiamate
+    history_id = execute(service.users().getProfile(userId='me'), service).get('historyId')
+
+    failed = []
+    new_notes = fetch_new_rocketbook_emails(service, state, failed)
+    if new_notes is None:
+        days = settings['recentDays']
+        print(f"🔁 Full scan {f'degli ultimi {days} giorni' if days else 'senza limite di data'} "
+              f"(max {max_results} email)")
+        failed = []
+        notes = fetch_rocketbook_emails(service, max_results, gmail_query(recent=True, settings=settings), failed)
+        processed = set(state.get('processed_ids', []))
+        new_notes = [n for n in notes if n['id'] not in processed]
+    else:
+        notes = merge_notes(new_notes, load_notes(data_file), limit=max_results)
+
+    processed_ids = list(state.get('processed_ids', []))
+    seen = set(processed_ids)
+    processed_ids.extend(n['id'] for n in new_notes if n['id'] not in seen)
+    if failed:
+        print(f"⚠️ {len(failed)} email non recuperate, ritentate al prossimo sync")
+    save_sync_state(history_id, processed_ids, state_file, pending_ids=failed)
+
+    return notes, new_notes
+
+
+class BackfillProgress:
+    """Throughput del backfill (email/s, byte/s degli allegati) dall'avvio del run."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    def update(self, messages, size):
+        self.messages += messages
+        self.bytes += size
+
+    def summary(self, total_messages):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"⏳ Backfill: {total_messages} email ({self.messages / elapsed:.1f}/s), "
+                f"{self.bytes / (1024 * 1024):.1f} MB di allegati ({self.bytes / elapsed / (1024 * 1024):.2f} MB/s)")
+
+
+def load_backfill_state(query, path=BACKFILL_STATE_FILE):
+    """Checkpoint del backfill per questa query; {} se assente o di un'altra query."""
+    if path.exists():
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('query') == query:
+                return state
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Checkpoint backfill illeggibile, si riparte dall'inizio: {e}")
+    return {}
+
+
+def save_backfill_state(state, path=BACKFILL_STATE_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    state['updated'] = datetime.now().isoformat()
+    tmp_file = path.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, path)
+
+
+def backfill(service, query=None, batch_size=BACKFILL_BATCH, download=True,
+             state_file=BACKFILL_STATE_FILE):
+    """
+    Import storico dell'intera casella: genera (note, paths) a blocchi di
+    batch_size email, pagina dopo pagina. In memoria c'è solo il blocco corrente.
+
+    Il checkpoint (pagina + posizione) viene salvato quando il chiamante chiede
+    il blocco successivo, cioè dopo che ha salvato quello precedente: un run
+    interrotto riprende dal primo blocco non elaborato. A fine import il
+    checkpoint viene rimosso e il backfill successivo ricomincia dall'inizio.
+    """
+    if query is None:
+        query = gmail_query()
+    state = load_backfill_state(query, state_file)
+    if state:
+        print(f"↩️ Ripresa backfill: {state['messages']} email già importate")
+    else:
+        state = {'query': query, 'page_token': None, 'offset': 0, 'messages': 0, 'bytes': 0, 'failed': []}
+    progress = BackfillProgress()
+    resume_token, resume_offset = state['page_token'], state['offset']
+
+    for page_token, ids in iter_message_pages(service, query, resume_token):
+        first = resume_offset if page_token == resume_token else 0
+        for offset in range(first, len(ids), batch_size):
+            chunk = ids[offset:offset + batch_size]
+            failed = []
+            notes = fetch_notes(service, chunk, failed=failed)
+            paths = {}
+            if download:
+                paths = download_note_attachments(service, notes, dest_dir=None, workers=FETCH_WORKERS,
+                                                  verbose=False)
+            size = sum(os.path.getsize(p) for p in set(paths.values()))
+
+            yield notes, paths
+
+            progress.update(len(chunk), size)
+            state.update(page_token=page_token, offset=offset + len(chunk),
+                         messages=state['messages'] + len(chunk), bytes=state['bytes'] + size)
+            state['failed'] = (state['failed'] + failed)[-PROCESSED_IDS_LIMIT:]
+            save_backfill_state(state, state_file)
+            print(progress.summary(state['messages']))
+
+    # Ultimo tentativo per le email fallite durante l'import
+    if state['failed']:
+        failed = []
+        notes = fetch_notes(service, state['failed'], failed=failed)
+        paths = {}
+        if download:
+            paths = download_note_attachments(service, notes, dest_dir=None, workers=FETCH_WORKERS,
+                                              verbose=False)
+        yield notes, paths
+        if failed:
+            print(f"⚠️ {len(failed)} email non importate: {', '.join(failed[:10])}")
+
+    state_file.unlink(missing_ok=True)
+    print(f"✅ Backfill completato: {state['messages']} email, {state['bytes'] / (1024 * 1024):.1f} MB")
@@ -0,0 +1,239 @@
+"""
+Store delle note su file, senza database: snapshot JSON + journal JSONL append-only.
+
+- <collezione>.jsonl riceve una riga per nota aggiunta o aggiornata (append + fsync)
+- <collezione>.json è lo snapshot completo, riscritto solo dalla compattazione
+- i lettori caricano lo snapshot e rileggono il journal; a parità di chiave vince
+  l'ultima riga, quindi ripetere una riga dopo un crash non cambia il risultato
+- ogni accesso legge solo le righe aggiunte dopo l'ultima lettura (anche da altri
+  processi: CLI, daemon, scheduler); se lo snapshot cambia (compattazione) o il
+  journal è stato sostituito, la collezione viene ricaricata da capo
+
+Un crash durante l'append lascia al più una riga finale incompleta, che viene
+ignorata in lettura: non esiste mai un array JSON scritto a metà.
+"""
+
+import fcntl
+import heapq
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from rocketbook.config import JOURNAL_COMPACT_LINES, JOURNAL_DIR
+from rocketbook.search import InvertedIndex
+
+
+class JournalNoteStore:
+    """Stessa interfaccia di SQLiteNoteStore, con un journal per collezione."""
+
+    def __init__(self, root=JOURNAL_DIR, compact_lines=JOURNAL_COMPACT_LINES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compact_lines = compact_lines
+        self._lock = threading.RLock()
+        self._notes = {}          # collezione -> {chiave: nota}
+        self._title_date = {}     # collezione -> {(titolo, data): chiave}
+        self._index = {}          # collezione -> InvertedIndex per la ricerca
+        self._journal_lines = {}  # collezione -> righe nel journal
+        self._positions = {}      # collezione -> (stat dello snapshot, inode del journal, byte letti)
+
+    def snapshot_path(self, collection):
+        return self.root / f"{collection}.json"
+
+    def journal_path(self, collection):
+        return self.root / f"{collection}.jsonl"
+
+    @contextmanager
+    def _file_lock(self, collection, exclusive):
+        """Lock tra processi: append e compattazione esclusivi, letture condivise."""
+        with open(self.root / f"{collection}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self, collection):
+        """Note della collezione, allineate al disco (solo le righe nuove del journal)."""
+        with self._file_lock(collection, exclusive=False):
+            self._refresh(collection)
+        return self._notes[collection]
+
+    def _refresh(self, collection):
+        """Applica le righe aggiunte al journal o ricarica tutto; il chiamante tiene il lock sul file."""
+        position = self._positions.get(collection)
+        journal = self._stat_key(self.journal_path(collection))
+        if (position is None or position[0] != self._stat_key(self.snapshot_path(collection))
+                or (journal[0] if journal else None) not in (position[1], None)
+                or (journal[2] if journal else 0) < position[2]):
+            self._read(collection)
+        elif journal and journal[2] > position[2]:
+            self._read_journal(collection)
+
+    def _read(self, collection):
+        """Leggi snapshot e journal da disco; il chiamante tiene il lock sul file."""
+        notes = {}
+        snapshot = self.snapshot_path(collection)
+        snapshot_key = self._stat_key(snapshot)
+        if snapshot_key:
+            with open(snapshot, encoding='utf-8') as f:
+                for entry in json.load(f):
+                    notes[entry['key']] = entry['note']
+
+        self._notes[collection] = notes
+        self._title_date[collection] = {(n['title'], n['date']): k for k, n in notes.items()}
+        self._journal_lines[collection] = 0
+        self._index.pop(collection, None)  # ricostruito alla prima ricerca
+        self._positions[collection] = (snapshot_key, None, 0)
+        self._read_journal(collection)
+        return notes
+
+    def _read_journal(self, collection):
+        """Applica le righe complete del journal dopo la posizione già letta."""
+        snapshot_key, _, offset = self._positions[collection]
+        try:
+            f = open(self.journal_path(collection), 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            data = f.read()
+        # Una riga senza \n finale è un append in corso o troncato: riletta la prossima volta
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Riga troncata da un crash durante l'append (chiusa dall'append successivo)
+                continue
+            self._remember(collection, entry['key'], entry['note'])
+        self._positions[collection] = (snapshot_key, inode, offset + end)
+
+    def _append(self, collection, entries):
+        """Aggiungi righe al journal con un solo write + fsync."""
+        data = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries).encode('utf-8')
+        with self._file_lock(collection, exclusive=True):
+            # Prima le righe scritte da altri processi: dopo l'append la posizione è la fine del file
+            self._refresh(collection)
+            with open(self.journal_path(collection), 'ab') as f:
+                # Chiudi un'eventuale riga troncata, o la prossima verrebbe persa con lei
+                if f.tell() > 0:
+                    with open(self.journal_path(collection), 'rb') as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b'\n':
+                            data = b'\n' + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._positions[collection] = (self._positions[collection][0], os.fstat(f.fileno()).st_ino, f.tell())
+
+    def _remember(self, collection, key, note):
+        title_date = self._title_date[collection]
+        # Nota aggiornata con titolo o data diversi: la vecchia coppia non la indica più
+        previous = self._notes[collection].get(key)
+        if previous is not None and title_date.get((previous['title'], previous['date'])) == key:
+            del title_date[(previous['title'], previous['date'])]
+        self._notes[collection][key] = note
+        title_date[(note['title'], note['date'])] = key
+        self._journal_lines[collection] += 1
+        if collection in self._index:
+            self._index[collection].add(key, note)
+
+    def _maybe_compact(self, collection):
+        if self.compact_lines and self._journal_lines[collection] >= self.compact_lines:
+            self.compact(collection)
+
+    def upsert(self, collection, notes, key):
+        """Aggiungi o aggiorna le note con un solo append al journal."""
+        with self._lock:
+            self._load(collection)
+            entries = [{'key': key(n), 'note': n} for n in notes]
+            if entries:
+                self._append(collection, entries)
+                for entry in entries:
+                    self._remember(collection, entry['key'], entry['note'])
+                self._maybe_compact(collection)
+            return len(entries)
+
+    def add(self, collection, note, key):
+        """Aggiungi una nota; False se esiste già (stessa chiave o stesso titolo e data)."""
+        with self._lock:
+            notes = self._load(collection)
+            note_key = key(note)
+            if note_key in notes or (note['title'], note['date']) in self._title_date[collection]:
+                return False
+            self._append(collection, [{'key': note_key, 'note': note}])
+            self._remember(collection, note_key, note)
+            self._maybe_compact(collection)
+            return True
+
+    def recent(self, collection, limit=None):
+        """Note dalla più recente; `limit` è il limite di visualizzazione."""
+        with self._lock:
+            notes = sorted(self._load(collection).values(), key=lambda n: n.get('date_iso') or '', reverse=True)
+        return notes[:limit] if limit is not None else notes
+
+    def search(self, collection, query, limit=None):
+        """Note che soddisfano la query (vedi rocketbook.search), dalla più recente."""
+        with self._lock:
+            notes = self._load(collection)
+            if collection not in self._index:
+                index = InvertedIndex()
+                for key, note in notes.items():
+                    index.add(key, note)
+                self._index[collection] = index
+            found = [notes[k] for k in self._index[collection].search(query)]
+        if limit is not None:
+            return heapq.nlargest(limit, found, key=lambda n: n.get('date_iso') or '')
+        return sorted(found, key=lambda n: n.get('date_iso') or '', reverse=True)
+
+    def by_message(self, message_id):
+        """Note (delle collezioni già caricate) generate da un messaggio Gmail."""
+        with self._lock:
+            return [n for notes in self._notes.values() for n in notes.values() if n.get('id') == message_id]
+
+    def count(self, collection):
+        with self._lock:
+            return len(self._load(collection))
+
+    def compact(self, collection=None):
+        """
+        Riscrivi lo snapshot con lo stato corrente e svuota il journal.
+        Senza collezione compatta tutte quelle presenti su disco.
+        """
+        with self._lock:
+            if collection is None:
+                collections = {p.stem for p in self.root.glob('*.jsonl')} | {p.stem for p in self.root.glob('*.json')}
+                return sum(self.compact(c) for c in sorted(collections))
+
+            with self._file_lock(collection, exclusive=True):
+                # Rileggi sotto lock: un altro processo può aver scritto nel frattempo
+                notes = self._read(collection)
+                snapshot = self.snapshot_path(collection)
+                tmp_file = snapshot.with_name(f".{snapshot.name}.tmp")
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump([{'key': k, 'note': n} for k, n in notes.items()], f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, snapshot)
+                # Se il processo muore qui, il journal viene solo riapplicato (idempotente)
+                with open(self.journal_path(collection), 'w') as f:
+                    inode = os.fstat(f.fileno()).st_ino
+                self._journal_lines[collection] = 0
+                self._positions[collection] = (self._stat_key(snapshot), inode, 0)
+            return len(notes)
+
+    def close(self):
+        pass
+
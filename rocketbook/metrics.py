@@ -0,0 +1,227 @@
+"""
+Tempi e contatori per stadio del sync (list, get, download, decode, upload,
+share, render, commit, push), condivisi dal processo.
+
+Ogni chiamata API passa dal rate limiter, che registra la durata nello stadio
+del suo methodId (retry e attese di quota inclusi) e conta le chiamate per
+metodo; decode, render, commit e push sono cronometrati dove avvengono.
+Per stadio la memoria è costante anche nel daemon: istogramma a bucket fissi,
+somma, conteggio e massimo cumulativi, e le ultime DURATION_WINDOW durate per
+p50/p95. A fine esecuzione flush() aggiunge una riga JSON a METRICS_FILE e, con
+ROCKETBOOK_PROMETHEUS_DIR, scrive rocketbook_<script>.prom per il textfile
+collector di node_exporter.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from itertools import accumulate
+
+from rocketbook.config import METRICS_FILE, PROMETHEUS_DIR
+
+STAGES = ('list', 'get', 'download', 'decode', 'upload', 'share', 'render', 'commit', 'push')
+
+# Stadio di ogni metodo API; gli altri metodi sono solo contati
+METHOD_STAGES = {
+    'gmail.users.messages.list': 'list',
+    'gmail.users.history.list': 'list',
+    'drive.files.list': 'list',
+    'drive.changes.list': 'list',
+    'gmail.users.messages.get': 'get',
+    'gmail.users.messages.attachments.get': 'download',
+    'drive.files.create': 'upload',
+    'drive.permissions.create': 'share',
+}
+
+# Limiti superiori dei bucket dell'istogramma (secondi), come Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DURATION_WINDOW = 1024  # durate recenti per stadio su cui si calcolano p50/p95
+
+
+def percentile(sorted_values, fraction):
+    """Percentile per rango più vicino di una lista già ordinata."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class _StageDurations:
+    """Durate di uno stadio: totali e istogramma dall'avvio, percentili sulle ultime `window`."""
+
+    def __init__(self, window=DURATION_WINDOW):
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)  # operazioni per bucket, non cumulative
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        # Primo limite >= seconds (le="..." di Prometheus); oltre l'ultimo conta solo in count (+Inf)
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.recent.append(seconds)
+
+
+class Metrics:
+    """Durate per stadio (istogrammi), byte trasferiti, chiamate API e accessi alla cache."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.durations = defaultdict(_StageDurations)  # stadio -> durate (memoria costante)
+        self.bytes = Counter()              # stadio -> byte
+        self.api_calls = Counter()          # methodId -> chiamate (tentativi compresi)
+        self.cache = Counter()              # 'hits' / 'misses' della cache allegati
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, nbytes=0):
+        with self._lock:
+            self.durations[stage].add(seconds)
+            if nbytes:
+                self.bytes[stage] += nbytes
+
+    def add_bytes(self, stage, nbytes):
+        with self._lock:
+            self.bytes[stage] += nbytes
+
+    def count_call(self, method):
+        with self._lock:
+            self.api_calls[method or 'unknown'] += 1
+
+    def count_cache(self, hit):
+        with self._lock:
+            self.cache['hits' if hit else 'misses'] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        """Cronometra il blocco nello stadio `stage`; anche se solleva un'eccezione."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Statistiche correnti come dict serializzabile in JSON."""
+        with self._lock:
+            stages = {}
+            for stage in sorted(self.durations, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+                durations = self.durations[stage]
+                recent = sorted(durations.recent)
+                stages[stage] = {
+                    'count': durations.count,
+                    'seconds': round(durations.seconds, 6),
+                    'p50': round(percentile(recent, 0.50), 6),
+                    'p95': round(percentile(recent, 0.95), 6),
+                    'max': round(durations.max, 6),
+                    'bytes': self.bytes[stage],
+                    'buckets': list(accumulate(durations.buckets)),
+                }
+            for stage, nbytes in self.bytes.items():
+                stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'bytes': nbytes})
+            return {
+                'ts': round(time.time(), 3),
+                'duration': round(time.time() - self.started, 3),
+                'stages': stages,
+                'api_calls': dict(self.api_calls),
+                'cache': {'hits': self.cache['hits'], 'misses': self.cache['misses']},
+            }
+
+    def summary(self):
+        stages = self.snapshot()['stages']
+        if not stages:
+            return "⏱️ Stadi: nessuna operazione"
+        parts = [f"{stage} {s['seconds']:.2f}s/{s['count']}" for stage, s in stages.items()]
+        return "⏱️ Stadi: " + ", ".join(parts)
+
+
+def prometheus_text(snapshot, script):
+    """Snapshot nel formato di esposizione testuale di Prometheus."""
+    label = f'script="{script}"'
+    lines = [
+        '# HELP rocketbook_stage_duration_seconds Durata delle operazioni per stadio.',
+        '# TYPE rocketbook_stage_duration_seconds histogram',
+    ]
+    for stage, s in snapshot['stages'].items():
+        if not s['count']:
+            continue
+        for bound, count in zip(BUCKETS, s['buckets']):
+            lines.append(f'rocketbook_stage_duration_seconds_bucket{{{label},stage="{stage}",le="{bound:g}"}} {count}')
+        lines.append(f'rocketbook_stage_duration_seconds_bucket{{{label},stage="{stage}",le="+Inf"}} {s["count"]}')
+        lines.append(f'rocketbook_stage_duration_seconds_sum{{{label},stage="{stage}"}} {s["seconds"]}')
+        lines.append(f'rocketbook_stage_duration_seconds_count{{{label},stage="{stage}"}} {s["count"]}')
+
+    lines += ['# HELP rocketbook_stage_bytes Byte trasferiti o scritti per stadio nell\'ultima esecuzione.',
+              '# TYPE rocketbook_stage_bytes gauge']
+    lines += [f'rocketbook_stage_bytes{{{label},stage="{stage}"}} {s["bytes"]}'
+              for stage, s in snapshot['stages'].items() if s['bytes']]
+
+    lines += ['# HELP rocketbook_api_calls Chiamate API per metodo nell\'ultima esecuzione.',
+              '# TYPE rocketbook_api_calls gauge']
+    lines += [f'rocketbook_api_calls{{{label},method="{method}"}} {count}'
+              for method, count in sorted(snapshot['api_calls'].items())]
+
+    lines += ['# HELP rocketbook_cache_requests Accessi alla cache allegati nell\'ultima esecuzione.',
+              '# TYPE rocketbook_cache_requests gauge']
+    lines += [f'rocketbook_cache_requests{{{label},result="{result}"}} {count}'
+              for result, count in snapshot['cache'].items()]
+
+    lines += ['# TYPE rocketbook_last_run_timestamp_seconds gauge',
+              f'rocketbook_last_run_timestamp_seconds{{{label}}} {snapshot["ts"]}',
+              '# TYPE rocketbook_run_duration_seconds gauge',
+              f'rocketbook_run_duration_seconds{{{label}}} {snapshot["duration"]}']
+    return '\n'.join(lines) + '\n'
+
+
+def _atomic_write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics():
+    """Metriche condivise del processo (create al primo uso)."""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+        return _default_metrics
+
+
+def timer(stage):
+    """Scorciatoia per get_metrics().timer(stage)."""
+    return get_metrics().timer(stage)
+
+
+def flush(script, metrics_file=METRICS_FILE, prometheus_dir=PROMETHEUS_DIR):
+    """
+    Fine esecuzione: una riga JSON in metrics_file (tendenze nel tempo)
+    e il textfile Prometheus, se configurato. Restituisce lo snapshot.
+    """
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    record = {'script': script, 'host': socket.gethostname(), 'pid': os.getpid(), **snapshot}
+    try:
+        metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(metrics_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if prometheus_dir:
+            _atomic_write(prometheus_dir / f"rocketbook_{script}.prom", prometheus_text(snapshot, script))
+    except OSError as e:
+        print(f"⚠️ Metriche non salvate: {e}")
+    print(metrics.summary())
+    return snapshot
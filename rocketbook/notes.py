@@ -0,0 +1,185 @@
+"""
+Schema unico delle note Rocketbook e parsing dei messaggi Gmail.
+
+Una nota è un dict con le chiavi:
+    id          ID del messaggio Gmail (None per note aggiunte a mano)
+    title       titolo ripulito dal subject
+    date        data leggibile, es. "17 Feb 2026"
+    date_iso    data e ora ISO 8601 (senza fuso), usata per ordinare
+    url         link al PDF (Drive) o al messaggio; "#" se assente
+    attachments allegati PDF: {id, filename, size, message_id}
+    tags        etichette per la ricerca
+    preview     testo breve mostrato nelle card
+    pages       pagine totali dei PDF (0 se non ancora analizzati)
+    content     testo estratto dai PDF (troncato), indicizzato per la ricerca
+    thumbnail   miniatura della prima pagina {src, width, height}, o None
+"""
+
+import re
+from datetime import datetime
+
+from rocketbook.config import ROCKETBOOK_SENDER
+
+DEFAULT_TITLE = "Nota Rocketbook"
+DEFAULT_TAGS = ["Rocketbook", "Scan", "PDF"]
+
+_SUBJECT_PREFIX = re.compile(r'^(Fwd:|Re:|FW:|RE:)\s*', re.IGNORECASE)
+_SUBJECT_SUFFIX = re.compile(r'\s*-\s*Rocketbook\s*$', re.IGNORECASE)
+_SUBJECT_BRAND = re.compile(r'^Rocketbook\s*-\s*', re.IGNORECASE)
+_DATE_DMY = re.compile(r'(\d{1,2})\s+([A-Za-z]{3})[a-z]*\.?\s+(\d{4})')
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    'gen': 1, 'mag': 5, 'giu': 6, 'lug': 7, 'ago': 8, 'set': 9,
+    'ott': 10, 'dic': 12
+}
+
+
+def clean_subject(subject):
+    """Pulisci subject email per usarlo come titolo."""
+    subject = _SUBJECT_PREFIX.sub('', subject)
+    subject = _SUBJECT_SUFFIX.sub('', subject)
+    subject = _SUBJECT_BRAND.sub('', subject)
+    return subject.strip() or DEFAULT_TITLE
+
+
+def parse_email_date(date_str):
+    """
+    Parse data da header email, es. "Wed, 15 Feb 2026 14:30:00 +0000".
+    Accetta anche mesi abbreviati in italiano; se fallisce restituisce adesso.
+    """
+    # email.utils trascina urllib, socket e calendar: lo paga solo chi analizza email
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return parsedate_to_datetime(date_str).replace(tzinfo=None)
+    except (TypeError, ValueError, IndexError):
+        pass
+
+    match = _DATE_DMY.search(date_str or '')
+    if match:
+        day, month_str, year = match.groups()
+        month = MONTHS.get(month_str.lower())
+        if month:
+            try:
+                return datetime(int(year), month, int(day))
+            except ValueError:
+                pass
+
+    return datetime.now()
+
+
+def make_note(title, date=None, url=None, note_id=None, attachments=None, tags=None, preview=None,
+              pages=None, content=None, thumbnail=None):
+    """Crea una nota nello schema unico; `date` può essere datetime, ISO o "17 Feb 2026"."""
+    if date is None:
+        date = datetime.now()
+    elif isinstance(date, str):
+        try:
+            date = datetime.fromisoformat(date)
+        except ValueError:
+            date = parse_email_date(date)
+
+    return {
+        'id': note_id,
+        'title': title,
+        'date': date.strftime('%d %b %Y'),
+        'date_iso': date.isoformat(),
+        'url': url or '#',
+        'attachments': attachments or [],
+        'tags': list(tags) if tags is not None else list(DEFAULT_TAGS),
+        'preview': preview or '',
+        'pages': pages or 0,
+        'content': content or '',
+        'thumbnail': thumbnail,
+    }
+
+
+def normalize_note(data):
+    """Converti una nota in uno dei vecchi formati (pdfUrl, message_id, drive_url...) nello schema unico."""
+    note = make_note(
+        data.get('title') or DEFAULT_TITLE,
+        data.get('date_iso') or data.get('date'),
+        url=data.get('url') or data.get('pdfUrl') or data.get('drive_url'),
+        note_id=data.get('id') or data.get('message_id'),
+        attachments=data.get('attachments'),
+        tags=data.get('tags'),
+        preview=data.get('preview'),
+        pages=data.get('pages'),
+        content=data.get('content'),
+        thumbnail=data.get('thumbnail'),
+    )
+    # La data leggibile salvata vince (può essere stata scritta a mano)
+    if data.get('date'):
+        note['date'] = data['date']
+    return note
+
+
+def headers_of(msg):
+    """Header del messaggio come dict {nome: valore}."""
+    return {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+
+
+def pdf_attachments(msg):
+    """Allegati PDF del messaggio."""
+    attachments = []
+    for part in msg.get('payload', {}).get('parts', []):
+        filename = part.get('filename', '')
+        attachment_id = part.get('body', {}).get('attachmentId')
+        if filename.lower().endswith('.pdf') and attachment_id:
+            attachments.append({
+                'id': attachment_id,
+                'filename': filename,
+                'size': part['body'].get('size', 0),
+                'message_id': msg.get('id'),
+            })
+    return attachments
+
+
+def is_rocketbook_sender(msg):
+    """Verifica che il messaggio arrivi da Rocketbook (basta il formato metadata con l'header From)."""
+    sender = {k.lower(): v for k, v in headers_of(msg).items()}.get('from', '')
+    return ROCKETBOOK_SENDER in sender.lower()
+
+
+def is_rocketbook_message(msg):
+    """Verifica che il messaggio arrivi da Rocketbook e contenga un PDF."""
+    return is_rocketbook_sender(msg) and bool(pdf_attachments(msg))
+
+
+def parse_message(msg):
+    """Estrai la nota da un messaggio Gmail completo (format='full'); None se malformato."""
+    msg_id = msg.get('id')
+    try:
+        headers = headers_of(msg)
+        subject = headers.get('Subject', DEFAULT_TITLE)
+        attachments = pdf_attachments(msg)
+        preview = ''
+        if attachments:
+            names = ', '.join(a['filename'] for a in attachments)
+            preview = f"Scansione Rocketbook con allegato {names}"
+
+        return make_note(
+            clean_subject(subject),
+            parse_email_date(headers.get('Date', '')),
+            url=f"https://mail.google.com/mail/u/0/#all/{msg_id}",
+            note_id=msg_id,
+            attachments=attachments,
+            preview=preview,
+        )
+
+    except Exception as e:
+        print(f"⚠️ Errore parsing email {msg_id}: {e}")
+        return None
+
+
+def merge_notes(new_notes, old_notes, limit=None):
+    """Unisci note nuove e salvate senza duplicati (per id, o titolo+data), dalla più recente."""
+    merged = {}
+    for note in list(new_notes) + list(old_notes):
+        key = note.get('id') or (note.get('title'), note.get('date'))
+        merged.setdefault(key, note)
+
+    notes = sorted(merged.values(), key=lambda n: n.get('date_iso') or '', reverse=True)
+    return notes[:limit] if limit else notes
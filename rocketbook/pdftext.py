@@ -0,0 +1,192 @@
+"""
+Estrazione del testo incorporato e del numero di pagine dai PDF scaricati (senza OCR).
+
+Usa pypdf se installato; altrimenti un estrattore minimo interno che conta le
+pagine e legge le stringhe degli operatori Tj/TJ dagli stream (anche FlateDecode).
+I risultati sono in cache per SHA-256 del contenuto: ogni PDF viene analizzato
+una sola volta, e i PDF nuovi sono distribuiti su un pool di processi.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+from rocketbook.config import EXTRACT_WORKERS, PDF_TEXT_CACHE
+from rocketbook.pipeline import process_map
+
+TEXT_MAX_CHARS = 20000     # testo conservato in cache per PDF
+CONTENT_MAX_CHARS = 2000   # testo salvato nella nota (ed esportato nel JSON)
+PREVIEW_CHARS = 160        # anteprima mostrata nelle card
+
+_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+_STREAM = re.compile(rb'(?<!end)stream\r?\n')
+_TEXT_BLOCK = re.compile(rb'BT(.*?)ET', re.DOTALL)
+_TEXT_OP = re.compile(rb'(\((?:\\.|[^\\)])*\))\s*(?:Tj|\'|")|\[((?:\\.|[^\]])*)\]\s*TJ', re.DOTALL)
+_STRING = re.compile(rb'\((?:\\.|[^\\)])*\)', re.DOTALL)
+_ESCAPE = re.compile(rb'\\([0-7]{1,3}|.)', re.DOTALL)
+_SPACES = re.compile(r'\s+')
+
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _unescape(literal):
+    """Contenuto di una stringa PDF letterale "(...)"."""
+    def replace(match):
+        seq = match.group(1)
+        if seq[:1].isdigit():
+            return bytes([int(seq, 8) & 0xFF])
+        if seq in b'\r\n':
+            return b''  # a capo di continuazione
+        return _ESCAPES.get(seq, seq)
+    return _ESCAPE.sub(replace, literal[1:-1]).decode('latin-1')
+
+
+def _extract_builtin(data):
+    pages = len(_PAGE.findall(data))
+    parts = []
+    for match in _STREAM.finditer(data):
+        # Dizionario dello stream: da "obj" fino alla parola chiave stream
+        header = data[data.rfind(b'obj', 0, match.start()):match.start()]
+        end = data.find(b'endstream', match.end())
+        body = data[match.end():end if end != -1 else len(data)]
+        if b'/FlateDecode' in header:
+            try:
+                body = zlib.decompressobj().decompress(body)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue  # immagini (DCT, JBIG2...) e filtri non supportati
+        for block in _TEXT_BLOCK.findall(body):
+            for single, array in _TEXT_OP.findall(block):
+                strings = [single] if single else _STRING.findall(array)
+                parts.append(''.join(_unescape(s) for s in strings))
+    return pages, ' '.join(parts)
+
+
+def _extract_pypdf(path):
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return len(reader.pages), ' '.join(page.extract_text() or '' for page in reader.pages)
+
+
+def extract_pdf(path):
+    """Pagine e testo incorporato di un PDF: {'pages', 'text'}. Gira nei processi del pool."""
+    try:
+        try:
+            pages, text = _extract_pypdf(path)
+        except ImportError:
+            with open(path, 'rb') as f:
+                pages, text = _extract_builtin(f.read())
+    except Exception as e:
+        # PDF danneggiato: niente testo, ma il sync continua
+        print(f"⚠️ Testo non estraibile da {os.path.basename(path)}: {e}")
+        pages, text = 0, ''
+    return {'pages': pages, 'text': _SPACES.sub(' ', text).strip()[:TEXT_MAX_CHARS]}
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfTextCache:
+    """sha256 del PDF -> {'pages', 'text'}, salvata in un file JSON."""
+
+    def __init__(self, path=PDF_TEXT_CACHE):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path.exists():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Cache testo PDF illeggibile, verrà ricreata: {e}")
+
+    def get(self, sha256):
+        with self._lock:
+            return self._entries.get(sha256)
+
+    def put(self, sha256, result):
+        with self._lock:
+            self._entries[sha256] = result
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.path)
+            self._dirty = False
+
+
+def get_pdf_text_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PdfTextCache()
+        return _cache
+
+
+def extract_texts(paths, workers=EXTRACT_WORKERS, cache=None):
+    """
+    Testo e pagine di più PDF: {path: {'pages', 'text'}}.
+    Solo i PDF mai visti (per contenuto) vengono analizzati, in parallelo su
+    `workers` processi; con un solo PDF nuovo si evita l'avvio del pool.
+    """
+    if cache is None:
+        cache = get_pdf_text_cache()
+
+    hashes = {path: file_sha256(path) for path in set(map(str, paths))}
+    results = {path: cache.get(sha256) for path, sha256 in hashes.items()}
+    # Un solo path per contenuto: i duplicati riusano il risultato
+    missing = {}
+    for path, result in results.items():
+        if result is None:
+            missing.setdefault(hashes[path], path)
+
+    if missing:
+        todo = list(missing.values())
+        for sha256, result in zip(missing, process_map(extract_pdf, todo, workers)):
+            cache.put(sha256, result)
+        cache.save()
+        print(f"📄 Testo estratto da {len(todo)} PDF ({len(results) - len(todo)} già in cache)")
+
+    return {path: cache.get(sha256) for path, sha256 in hashes.items()}
+
+
+def describe_notes(notes, paths, workers=EXTRACT_WORKERS):
+    """
+    Arricchisci le note con pagine, testo e anteprima dai PDF scaricati.
+    `paths` mappa (message_id, filename) -> path locale del PDF.
+    """
+    results = extract_texts(set(paths.values()), workers)
+    for note in notes:
+        found = [results[str(paths[(a['message_id'], a['filename'])])]
+                 for a in note.get('attachments', []) if (a['message_id'], a['filename']) in paths]
+        if not found:
+            continue
+        note['pages'] = sum(r['pages'] for r in found)
+        text = ' '.join(r['text'] for r in found if r['text'])
+        if text:
+            note['content'] = text[:CONTENT_MAX_CHARS]
+            note['preview'] = text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS].rsplit(' ', 1)[0] + '…'
+        elif note['pages']:
+            names = ', '.join(a['filename'] for a in note['attachments'])
+            note['preview'] = f"Scansione Rocketbook con allegato {names} ({note['pages']} pagine)"
+    return notes
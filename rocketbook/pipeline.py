@@ -0,0 +1,222 @@
+"""
+Pipeline a stadi per le operazioni di rete Rocketbook.
+Ogni stadio ha il suo pool di thread; gli stadi sono collegati da code
+limitate, così uno stadio lento rallenta chi lo alimenta (backpressure)
+invece di accumulare file scaricati in memoria o su disco.
+Il lavoro CPU-bound sui PDF (testo, miniature) usa invece process_map.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from rocketbook.ratelimit import get_rate_limiter
+
+PIPELINE_WORKERS = int(os.environ.get("ROCKETBOOK_WORKERS", "4"))
+
+_thread_local = threading.local()
+_DONE = object()
+
+# name: etichetta per i log, func(valore) -> valore per lo stadio successivo
+# (None = elemento scartato), workers: thread dedicati allo stadio
+Stage = namedtuple("Stage", ["name", "func", "workers"])
+
+
+def thread_http(service):
+    """httplib2 non è thread-safe: un client HTTP autorizzato per thread e credenziali."""
+    credentials = getattr(getattr(service, "_http", None), "credentials", None)
+    if credentials is None:
+        return None
+
+    clients = _thread_local.__dict__.setdefault("http", {})
+    if id(credentials) not in clients:
+        try:
+            import google_auth_httplib2
+            import httplib2
+            clients[id(credentials)] = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        except ImportError:
+            clients[id(credentials)] = None
+    return clients[id(credentials)]
+
+
+def execute(request, service, limiter=None):
+    """
+    Esegui una richiesta googleapiclient con il client HTTP del thread corrente,
+    rispettando la quota del metodo e ritentando 429/5xx (rocketbook.ratelimit).
+    """
+    if isinstance(request, _InstrumentedRequest):
+        return request.execute()  # quota e retry già gestiti dal proxy
+    if limiter is None:
+        limiter = get_rate_limiter()
+    http = thread_http(service)
+    return limiter.call(getattr(request, 'methodId', None),
+                        lambda: request.execute(http=http) if http else request.execute())
+
+
+class ApiStats:
+    """Contatori e tempi delle chiamate API, per nome del metodo (es. files.list)."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.seconds = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.calls[name] += 1
+            self.seconds[name] += seconds
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def summary(self, label, files=None):
+        lines = [f"📊 {label}: {self.total_calls()} chiamate, {sum(self.seconds.values()):.2f}s"]
+        if files:
+            lines[0] += f" ({self.total_calls() / files:.1f} per file)"
+        for name, count in self.calls.most_common():
+            lines.append(f"   {name:<28} {count:>5}  {self.seconds[name]:.2f}s")
+        return "\n".join(lines)
+
+
+class InstrumentedService:
+    """
+    Proxy di un service googleapiclient che conta e cronometra ogni execute(),
+    usa il client HTTP del thread corrente e passa dal rate limiter condiviso
+    (`api` è il prefisso dei nomi di metodo per la quota, es. "drive").
+    """
+
+    def __init__(self, target, stats, path="", root=None, api=None, limiter=None):
+        self._target = target
+        self._stats = stats
+        self._path = path
+        self._root = root if root is not None else target
+        self._api = api
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        path = f"{self._path}.{name}" if self._path else name
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedRequest(result, path, self._stats, self._root, self._api, self._limiter)
+            return InstrumentedService(result, self._stats, path, self._root, self._api, self._limiter)
+        return call
+
+
+class _InstrumentedRequest:
+    def __init__(self, request, name, stats, root, api=None, limiter=None):
+        self._request = request
+        self._name = name
+        self._stats = stats
+        self._root = root
+        self._method = getattr(request, "methodId", None) or (f"{api}.{name}" if api else None)
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self._request, name)
+
+    def execute(self, **kwargs):
+        start = time.perf_counter()
+        try:
+            kwargs.setdefault("http", thread_http(self._root))
+            if kwargs["http"] is None:
+                del kwargs["http"]
+            limiter = self._limiter or get_rate_limiter()
+            return limiter.call(self._method, lambda: self._request.execute(**kwargs))
+        finally:
+            self._stats.record(self._name, time.perf_counter() - start)
+
+
+def run_pipeline(items, stages, queue_size=None):
+    """
+    Fai passare ogni elemento attraverso tutti gli stadi, in parallelo.
+    Restituisce i risultati dell'ultimo stadio nell'ordine di `items`;
+    None dove uno stadio ha scartato l'elemento o ha sollevato un'eccezione.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items or not stages:
+        return results
+
+    if queue_size is None:
+        queue_size = 2 * max(stage.workers for stage in stages)
+
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    queues.append(queue.Queue())  # uscita: il collector la svuota subito
+    remaining = [stage.workers for stage in stages]
+    lock = threading.Lock()
+
+    def worker(index, stage):
+        in_q, out_q = queues[index], queues[index + 1]
+        while True:
+            entry = in_q.get()
+            if entry is _DONE:
+                break
+            position, value = entry
+            try:
+                value = stage.func(value)
+            except Exception as e:
+                print(f"⚠️ Errore {stage.name}: {e}")
+                value = None
+            if value is not None:
+                out_q.put((position, value))
+
+        # L'ultimo worker dello stadio chiude lo stadio successivo
+        with lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last:
+            next_workers = stages[index + 1].workers if index + 1 < len(stages) else 1
+            for _ in range(next_workers):
+                out_q.put(_DONE)
+
+    threads = [
+        threading.Thread(target=worker, args=(index, stage), name=f"{stage.name}-{n}", daemon=True)
+        for index, stage in enumerate(stages)
+        for n in range(stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    def feed():
+        # put() blocca quando il primo stadio è saturo: backpressure sulla sorgente
+        for position, item in enumerate(items):
+            queues[0].put((position, item))
+        for _ in range(stages[0].workers):
+            queues[0].put(_DONE)
+
+    feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+    feeder.start()
+
+    while True:
+        entry = queues[-1].get()
+        if entry is _DONE:
+            break
+        position, value = entry
+        results[position] = value
+
+    feeder.join()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def process_map(func, items, workers):
+    """
+    Applica func (funzione di modulo, serializzabile) agli elementi su un pool
+    di processi, mantenendo l'ordine. Con un solo elemento o un solo worker
+    resta nel processo corrente: l'avvio del pool costerebbe più del lavoro.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    workers = min(workers, len(items))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items, chunksize=max(1, len(items) // (workers * 4))))
@@ -0,0 +1,225 @@
+"""
+Profilazione degli script (`--profile`), per capire dove va il tempo di un sync lento.
+
+- cprofile: cProfile su tutto il run, dump pstats in PROFILE_DIR (apribile con
+  `python -m pstats` o snakeviz) e le N funzioni più costose per tempo cumulativo.
+  Copre anche i thread di lavoro: da Python 3.12 cProfile vede le chiamate di tutti
+  i thread (sys.monitoring, ma con tempi approssimati quando i thread si alternano);
+  prima un profiler per ogni thread avviato durante il run, attivato e disattivato
+  dal thread stesso, sommati nel dump se il thread è terminato entro la fine del run.
+  I thread già attivi all'avvio, o ancora attivi alla fine, restano esclusi
+- sample: campionatore a basso overhead, un thread legge gli stack di tutti i
+  thread ogni `interval` secondi; scrive gli stack in formato collapsed
+  (flamegraph.pl, speedscope) e stampa le N funzioni più campionate
+
+Con cprofile, o con --profile-memory, tracemalloc misura il picco di memoria del run
+e delle sezioni marcate con memory_section() (allegati, rendering della dashboard),
+con le righe che hanno allocato di più. tracemalloc rallenta ogni allocazione, quindi
+il campionamento ne resta fuori se non richiesto. Senza tracemalloc memory_section()
+non fa nulla.
+"""
+
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from rocketbook.config import PROFILE_DIR
+
+PROFILE_MODES = ('cprofile', 'sample')
+PROFILE_TOP = 20
+SAMPLE_INTERVAL = 0.005  # secondi tra due campioni
+SECTION_TOP_LINES = 5
+# Da 3.12 cProfile usa sys.monitoring: un solo profiler attivo, ma per tutti i thread
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+_sections = {}   # nome -> (picco in byte, righe che hanno allocato di più)
+_peak = 0        # picco globale, conservato tra i reset_peak() delle sezioni
+_memory_lock = threading.Lock()
+
+
+def add_profile_arguments(parser):
+    """Opzioni --profile comuni agli script rocketbook_*.py."""
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILE_MODES,
+                        help='profila il run: cprofile (default) o sample (campionamento a basso overhead)')
+    parser.add_argument('--profile-top', type=int, default=PROFILE_TOP, metavar='N',
+                        help='funzioni mostrate nel riepilogo (default: %(default)s)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='picco di memoria con tracemalloc (sempre attivo con cprofile)')
+
+
+@contextlib.contextmanager
+def memory_section(name):
+    """Picco di memoria del blocco e righe che hanno allocato di più (solo con tracemalloc attivo)."""
+    global _peak
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    with _memory_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        _peak = max(_peak, peak)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        with _memory_lock:
+            current_after, peak = tracemalloc.get_traced_memory()
+            _peak = max(_peak, peak)
+            grown = tracemalloc.take_snapshot().compare_to(before, 'lineno')[:SECTION_TOP_LINES]
+            section_peak = peak - current
+            if section_peak >= _sections.get(name, (0, None))[0]:
+                _sections[name] = (section_peak, grown)
+
+
+class StackSampler:
+    """Campiona gli stack di tutti i thread da un thread dedicato."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()   # stack collapsed "a;b;c" -> campioni
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top):
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        lines = [f"🔬 Campioni: {self.samples} ogni {self.interval * 1000:.0f} ms (tutti i thread)",
+                 f"   {'propri':>7} {'totali':>7}  funzione"]
+        for name, count in own.most_common(top):
+            lines.append(f"   {count:>7} {total[name]:>7}  {name}")
+        return '\n'.join(lines)
+
+
+def _format_bytes(size):
+    return f"{size / (1024 * 1024):.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+
+
+def memory_summary():
+    lines = [f"🧠 Picco memoria Python (tracemalloc): {_format_bytes(max(_peak, tracemalloc.get_traced_memory()[1]))}"]
+    for name, (peak, grown) in _sections.items():
+        lines.append(f"   {name}: picco {_format_bytes(peak)}")
+        for stat in grown:
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                lines.append(f"      +{_format_bytes(stat.size_diff):>9}  {frame.filename}:{frame.lineno}")
+    return '\n'.join(lines)
+
+
+def _profiled_run(run, profilers):
+    """
+    Thread.run con un cProfile del thread stesso: prima di 3.12 disable() agisce solo
+    sul thread che lo chiama, quindi ogni thread chiude il proprio profiler e lo
+    aggiunge a `profilers` quando termina.
+    """
+    def wrapper(self):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return run(self)
+        finally:
+            profiler.disable()
+            profilers.append(profiler)
+    return wrapper
+
+
+@contextlib.contextmanager
+def profiled(mode, name, top=PROFILE_TOP, out_dir=PROFILE_DIR, memory=False):
+    """
+    Profila il blocco con `mode` (None = nessuna profilazione) e stampa il riepilogo;
+    tracemalloc con cprofile o memory=True (anche senza `mode`).
+    """
+    global _peak
+    memory = memory or mode == 'cprofile'
+    if not mode and not memory:
+        yield
+        return
+
+    if mode:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stem = out_dir / f"{name}-{datetime.now():%Y%m%d-%H%M%S}"
+    if memory:
+        _sections.clear()
+        _peak = 0
+        tracemalloc.start()
+    thread_profilers = []
+    thread_run = threading.Thread.run
+    profiler = None
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        if not PROFILES_ALL_THREADS:
+            threading.Thread.run = _profiled_run(thread_run, thread_profilers)
+    elif mode:
+        profiler = StackSampler()
+    start = time.perf_counter()
+    if mode == 'cprofile':
+        profiler.enable()
+    elif mode:
+        profiler.start()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if mode == 'cprofile':
+            profiler.disable()
+            threading.Thread.run = thread_run
+            # Copia: un thread ancora attivo può aggiungere il suo profiler più tardi
+            thread_profilers = list(thread_profilers)
+            path = stem.with_suffix('.pstats')
+            stats = pstats.Stats(profiler, *thread_profilers, stream=io.StringIO())
+            stats.dump_stats(path)
+            threads = ('tutti i thread' if PROFILES_ALL_THREADS
+                       else f"thread principale + {len(thread_profilers)} avviati e terminati nel run")
+            print(f"🔬 Profilo cProfile ({elapsed:.2f}s, {threads}): {path}")
+            stats.sort_stats('cumulative').print_stats(top)
+            print(stats.stream.getvalue().rstrip())
+        elif mode:
+            profiler.stop()
+            path = stem.with_suffix('.folded')
+            profiler.write_collapsed(path)
+            print(f"🔬 Profilo a campionamento ({elapsed:.2f}s): {path}")
+            print(profiler.summary(top))
+        if memory:
+            print(memory_summary())
+            tracemalloc.stop()
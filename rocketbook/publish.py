@@ -0,0 +1,330 @@
+"""
+Pubblicazione della dashboard su GitHub Pages (commit + push della checkout).
+
+push_to_github() pubblica subito. request_publish() mette la pubblicazione
+in coda: un processo publisher in background attende che le richieste si
+fermino per `debounce` secondi e poi fa un solo commit per tutte. La coda
+è un file JSON fuori dalla checkout, protetto da flock, quindi più comandi
+`rocketbook_cli.py add` lanciati di seguito condividono lo stesso commit.
+
+Il commit contiene solo i file pubblicati (PUBLISHED_FILES, PUBLISHED_DIRS)
+scritti dalle esecuzioni, registrati con rocketbook.changes e accodati nel
+file di stato: update-index legge solo quei file, senza `git add -A` né
+scansione di PDF e miniature, e il costo non dipende dalla dimensione della
+checkout. `rocketbook_cli.py push` ripubblica tutti i file pubblicati con
+`git add -A`. Il commit viene saltato se l'albero è identico a HEAD, e il
+push parte solo se ci sono commit non ancora pubblicati.
+"""
+
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from rocketbook import changes
+from rocketbook.config import (DASHBOARD_DIR, DATA_FILE, INDEX_FILE, NOTES_FILE, PDF_DIR, PUBLISH_DEBOUNCE,
+                               PUBLISH_LOG, PUBLISH_STATE, THUMB_DIR)
+from rocketbook.metrics import flush as flush_metrics, timer
+
+BOT_IDENTITY = ['-c', 'user.email=bot@dailybrief.local', '-c', 'user.name=Daily Brief Bot']
+
+# Cosa finisce nel commit: i file della dashboard e le directory di PDF e miniature
+PUBLISHED_FILES = (INDEX_FILE.name, DATA_FILE.name, NOTES_FILE.name)
+PUBLISHED_DIRS = (PDF_DIR.name, THUMB_DIR.name)
+
+
+@contextmanager
+def _file_lock(path):
+    """Lock esclusivo tra processi (bloccante) sul file `path`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _lock_paths(state_file):
+    """(lock della coda, lock del publisher) accanto al file di stato."""
+    return state_file.with_name(f"{state_file.name}.lock"), state_file.with_name(f"{state_file.name}.run")
+
+
+def _read_state(state_file):
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    return {'requested': state.get('requested', 0), 'published': state.get('published', 0),
+            'last_request': state.get('last_request', 0.0), 'publisher': state.get('publisher'),
+            'paths': state.get('paths', [])}
+
+
+def _alive(pid):
+    """True se il processo `pid` esiste ancora."""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_state(state_file, state):
+    tmp_file = state_file.with_name(f".{state_file.name}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def _update_state(state_file, update):
+    """Applica update(state) sotto il lock della coda; restituisce il nuovo stato."""
+    with _file_lock(_lock_paths(state_file)[0]):
+        state = _read_state(state_file)
+        update(state)
+        _write_state(state_file, state)
+        return state
+
+
+def _ls_tree(git, treeish):
+    """Nomi delle voci di un albero git; vuoto se l'albero non esiste."""
+    result = git('ls-tree', '-z', '--name-only', treeish)
+    return set(filter(None, result.stdout.split('\0'))) if result.returncode == 0 else set()
+
+
+def _add_paths(state, paths):
+    """Aggiungi `paths` (file scritti da pubblicare) a quelli in coda."""
+    state['paths'] = sorted(set(state['paths']).union(paths))
+
+
+def _published_paths(dashboard_dir, paths):
+    """Percorsi relativi a dashboard_dir dei file pubblicati tra `paths` (assoluti)."""
+    dashboard_dir = os.path.abspath(dashboard_dir)
+    published = []
+    for path in paths:
+        relative = os.path.relpath(path, dashboard_dir)
+        top = relative.split(os.sep, 1)[0]
+        if relative in PUBLISHED_FILES or (top in PUBLISHED_DIRS and relative != top):
+            published.append(relative.replace(os.sep, '/'))
+    return published
+
+
+def _commit_changes(git, dashboard_dir, paths, message):
+    """
+    Commit dei file pubblicati con i comandi plumbing (update-index, write-tree,
+    commit-tree): solo i `paths` scritti dall'esecuzione vengono letti e hashati,
+    senza scandire la checkout; un path che non esiste più viene rimosso.
+    paths=None (elenco sconosciuto, `push` manuale): stage di tutti i file
+    pubblicati con `git add -A`. Restituisce lo sha del commit, o None se
+    l'albero è identico a HEAD.
+    """
+    # Commit e albero di HEAD con un solo comando; checkout senza commit: entrambi vuoti
+    head = git('rev-parse', 'HEAD', 'HEAD^{tree}')
+    head, head_tree = head.stdout.split() if head.returncode == 0 else ('', '')
+    if paths is None:
+        existing = _ls_tree(git, 'HEAD') if head else set()
+        pathspec = [name for name in (*PUBLISHED_FILES, *PUBLISHED_DIRS)
+                    if name in existing or (dashboard_dir / name).exists()]
+        result = git('add', '-A', '--', *pathspec) if pathspec else None
+    elif paths:
+        result = git('update-index', '--add', '--remove', '-z', '--stdin', input='\0'.join(paths) + '\0')
+    else:
+        return None
+    if result is not None and result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+
+    tree = git('write-tree')
+    if tree.returncode != 0:
+        raise RuntimeError(tree.stderr.strip())
+    tree = tree.stdout.strip()
+    if tree == head_tree:
+        return None
+    commit = git(*BOT_IDENTITY, 'commit-tree', tree, *(['-p', head] if head else []), '-m', message)
+    if commit.returncode != 0:
+        raise RuntimeError(commit.stderr.strip())
+    commit = commit.stdout.strip()
+    result = git('update-ref', '-m', f"commit: {message}", 'HEAD', commit, *([head] if head else []))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return commit
+
+
+def _publish(dashboard_dir, pending=1, paths=None):
+    """
+    Commit dei file pubblicati se qualcosa è cambiato (solo `paths`, relativi a
+    dashboard_dir; None = tutti), push se ci sono commit non pubblicati.
+    """
+    dashboard_dir = Path(dashboard_dir)
+
+    def git(*args, **kwargs):
+        return subprocess.run(['git', *args], cwd=dashboard_dir, capture_output=True, text=True, **kwargs)
+
+    # Commit solo se i file pubblicati differiscono da HEAD (output identico: niente commit)
+    message = f"🔄 Aggiornamento Rocketbook - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    if pending > 1:
+        message += f" ({pending} modifiche)"
+    try:
+        with timer('commit'):
+            commit = _commit_changes(git, dashboard_dir, paths, message)
+    except RuntimeError as e:
+        print(f"⚠️ Commit: {e}")
+        return False
+    if commit is None:
+        print("ℹ️ Nessuna modifica da committare")
+
+    # Push solo se main locale è avanti rispetto a origin/main
+    ahead = git('rev-list', '--count', 'origin/main..HEAD')
+    if ahead.returncode == 0 and ahead.stdout.strip() == '0':
+        print("ℹ️ Nessun commit da pubblicare")
+        return True
+
+    # Push con token da variabile d'ambiente
+    env = os.environ.copy()
+    env['GIT_ASKPASS'] = 'echo'
+    env['GIT_USERNAME'] = 'x-access-token'
+    env['GIT_PASSWORD'] = os.environ.get('GITHUB_TOKEN', '')
+
+    if not env['GIT_PASSWORD']:
+        print('❌ GITHUB_TOKEN non impostato')
+        return False
+
+    with timer('push'):
+        result = git('push', '-q', 'origin', 'main', env=env)
+
+    if result.returncode == 0:
+        print('✅ Push su GitHub completato')
+        return True
+    else:
+        print(f'❌ Push fallito: {result.stderr}')
+        return False
+
+
+def _consume(state_file, target, paths):
+    """Richieste fino a `target` pubblicate e `paths` tolti dalla coda."""
+    def update(state):
+        state['published'] = max(state['published'], target)
+        state['paths'] = [path for path in state['paths'] if path not in paths]
+    _update_state(state_file, update)
+
+
+def push_to_github(dashboard_dir=DASHBOARD_DIR, state_file=PUBLISH_STATE, rescan=False):
+    """
+    Committa i file della dashboard scritti da questo processo e quelli in coda,
+    pusha su GitHub e svuota la coda. rescan=True: committa tutti i file
+    pubblicati, anche quelli modificati a mano.
+    """
+    print("🚀 Push su GitHub...")
+    with _file_lock(_lock_paths(state_file)[1]):
+        written = changes.drain()
+        state = _update_state(state_file, lambda state: _add_paths(state, written))
+        target = state['requested']
+        paths = None if rescan else _published_paths(dashboard_dir, state['paths'])
+        ok = _publish(dashboard_dir, pending=max(1, target - state['published']), paths=paths)
+        # Anche con commit fallito i path sono consumati: update-index li ha già
+        # messi nell'indice della checkout e il prossimo write-tree li include
+        _consume(state_file, target, set(state['paths']))
+    return ok
+
+
+def request_publish(dashboard_dir=DASHBOARD_DIR, debounce=PUBLISH_DEBOUNCE, state_file=PUBLISH_STATE,
+                    spawn=True):
+    """
+    Metti in coda una pubblicazione; il publisher in background la esegue
+    dopo `debounce` secondi senza nuove richieste. debounce <= 0: push subito.
+    """
+    if debounce <= 0:
+        return push_to_github(dashboard_dir, state_file)
+
+    # Un solo publisher in background: se è vivo vedrà la nuova richiesta
+    # (controllo e avvio sotto il lock della coda, come la sua uscita)
+    with _file_lock(_lock_paths(state_file)[0]):
+        state = _read_state(state_file)
+        state['requested'] += 1
+        state['last_request'] = time.time()
+        _add_paths(state, changes.drain())
+        if spawn and not _alive(state['publisher']):
+            state['publisher'] = _spawn_publisher(dashboard_dir, debounce, state_file)
+        _write_state(state_file, state)
+    print(f"🕒 Pubblicazione in coda ({state['requested'] - state['published']} in attesa, "
+          f"commit tra {debounce:g}s)")
+    return True
+
+
+def _spawn_publisher(dashboard_dir, debounce, state_file):
+    """Avvia `python -m rocketbook.publish` staccato dal terminale."""
+    env = os.environ.copy()
+    package_root = str(Path(__file__).resolve().parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    PUBLISH_LOG.parent.mkdir(parents=True, exist_ok=True)
+    with open(PUBLISH_LOG, 'a') as log:
+        return subprocess.Popen(
+            [sys.executable, '-m', 'rocketbook.publish', '--dir', str(dashboard_dir),
+             '--debounce', str(debounce), '--state', str(state_file)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log, env=env, start_new_session=True,
+        ).pid
+
+
+def run_publisher(dashboard_dir=DASHBOARD_DIR, debounce=PUBLISH_DEBOUNCE, state_file=PUBLISH_STATE):
+    """
+    Svuota la coda: pubblica quando le richieste tacciono da `debounce` secondi
+    ed esce quando non resta nulla in attesa. Il lock del publisher lo serializza
+    con push_to_github().
+    """
+    queue_lock, run_lock = _lock_paths(state_file)
+    with _file_lock(run_lock):
+        while True:
+            with _file_lock(queue_lock):
+                state = _read_state(state_file)
+                if state['requested'] <= state['published']:
+                    state['publisher'] = None
+                    _write_state(state_file, state)
+                    return
+            wait = state['last_request'] + debounce - time.time()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            target = state['requested']
+            print(f"🚀 [{datetime.now():%H:%M:%S}] Push su GitHub ({target - state['published']} richieste)...")
+            _publish(dashboard_dir, pending=target - state['published'],
+                     paths=_published_paths(dashboard_dir, state['paths']))
+            # Anche se il push fallisce la richiesta è consumata: il commit resta
+            # locale e parte con il prossimo push (main è avanti rispetto a origin)
+            _consume(state_file, target, set(state['paths']))
+
+
+def _save_written(state_file=PUBLISH_STATE):
+    """
+    A fine processo i file scritti senza una pubblicazione richiesta (un backfill
+    che non cambia la dashboard) restano in coda per il prossimo commit.
+    """
+    written = changes.drain()
+    if written:
+        _update_state(state_file, lambda state: _add_paths(state, written))
+
+
+atexit.register(_save_written)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publisher in background della dashboard Rocketbook")
+    parser.add_argument('--dir', type=Path, default=DASHBOARD_DIR)
+    parser.add_argument('--debounce', type=float, default=PUBLISH_DEBOUNCE)
+    parser.add_argument('--state', type=Path, default=PUBLISH_STATE)
+    args = parser.parse_args(argv)
+    run_publisher(args.dir, args.debounce, args.state)
+    flush_metrics('publisher')
+
+
+if __name__ == '__main__':
+    main()
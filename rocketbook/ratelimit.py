@@ -0,0 +1,235 @@
+"""
+Limiti di quota e retry condivisi per le chiamate Gmail e Drive.
+
+Ogni API ha un token bucket con la quota per utente (unità al secondo);
+ogni metodo consuma le sue unità (es. messages.get = 5 unità Gmail). Le
+risposte 429, 5xx e 403 rateLimitExceeded, e gli errori di rete, vengono
+ritentate con backoff esponenziale con jitter, rispettando Retry-After.
+Un 429 ferma tutto il bucket, non solo la chiamata che l'ha ricevuto.
+I metodi non idempotenti (NON_IDEMPOTENT_METHODS) sono ritentati solo sui
+limiti di quota, che rifiutano la richiesta prima di eseguirla: dopo un 5xx o
+un errore di rete la risorsa può essere stata creata, e ritentare spetta al
+chiamante (es. DriveClient.upload cerca prima il file per nome e md5).
+"""
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from collections import Counter
+
+from rocketbook.config import DRIVE_QUOTA_PER_SECOND, GMAIL_QUOTA_PER_SECOND, MAX_RETRIES
+from rocketbook.metrics import METHOD_STAGES, get_metrics
+
+BACKOFF_BASE = 1.0   # secondi, raddoppiati a ogni tentativo
+BACKOFF_MAX = 64.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# POST che creano una risorsa nuova a ogni chiamata. permissions.create (anyone/reader)
+# e users.watch no: ripetuti restituiscono lo stesso permesso e rinnovano lo stesso watch
+NON_IDEMPOTENT_METHODS = frozenset({'drive.files.create'})
+
+# Unità di quota per metodo (methodId di googleapiclient); gli altri costano 1
+QUOTA_UNITS = {
+    'gmail.users.getProfile': 1,
+    'gmail.users.history.list': 2,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.attachments.get': 5,
+    'gmail.users.watch': 100,
+}
+
+API_RATES = {
+    'gmail': GMAIL_QUOTA_PER_SECOND,
+    'drive': DRIVE_QUOTA_PER_SECOND,
+}
+
+
+class TokenBucket:
+    """
+    Token bucket a prenotazione: reserve() scala subito le unità (il saldo può
+    andare in negativo) e restituisce i secondi da attendere, così chiamanti
+    concorrenti si mettono in fila invece di ricontrollare in loop.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, units=1):
+        with self._lock:
+            self._refill()
+            self._tokens -= units
+            return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds):
+        """Nessuna unità disponibile per `seconds` (es. dopo un 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def error_status(exc):
+    """Status HTTP di un errore googleapiclient o rocketbook.aio; None per errori di rete."""
+    status = getattr(exc, 'status', None) or getattr(getattr(exc, 'resp', None), 'status', None)
+    return int(status) if status is not None else None
+
+
+def _error_body(exc):
+    body = getattr(exc, 'body', None) or getattr(exc, 'content', None) or b''
+    return body if isinstance(body, bytes) else str(body).encode()
+
+
+def is_throttled(exc):
+    """429, o 403 con motivo rateLimitExceeded / userRateLimitExceeded."""
+    status = error_status(exc)
+    return status == 429 or (status == 403 and b'ratelimitexceeded' in _error_body(exc).lower())
+
+
+def is_retryable(exc):
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return is_throttled(exc) or error_status(exc) in RETRY_STATUSES
+
+
+def is_idempotent(method):
+    return method not in NON_IDEMPOTENT_METHODS
+
+
+def retry_after(exc):
+    """Secondi indicati dall'header Retry-After (numero o data HTTP); None se assente."""
+    headers = getattr(exc, 'headers', None) or getattr(exc, 'resp', None) or {}
+    value = headers.get('retry-after') if hasattr(headers, 'get') else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RateLimiter:
+    """
+    Scheduler condiviso: bucket per API, retry con backoff e contatori
+    (calls, throttled, retried, failed) per il riepilogo di fine sync.
+    """
+
+    def __init__(self, rates=None, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX):
+        self.buckets = {api: TokenBucket(rate) for api, rate in (API_RATES if rates is None else rates).items() if rate}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def reserve(self, method, units=None):
+        """Prenota le unità del metodo; secondi da attendere prima della chiamata."""
+        bucket = self.buckets.get((method or '').split('.', 1)[0])
+        if bucket is None:
+            return 0.0
+        return bucket.reserve(QUOTA_UNITS.get(method, 1) if units is None else units)
+
+    def retry_delay(self, attempt):
+        """Backoff esponenziale con jitter per il tentativo `attempt` (da 0); conta il retry."""
+        self._count('retried')
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def backoff(self, method, exc, attempt):
+        """Secondi prima del prossimo tentativo; None se l'errore va propagato."""
+        if (attempt >= self.max_retries or not is_retryable(exc)
+                or not (is_idempotent(method) or is_throttled(exc))):
+            self._count('failed')
+            return None
+        delay = self.retry_delay(attempt)
+        if is_throttled(exc):
+            self._count('throttled')
+            wait = retry_after(exc)
+            if wait is not None:
+                delay = wait + random.uniform(0, self.backoff_base)
+            bucket = self.buckets.get((method or '').split('.', 1)[0])
+            if bucket is not None:
+                bucket.pause(delay)
+        return delay
+
+    def call(self, method, func, units=None):
+        """Esegui func() rispettando la quota; ritenta gli errori temporanei."""
+        metrics = get_metrics()
+        with self._timer(metrics, method):
+            attempt = 0
+            while True:
+                wait = self.reserve(method, units)
+                if wait:
+                    time.sleep(wait)
+                self._count('calls')
+                metrics.count_call(method)
+                try:
+                    return func()
+                except Exception as e:
+                    delay = self.backoff(method, e, attempt)
+                    if delay is None:
+                        raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(self, method, func, units=None):
+        """Come call(), per coroutine: func() restituisce l'awaitable da attendere."""
+        metrics = get_metrics()
+        with self._timer(metrics, method):
+            attempt = 0
+            while True:
+                wait = self.reserve(method, units)
+                if wait:
+                    await asyncio.sleep(wait)
+                self._count('calls')
+                metrics.count_call(method)
+                try:
+                    return await func()
+                except Exception as e:
+                    delay = self.backoff(method, e, attempt)
+                    if delay is None:
+                        raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    @staticmethod
+    def _timer(metrics, method):
+        """Durata della chiamata (attese e retry inclusi) nello stadio del metodo."""
+        stage = METHOD_STAGES.get(method)
+        return metrics.timer(stage) if stage else contextlib.nullcontext()
+
+    def summary(self):
+        s = self.stats
+        return (f"🚦 API: {s['calls']} chiamate, {s['throttled']} limitate, "
+                f"{s['retried']} ritentate, {s['failed']} fallite")
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Scheduler condiviso del processo (creato al primo uso)."""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
@@ -0,0 +1,60 @@
+"""
+Accesso a Gmail API via REST con token di gcloud, senza google-api-python-client.
+Usato da rocketbook_sync.py quando l'autenticazione passa da `gcloud auth`.
+"""
+
+import json
+import subprocess
+import urllib.parse
+import urllib.request
+
+from rocketbook.notes import parse_message
+from rocketbook.settings import max_results as configured_max_results
+
+GMAIL_API = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+
+def get_gcloud_access_token():
+    """Access token dell'account gcloud attivo; None se gcloud non è disponibile."""
+    try:
+        result = subprocess.run(
+            ["gcloud", "auth", "print-access-token"],
+            capture_output=True, text=True, timeout=30
+        )
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _get_json(access_token, url):
+    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {access_token}"})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read().decode())
+
+
+def fetch_gmail_messages(access_token, query, max_results=None):
+    """Cerca i messaggi e restituisci le note corrispondenti."""
+    if max_results is None:
+        max_results = configured_max_results()
+    params = urllib.parse.urlencode({"q": query, "maxResults": max_results})
+    try:
+        data = _get_json(access_token, f"{GMAIL_API}/messages?{params}")
+    except Exception as e:
+        print(f"⚠️ Errore fetch Gmail: {e}")
+        return []
+
+    notes = []
+    for msg in data.get("messages", [])[:max_results]:
+        note = fetch_message_details(access_token, msg["id"])
+        if note:
+            notes.append(note)
+    return notes
+
+
+def fetch_message_details(access_token, msg_id):
+    """Recupera un messaggio e convertilo in nota."""
+    try:
+        return parse_message(_get_json(access_token, f"{GMAIL_API}/messages/{msg_id}"))
+    except Exception as e:
+        print(f"⚠️ Errore dettagli messaggio {msg_id}: {e}")
+        return None
@@ -0,0 +1,218 @@
+"""
+Scheduler in-process (`rocketbook_gmail.py --schedule`): esegue i job di sync
+secondo updateInterval, updateTime e timezone di rocketbook-config.json.
+
+- daily: ogni giorno a updateTime nel fuso `timezone`; hourly o una durata
+  (90s, 15m, 2h): a intervalli regolari dal primo run, senza deriva
+- jitter: secondi casuali aggiunti a ogni run (mai accumulati sull'orario
+  nominale), così più installazioni non chiamano Gmail nello stesso istante
+- niente sovrapposizioni: i job girano uno alla volta nel thread dello
+  scheduler; un run più lungo dell'intervallo salta i tick persi invece di
+  accodarli; un flock per job salta il run se lo stesso job è già in corso
+  in un altro processo (un secondo scheduler, un run manuale con lo stesso lock)
+
+La pianificazione è riletta a ogni run: una modifica al file vale dal run successivo.
+"""
+
+import fcntl
+import random
+import re
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from rocketbook.config import SCHEDULE_LOCK_DIR
+from rocketbook.settings import load_settings
+
+INTERVALS = {'hourly': 3600, 'daily': 86400}
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MAX_DEFAULT_JITTER = 300  # secondi
+
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)\s*([smhd])$')
+_TIME = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+
+def parse_interval(value):
+    """Secondi tra due run: 'daily', 'hourly' o una durata come '90s', '15m', '2h'."""
+    value = str(value).strip().lower()
+    if value in INTERVALS:
+        return INTERVALS[value]
+    match = _DURATION.match(value)
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"updateInterval non valido: {value!r} (daily, hourly o es. 15m)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def parse_time(value):
+    """(ore, minuti) da 'HH:MM'."""
+    match = _TIME.match(str(value).strip())
+    if not match:
+        raise ValueError(f"updateTime non valido: {value!r} (formato HH:MM)")
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_timezone(name):
+    """Fuso orario IANA (es. CET, Europe/Rome); None = ora locale se non disponibile."""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except (ImportError, ValueError, LookupError, OSError) as e:
+        print(f"⚠️ Fuso orario {name!r} non disponibile ({e}), uso l'ora locale")
+        return None
+
+
+class Schedule:
+    """Orari nominali di un job: ogni giorno a un'ora fissa o a intervallo costante."""
+
+    def __init__(self, interval='daily', at='09:00', timezone='CET', jitter=None):
+        self.interval = str(interval).strip().lower()
+        self.period = parse_interval(self.interval)
+        self.at = parse_time(at) if self.interval == 'daily' else None
+        self.tz = get_timezone(timezone) if self.at else None
+        self.jitter = min(self.period * 0.1, MAX_DEFAULT_JITTER) if jitter is None else jitter
+
+    @classmethod
+    def from_settings(cls, settings=None):
+        settings = settings or load_settings()
+        return cls(settings['updateInterval'], settings['updateTime'], settings['timezone'], settings['jitter'])
+
+    def key(self):
+        """Identifica la pianificazione: se cambia, gli orari vanno ricalcolati."""
+        return self.period, self.at, str(self.tz), self.jitter
+
+    def first_run(self, now):
+        if self.at:
+            return self.next_run(now)
+        return now
+
+    def next_run(self, after):
+        """Primo orario nominale successivo a `after` (datetime con fuso)."""
+        if not self.at:
+            return after + timedelta(seconds=self.period)
+        local = after.astimezone(self.tz)
+        candidate = local.replace(hour=self.at[0], minute=self.at[1], second=0, microsecond=0)
+        if candidate <= local:
+            # Stesso tzinfo: la somma è sull'ora locale, con l'ora legale resta alle HH:MM
+            candidate += timedelta(days=1)
+        return candidate
+
+    def delay(self):
+        return random.uniform(0, self.jitter) if self.jitter else 0.0
+
+    def describe(self):
+        if self.at:
+            return f"ogni giorno alle {self.at[0]:02d}:{self.at[1]:02d} ({self.tz or 'ora locale'})"
+        return f"ogni {self.interval}"
+
+
+@contextmanager
+def job_lock(name, lock_dir=SCHEDULE_LOCK_DIR):
+    """Lock non bloccante del job tra processi; restituisce False se è già in corso altrove."""
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    with open(lock_dir / f"{name}.lock", 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _now():
+    return datetime.now(dt_timezone.utc).astimezone()
+
+
+class _Job:
+    def __init__(self, name, func, schedule):
+        self.name = name
+        self.func = func
+        self.schedule = schedule   # Schedule o funzione che la restituisce (riletta a ogni run)
+        self.current = None        # Schedule in uso
+        self.nominal = None        # prossimo orario senza jitter
+        self.due = None            # prossimo orario effettivo (nominale + jitter)
+        self.stats = {'runs': 0, 'skipped': 0, 'busy': 0, 'errors': 0}
+
+    def resolve(self):
+        schedule = self.schedule() if callable(self.schedule) else self.schedule
+        changed = self.current is not None and schedule.key() != self.current.key()
+        self.current = schedule
+        return changed
+
+
+class Scheduler:
+    """Esegue i job registrati con add_job() nel thread chiamante, fino a stop()."""
+
+    def __init__(self, lock_dir=SCHEDULE_LOCK_DIR):
+        self.lock_dir = lock_dir
+        self.jobs = []
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, schedule=Schedule.from_settings):
+        self.jobs.append(_Job(name, func, schedule))
+
+    def stop(self):
+        self._stop.set()
+
+    def _plan(self, job, now):
+        """Prossimo orario del job; i tick già passati (run troppo lungo) vengono saltati."""
+        try:
+            changed = job.resolve()
+        except ValueError as e:
+            # Pianificazione non valida nel file: resta quella precedente
+            if job.current is None:
+                raise
+            print(f"⚠️ {e}, resta la pianificazione precedente")
+            changed = False
+        if job.nominal is None or changed:
+            job.nominal = job.current.first_run(now)
+        else:
+            job.nominal = job.current.next_run(job.nominal)
+            while job.nominal <= now:
+                job.stats['skipped'] += 1
+                job.nominal = job.current.next_run(job.nominal)
+        job.due = job.nominal + timedelta(seconds=job.current.delay())
+        print(f"⏰ {job.name}: prossimo run {job.due:%d/%m %H:%M:%S} ({job.current.describe()})")
+
+    def run_job(self, job):
+        with job_lock(job.name, self.lock_dir) as acquired:
+            if not acquired:
+                job.stats['busy'] += 1
+                print(f"⏭️ {job.name}: già in esecuzione in un altro processo, run saltato")
+                return
+            start = time.perf_counter()
+            try:
+                job.func()
+                job.stats['runs'] += 1
+            except Exception as e:
+                # Un run fallito non ferma lo scheduler: si riprova al prossimo orario
+                job.stats['errors'] += 1
+                print(f"⚠️ {job.name}: run fallito: {e}")
+            print(f"🏁 {job.name}: {time.perf_counter() - start:.1f}s")
+
+    def run(self):
+        """Loop fino a stop() (SIGTERM/SIGINT con install_signal_handlers)."""
+        now = _now()
+        for job in self.jobs:
+            self._plan(job, now)
+        while self.jobs and not self._stop.is_set():
+            job = min(self.jobs, key=lambda j: j.due)
+            wait = (job.due - _now()).total_seconds()
+            if wait > 0:
+                # Attesa a passi brevi: risveglio puntuale anche dopo una sospensione
+                self._stop.wait(min(wait, 60))
+                continue
+            self.run_job(job)
+            self._plan(job, _now())
+        for job in self.jobs:
+            stats = job.stats
+            print(f"🛑 {job.name}: {stats['runs']} run, {stats['errors']} falliti, "
+                  f"{stats['skipped']} tick saltati, {stats['busy']} già in corso altrove")
+
+    def install_signal_handlers(self):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop())
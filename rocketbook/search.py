@@ -0,0 +1,115 @@
+"""
+Ricerca full-text sulle note (titolo, anteprima, testo dei PDF, tag).
+
+Sintassi della query: parole in AND, `parola*` per il prefisso, `tag:Nome` per
+filtrare sui tag. Maiuscole e accenti sono ignorati ("perche" trova "perché").
+Lo store SQLite usa FTS5; lo store journal usa InvertedIndex, tenuto in memoria.
+"""
+
+import bisect
+import re
+import unicodedata
+from collections import namedtuple
+
+_WORD = re.compile(r'\w+')
+
+Query = namedtuple('Query', 'words prefixes tags')
+
+
+def normalize(text):
+    """Minuscolo e senza accenti, come il tokenizer unicode61 di FTS5."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _WORD.findall(normalize(text or ''))
+
+
+def parse_query(text):
+    """Dividi la query in parole esatte, prefissi (`abc*`) e tag (`tag:abc`)."""
+    words, prefixes, tags = [], [], []
+    for part in text.split():
+        if part.lower().startswith('tag:'):
+            tags.extend(tokenize(part[4:]))
+            continue
+        tokens = tokenize(part)
+        if part.endswith('*') and tokens:
+            prefixes.append(tokens.pop())
+        words.extend(tokens)
+    return Query(words, prefixes, tags)
+
+
+def fts_match(query):
+    """Espressione MATCH di FTS5 per la query; None se non ci sono termini."""
+    terms = [f'"{w}"' for w in query.words]
+    terms += [f'"{p}"*' for p in query.prefixes]
+    terms += [f'tags : "{t}"' for t in query.tags]
+    return ' AND '.join(terms) or None
+
+
+def note_tokens(note):
+    """Token indicizzati di una nota: (testo, tag)."""
+    text = set(tokenize(note.get('title')) + tokenize(note.get('preview')) + tokenize(note.get('content')))
+    tags = set(t for tag in note.get('tags') or [] for t in tokenize(tag))
+    return text | tags, tags
+
+
+class InvertedIndex:
+    """Indice invertito incrementale: token -> chiavi delle note."""
+
+    def __init__(self):
+        self._postings = {}   # token -> set(chiavi)
+        self._tags = {}       # token di tag -> set(chiavi)
+        self._by_key = {}     # chiave -> (token, tag) indicizzati, per rimuoverli
+        self._vocabulary = None  # token ordinati per la ricerca per prefisso
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def add(self, key, note):
+        """Indicizza (o reindicizza) una nota."""
+        self.remove(key)
+        tokens, tags = note_tokens(note)
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                self._vocabulary = None
+            self._postings[token].add(key)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self._by_key[key] = (tokens, tags)
+
+    def remove(self, key):
+        tokens, tags = self._by_key.pop(key, ((), ()))
+        for token in tokens:
+            self._postings[token].discard(key)
+        for tag in tags:
+            self._tags[tag].discard(key)
+
+    def _prefix_keys(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        keys = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            keys |= self._postings[token]
+        return keys
+
+    def search(self, query):
+        """Chiavi delle note che soddisfano tutti i termini della query."""
+        candidates = [self._postings.get(w, set()) for w in query.words]
+        candidates += [self._tags.get(t, set()) for t in query.tags]
+        candidates += [self._prefix_keys(p) for p in query.prefixes]
+        if not candidates:
+            return set(self._by_key)
+        # Interseca partendo dall'insieme più piccolo
+        candidates.sort(key=len)
+        keys = set(candidates[0])
+        for other in candidates[1:]:
+            keys &= other
+            if not keys:
+                break
+        return keys
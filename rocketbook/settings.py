@@ -0,0 +1,98 @@
+"""
+Impostazioni di rocketbook-config.json: query Gmail, numero di email e pianificazione del sync.
+
+Il file viene letto al primo uso, non all'import. Poi viene riletto solo se cambia su disco
+(stessa cache per mtime di dashboard.get_template), così scheduler e daemon vedono le modifiche
+senza riavvio. Le chiavi mancanti o non valide prendono il default. ROCKETBOOK_MAX_RESULTS, se
+impostata, prevale sul file.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from rocketbook.config import MAX_RESULTS, ROCKETBOOK_SENDER, SETTINGS_FILE
+
+DEFAULT_SETTINGS = {
+    'gmailQuery': f"from:{ROCKETBOOK_SENDER} has:attachment filename:pdf",
+    'recentDays': 30,           # finestra del sync della dashboard (newer_than), 0 = nessuna
+    'maxResults': 10,
+    'updateInterval': 'daily',  # daily, hourly o una durata: 90s, 15m, 2h
+    'updateTime': '09:00',      # solo per daily, nel fuso `timezone`
+    'timezone': 'CET',
+    'jitter': None,             # secondi casuali aggiunti a ogni run; None = 10% dell'intervallo, max 5 min
+}
+
+# Impostazioni già lette per path, valide finché il file non cambia
+_settings = {}
+_lock = threading.Lock()
+
+
+def _stat_key(path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _valid(key, value):
+    default = DEFAULT_SETTINGS[key]
+    if key in ('maxResults', 'recentDays'):
+        return isinstance(value, int) and not isinstance(value, bool) and value >= (key == 'maxResults')
+    if key == 'jitter':
+        return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0)
+    return isinstance(value, type(default)) and bool(value.strip())
+
+
+def _parse(path):
+    """Legge il file e completa con i default; file assente o illeggibile = soli default."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        if not isinstance(raw, dict):
+            raise ValueError("atteso un oggetto JSON")
+    except FileNotFoundError:
+        return settings
+    except (OSError, ValueError) as e:
+        print(f"⚠️ {path} illeggibile, uso i valori di default: {e}")
+        return settings
+
+    for key, value in raw.items():
+        if key not in DEFAULT_SETTINGS:
+            continue
+        if _valid(key, value):
+            settings[key] = value
+        else:
+            print(f"⚠️ {path.name}: valore non valido per {key} ({value!r}), uso {DEFAULT_SETTINGS[key]!r}")
+    return settings
+
+
+def load_settings(path=None):
+    """Impostazioni correnti (dict); rilegge il file solo se è cambiato su disco."""
+    path = Path(path or SETTINGS_FILE)
+    key = _stat_key(path)
+    with _lock:
+        cached = _settings.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        settings = _parse(path)
+        if MAX_RESULTS is not None:
+            settings['maxResults'] = MAX_RESULTS
+        _settings[path] = (key, settings)
+        return settings
+
+
+def gmail_query(recent=False, settings=None):
+    """Query Gmail delle scansioni; con recent=True limitata agli ultimi `recentDays` giorni."""
+    settings = settings or load_settings()
+    query = settings['gmailQuery']
+    if recent and settings['recentDays']:
+        query = f"{query} newer_than:{settings['recentDays']}d"
+    return query
+
+
+def max_results(settings=None):
+    """Email elaborate per sync (maxResults, o ROCKETBOOK_MAX_RESULTS)."""
+    return (settings or load_settings())['maxResults']
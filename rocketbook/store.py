@@ -0,0 +1,128 @@
+"""
+Persistenza delle note.
+Lo storico completo vive nello store (SQLite, vedi rocketbook.db, oppure
+snapshot + journal JSONL, vedi rocketbook.journal); i file JSON
+della dashboard (rocketbook_data.json, rocketbook_notes.json) sono esportazioni
+delle note più recenti, scritte in modo atomico (file temporaneo + rename).
+"""
+
+import json
+import os
+import threading
+
+from rocketbook import changes
+from rocketbook.config import DATA_FILE, EXPORT_LIMIT, JOURNAL_DIR, NOTES_DB, NOTES_FILE, STORE_BACKEND
+from rocketbook.notes import normalize_note
+from rocketbook.search import parse_query
+
+SEARCH_LIMIT = 20  # risultati mostrati da `rocketbook_cli.py search`
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def load_notes(path):
+    """Carica le note da `path` nello schema unico; lista vuota se il file manca."""
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [normalize_note(note) for note in json.load(f)]
+
+
+def save_notes(path, notes):
+    """Salva le note in `path` in modo atomico."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(notes, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, path)
+    changes.record(path)
+
+
+def note_key(note):
+    """Chiave univoca di una nota: id del messaggio, o titolo+data per le note manuali."""
+    return note.get('id') or f"{note['title']}|{note['date']}"
+
+
+def attachment_key(note):
+    """Chiave per le note Drive: una nota per allegato dello stesso messaggio."""
+    attachments = note.get('attachments') or []
+    if attachments:
+        return f"{note_key(note)}/{attachments[0]['filename']}"
+    return note_key(note)
+
+
+# Collezione -> (file JSON esportato per la dashboard, chiave univoca)
+COLLECTIONS = {
+    'dashboard': (DATA_FILE, note_key),
+    'drive': (NOTES_FILE, attachment_key),
+}
+
+
+def open_note_store(backend=STORE_BACKEND):
+    """Apri lo store del backend scelto ("sqlite" o "journal")."""
+    if backend == 'journal':
+        from rocketbook.journal import JournalNoteStore
+        return JournalNoteStore(JOURNAL_DIR)
+    if backend == 'sqlite':
+        from rocketbook.db import SQLiteNoteStore
+        return SQLiteNoteStore(NOTES_DB)
+    raise ValueError(f"Backend store sconosciuto: {backend!r} (usa 'sqlite' o 'journal')")
+
+
+def get_note_store(backend=STORE_BACKEND):
+    """
+    Store condiviso del processo. Alla prima apertura importa i JSON esistenti
+    nelle collezioni vuote, così lo storico già salvato non va perso.
+    """
+    with _stores_lock:
+        if backend not in _stores:
+            store = open_note_store(backend)
+            for collection, (json_file, key) in COLLECTIONS.items():
+                if store.count(collection) == 0 and json_file.exists():
+                    store.upsert(collection, load_notes(json_file), key)
+            _stores[backend] = store
+        return _stores[backend]
+
+
+def upsert_notes(collection, notes, store=None):
+    """Salva le note nello storico della collezione (inserimento o aggiornamento)."""
+    if store is None:
+        store = get_note_store()
+    return store.upsert(collection, notes, COLLECTIONS[collection][1])
+
+
+def add_note(collection, note, store=None):
+    """Aggiungi una nota allo storico; False se esiste già (stesso titolo e data)."""
+    if store is None:
+        store = get_note_store()
+    return store.add(collection, note, COLLECTIONS[collection][1])
+
+
+def recent_notes(collection, limit=EXPORT_LIMIT, store=None):
+    """Le `limit` note più recenti della collezione (None = tutto lo storico)."""
+    if store is None:
+        store = get_note_store()
+    return store.recent(collection, limit)
+
+
+def search_notes(text, collection=None, limit=SEARCH_LIMIT, store=None):
+    """
+    Cerca nelle note (una collezione o tutte) con la sintassi di rocketbook.search.
+    Restituisce coppie (collezione, nota) dalla più recente.
+    """
+    if store is None:
+        store = get_note_store()
+    query = parse_query(text)
+    results = []
+    for name in ([collection] if collection else COLLECTIONS):
+        results.extend((name, note) for note in store.search(name, query, limit))
+    results.sort(key=lambda r: r[1].get('date_iso') or '', reverse=True)
+    return results[:limit] if limit is not None else results
+
+
+def export_notes(collection, limit=EXPORT_LIMIT, store=None):
+    """Esporta le note più recenti nel JSON della collezione; restituisce le note esportate."""
+    notes = recent_notes(collection, limit, store)
+    save_notes(COLLECTIONS[collection][0], notes)
+    return notes
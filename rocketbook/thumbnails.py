@@ -0,0 +1,245 @@
+"""
+Miniature della prima pagina dei PDF per la griglia Rocketbook della dashboard.
+
+I file stanno in rocketbook_thumbs/ nella checkout (pubblicati con la pagina),
+con nome dato dall'hash del PDF: una miniatura viene rigenerata solo se il
+contenuto del PDF cambia. Renderer, dal migliore disponibile:
+
+1. PyMuPDF (`pip install pymupdf`)
+2. `pdftoppm` (poppler-utils)
+3. l'immagine JPEG incorporata nella prima pagina (le scansioni Rocketbook ne
+   hanno una), ridimensionata con Pillow; senza Pillow è usata così com'è
+   solo se è già delle dimensioni di una miniatura (non la scansione intera)
+
+Con Pillow installato le miniature sono WebP, altrimenti PNG (o JPEG per il caso 3).
+Un PDF senza miniatura viene ritentato dopo THUMB_RETRY secondi, o subito se
+cambiano i renderer installati (es. Pillow o pdftoppm aggiunti dopo il primo run).
+"""
+
+import importlib.util
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+from rocketbook import changes
+from rocketbook.config import THUMB_DIR, THUMB_INDEX, THUMB_WORKERS
+from rocketbook.pdftext import file_sha256
+from rocketbook.pipeline import process_map
+
+THUMB_WIDTH = 240               # 2x la colonna minima della griglia (130px, aspect 3/4)
+RAW_JPEG_MAX_BYTES = 200 * 1024  # senza Pillow, JPEG incorporati più grandi vengono saltati
+RAW_JPEG_MAX_WIDTH = THUMB_WIDTH * 2  # ...e anche quelli più larghi (scansioni a piena risoluzione)
+THUMB_RETRY = 24 * 3600         # secondi prima di ritentare un PDF senza miniatura
+
+_IMAGE_STREAM = re.compile(rb'/Subtype\s*/Image[^>]*?/DCTDecode[^>]*>>\s*stream\r?\n|'
+                           rb'/DCTDecode[^>]*?/Subtype\s*/Image[^>]*>>\s*stream\r?\n')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def jpeg_size(data):
+    """(larghezza, altezza) dal marker SOF di un JPEG; None se non trovato."""
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def png_size(data):
+    """(larghezza, altezza) dall'header IHDR di un PNG."""
+    return struct.unpack('>II', data[16:24])
+
+
+def _to_webp(data):
+    """Ridimensiona a THUMB_WIDTH e converti in WebP; None se Pillow manca."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((THUMB_WIDTH, THUMB_WIDTH * 2))
+    out = io.BytesIO()
+    image.convert('RGB').save(out, 'WEBP', quality=75)
+    return out.getvalue(), 'webp', image.size
+
+
+def _render_pymupdf(path):
+    import fitz
+
+    with fitz.open(path) as doc:
+        page = doc[0]
+        zoom = THUMB_WIDTH / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return pixmap.tobytes('png'), 'png', (pixmap.width, pixmap.height)
+
+
+def _render_pdftoppm(path):
+    if not shutil.which('pdftoppm'):
+        return None
+    with tempfile.TemporaryDirectory() as workdir:
+        prefix = os.path.join(workdir, 'thumb')
+        subprocess.run(['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+                        '-scale-to-x', str(THUMB_WIDTH), '-scale-to-y', '-1', path, prefix],
+                       check=True, capture_output=True, timeout=60)
+        with open(prefix + '.png', 'rb') as f:
+            data = f.read()
+    return data, 'png', png_size(data)
+
+
+def _embedded_jpeg(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    match = _IMAGE_STREAM.search(data)
+    if not match:
+        return None
+    end = data.find(b'endstream', match.end())
+    jpeg = data[match.end():end].rstrip(b'\r\n')
+    size = jpeg_size(jpeg)
+    if size is None:
+        return None
+    return jpeg, 'jpg', size
+
+
+def render_thumbnail(path):
+    """
+    Miniatura della prima pagina: (bytes, estensione, (larghezza, altezza)) o None.
+    Gira nei processi del pool.
+    """
+    try:
+        try:
+            rendered = _render_pymupdf(path)
+        except ImportError:
+            rendered = _render_pdftoppm(path) or _embedded_jpeg(path)
+        if rendered is None:
+            return None
+        webp = _to_webp(rendered[0])
+        if webp:
+            return webp
+        if rendered[1] == 'jpg':
+            # Senza Pillow il JPEG non si ridimensiona: solo se è già piccolo, mostrato a THUMB_WIDTH
+            data, ext, (width, height) = rendered
+            if len(data) > RAW_JPEG_MAX_BYTES or width > RAW_JPEG_MAX_WIDTH:
+                return None
+            if width > THUMB_WIDTH:
+                rendered = data, ext, (THUMB_WIDTH, round(height * THUMB_WIDTH / width))
+        return rendered
+    except Exception as e:
+        print(f"⚠️ Miniatura non generata per {os.path.basename(path)}: {e}")
+        return None
+
+
+def available_renderers():
+    """Renderer installati, per ritentare subito le miniature fallite quando cambiano."""
+    found = [name for name, module in (('pymupdf', 'fitz'), ('pillow', 'PIL')) if importlib.util.find_spec(module)]
+    if shutil.which('pdftoppm'):
+        found.append('pdftoppm')
+    return found
+
+
+def _needs_render(entry, thumb_dir, renderers, now):
+    if entry is None:
+        return True
+    if entry['file']:
+        return not (thumb_dir / entry['file']).exists()
+    # Nessuna miniatura l'ultima volta (download troncato, renderer mancante): non a ogni sync
+    return entry.get('renderers') != renderers or now - entry.get('failed', 0) >= THUMB_RETRY
+
+
+def _load_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = {}
+            if THUMB_INDEX.exists():
+                try:
+                    with open(THUMB_INDEX) as f:
+                        _index = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Indice miniature illeggibile, verrà ricreato: {e}")
+        return _index
+
+
+def _save_index(index):
+    THUMB_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = THUMB_INDEX.with_name(f".{THUMB_INDEX.name}.tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_file, THUMB_INDEX)
+
+
+def make_thumbnails(paths, workers=THUMB_WORKERS, thumb_dir=THUMB_DIR):
+    """
+    Miniature dei PDF: {path: {'src', 'width', 'height'}} (solo quelli riusciti).
+    I PDF già visti (per hash) con la miniatura ancora su disco non vengono
+    riletti; i nuovi sono renderizzati in parallelo su `workers` processi.
+    """
+    index = _load_index()
+    hashes = {path: file_sha256(path) for path in set(map(str, paths))}
+    renderers = available_renderers()
+    now = time.time()
+
+    missing = {}
+    for path, sha256 in hashes.items():
+        if _needs_render(index.get(sha256), thumb_dir, renderers, now):
+            missing.setdefault(sha256, path)
+
+    if missing:
+        thumb_dir.mkdir(parents=True, exist_ok=True)
+        rendered = process_map(render_thumbnail, list(missing.values()), workers)
+        created = 0
+        for sha256, result in zip(missing, rendered):
+            if result is None:
+                index[sha256] = {'file': None, 'failed': now, 'renderers': renderers}
+                continue
+            data, ext, (width, height) = result
+            name = f"{sha256[:16]}.{ext}"
+            tmp_file = thumb_dir / f".{name}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, thumb_dir / name)
+            changes.record(thumb_dir / name)
+            index[sha256] = {'file': name, 'width': width, 'height': height}
+            created += 1
+        _save_index(index)
+        print(f"🖼️ Miniature generate: {created}/{len(missing)} ({len(hashes) - len(missing)} già pronte)")
+
+    thumbs = {}
+    for path, sha256 in hashes.items():
+        entry = index.get(sha256)
+        if entry and entry['file'] and (thumb_dir / entry['file']).exists():
+            thumbs[path] = {
+                'src': f"{thumb_dir.name}/{entry['file']}",
+                'width': entry['width'],
+                'height': entry['height'],
+            }
+    return thumbs
+
+
+def attach_thumbnails(notes, paths, workers=THUMB_WORKERS):
+    """
+    Aggiungi a ogni nota la miniatura del suo primo PDF.
+    `paths` mappa (message_id, filename) -> path locale del PDF.
+    """
+    thumbs = make_thumbnails(set(paths.values()), workers)
+    for note in notes:
+        for att in note.get('attachments', []):
+            path = paths.get((att['message_id'], att['filename']))
+            if path is not None and str(path) in thumbs:
+                note['thumbnail'] = thumbs[str(path)]
+                break
+    return notes
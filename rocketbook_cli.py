@@ -4,198 +4,53 @@ Rocketbook-Gmail Integration via Gmail API
 Versione semplificata che usa OAuth2 o Service Account
 """
 
-import os
-import json
-import pickle
-from datetime import datetime
-from pathlib import Path
+import sys
 
-# Configurazione
-DASHBOARD_DIR = Path("/tmp/daily-brief-ghpages")
-INDEX_FILE = DASHBOARD_DIR / "index.html"
-DATA_FILE = DASHBOARD_DIR / "rocketbook_data.json"
-CREDENTIALS_FILE = DASHBOARD_DIR / "gmail_credentials.json"
-TOKEN_FILE = DASHBOARD_DIR / "gmail_token.pickle"
+from rocketbook.config import EXPORT_LIMIT
+from rocketbook.metrics import flush as flush_metrics
+from rocketbook.notes import make_note
+from rocketbook.profiling import PROFILE_MODES, profiled
+from rocketbook.settings import gmail_query
+from rocketbook import store
 
-def load_rocketbook_data():
-    """Carica dati Rocketbook salvati o crea struttura vuota."""
-    if DATA_FILE.exists():
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    return []
+# Dashboard e pubblicazione sono importate solo dai comandi che scrivono o pubblicano:
+# `list` e `search` leggono lo storico e basta
 
-def save_rocketbook_data(notes):
-    """Salva dati Rocketbook."""
-    with open(DATA_FILE, 'w') as f:
-        json.dump(notes, f, indent=2)
-
-def update_dashboard_html(notes):
-    """Aggiorna il file HTML della dashboard."""
-    if not INDEX_FILE.exists():
-        print(f"❌ File {INDEX_FILE} non trovato")
-        return False
-    
-    with open(INDEX_FILE, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Genera HTML note
-    if notes:
-        html = generate_notes_grid(notes)
-    else:
-        html = generate_empty_state()
-    
-    # Sostituisci sezione rocketbook-container
-    import re
-    
-    # Pattern per trovare il contenuto del div rocketbook-container
-    pattern = r'(<div id="rocketbook-container">)(.*?)(</div>\s*</div>\s*</div>\s*<footer>)'
-    
-    # Nuovo contenuto - nota: manteniamo il div di chiusura corretto
-    new_section = f'''\1
-{html}
-\3'''
-    
-    content = re.sub(pattern, new_section, content, flags=re.DOTALL)
-    
-    # Aggiorna contatore
-    content = re.sub(
-        r'(<div class="kpi-value" id="rocketbook-count">)\d+(</div>)',
-        r'\g<1>' + str(len(notes)) + r'\g<2>',
-        content
-    )
-
-    # Aggiorna timestamp
-    now = datetime.now().strftime("%d/%m/%Y %H:%M")
-    content = re.sub(
-        r'(<span id="last-updated">).*?(</span>)',
-        r'\g<1>' + now + r'\g<2>',
-        content
-    )
-    
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"✅ Dashboard aggiornata con {len(notes)} note")
-    return True
-
-def generate_notes_grid(notes):
-    """Genera griglia HTML per le note."""
-    items = []
-    for note in notes[:6]:  # Max 6 note
-        url = note.get('url', '#')
-        title = note.get('title', 'Nota senza titolo')
-        date = note.get('date', 'Data sconosciuta')
-        
-        items.append(f'''            <a href="{url}" target="_blank" class="rocketbook-item">
-                <div class="rocketbook-thumb">📝</div>
-                <div class="rocketbook-info">
-                    <div class="rocketbook-title">{title}</div>
-                    <div class="rocketbook-date">{date}</div>
-                </div>
-            </a>''')
-    
-    return f'''            <div class="rocketbook-grid">
-{'\n'.join(items)}
-            </div>'''
-
-def generate_empty_state():
-    """Genera stato vuoto."""
-    return '''            <div class="rocketbook-empty">
-                <div class="rocketbook-empty-icon">📭</div>
-                <div>Nessuna scansione recente</div>
-                <div style="font-size: 0.8rem; margin-top: 8px;">Le note da Anselmo Acquah via Rocketbook appariranno qui</div>
-            </div>'''
+def load_rocketbook_data(limit=EXPORT_LIMIT):
+    """Note Rocketbook più recenti dallo storico (limit=None: tutte)."""
+    return store.recent_notes('dashboard', limit)
 
 def add_note(title, date=None, url=None):
     """Aggiungi una nota manualmente."""
-    notes = load_rocketbook_data()
-    
-    if date is None:
-        date = datetime.now().strftime("%d %b %Y")
-    
-    note = {
-        "title": title,
-        "date": date,
-        "url": url or "#",
-        "added": datetime.now().isoformat()
-    }
-    
-    # Evita duplicati
-    for existing in notes:
-        if existing["title"] == title and existing["date"] == date:
-            print(f"⚠️ Nota '{title}' già esistente")
-            return
+    from rocketbook.dashboard import update_dashboard
+
+    note = make_note(title, date, url=url, tags=["Rocketbook", "Manuale"])
     
-    notes.insert(0, note)  # Aggiungi in cima
-    notes = notes[:10]  # Mantieni solo ultime 10
+    # Evita duplicati; lo storico è completo, la dashboard mostra le più recenti
+    if not store.add_note('dashboard', note):
+        print(f"⚠️ Nota '{title}' già esistente")
+        return
     
-    save_rocketbook_data(notes)
-    update_dashboard_html(notes)
+    update_dashboard(store.export_notes('dashboard'))
     print(f"✅ Aggiunta nota: {title}")
 
 def sync_from_gmail():
     """Sincronizza da Gmail (placeholder per futura implementazione API)."""
+    from rocketbook.dashboard import update_dashboard
+
     print("🔄 Sincronizzazione da Gmail...")
     print("⚠️ Richiede configurazione OAuth2 Gmail API")
-    print("📧 Cercare email da: notes@email.getrocketbook.com")
+    print(f"📧 Cercare email con: {gmail_query()}")
     
     # Placeholder: in produzione, implementare chiamata API Gmail
     # Per ora usa i dati esistenti
     notes = load_rocketbook_data()
-    update_dashboard_html(notes)
+    if update_dashboard(notes):
+        store.export_notes('dashboard')
     return notes
 
-def push_to_github():
-    """Pusha modifiche su GitHub."""
-    import subprocess
-    
-    os.chdir(DASHBOARD_DIR)
-    
-    # Configura git
-    subprocess.run(["git", "config", "user.email", "bot@dailybrief.local"], 
-                   capture_output=True, check=False)
-    subprocess.run(["git", "config", "user.name", "Daily Brief Bot"], 
-                   capture_output=True, check=False)
-    
-    # Stage
-    result = subprocess.run(["git", "add", "-A"], capture_output=True, text=True)
-    
-    # Commit
-    result = subprocess.run(
-        ["git", "commit", "-m", f"🔄 Aggiornamento Rocketbook - {datetime.now().strftime('%Y-%m-%d %H:%M')}"],
-        capture_output=True, text=True
-    )
-    
-    if result.returncode != 0 and "nothing to commit" not in result.stderr.lower():
-        print(f"⚠️ Commit: {result.stderr}")
-        return False
-    
-    # Push con token da variabile d'ambiente
-    env = os.environ.copy()
-    env["GIT_ASKPASS"] = "echo"
-    env["GIT_USERNAME"] = "x-access-token"
-    env["GIT_PASSWORD"] = os.environ.get("GITHUB_TOKEN", "")
-    
-    if not env["GIT_PASSWORD"]:
-        print("❌ GITHUB_TOKEN non impostato")
-        return False
-    
-    result = subprocess.run(
-        ["git", "push", "origin", "main"],
-        capture_output=True, text=True, env=env
-    )
-    
-    if result.returncode == 0:
-        print("✅ Push su GitHub completato")
-        return True
-    else:
-        print(f"❌ Push fallito: {result.stderr}")
-        return False
-
-def main():
-    """Funzione principale."""
-    import sys
-    
+def run_command():
+    """Esegue il comando indicato in sys.argv."""
     print("🚀 Rocketbook Sync Tool")
     print("=" * 50)
     
@@ -208,20 +63,41 @@ def main():
             date = sys.argv[3] if len(sys.argv) > 3 else None
             url = sys.argv[4] if len(sys.argv) > 4 else None
             add_note(title, date, url)
-            push_to_github()
+            # In coda: più `add` ravvicinati finiscono in un solo commit
+            from rocketbook.publish import request_publish
+            request_publish()
+            flush_metrics('cli')
             
         elif cmd == "sync":
             # Sincronizza da Gmail
             sync_from_gmail()
+            from rocketbook.publish import push_to_github
             push_to_github()
+            flush_metrics('cli')
+            
+        elif cmd == "search" and len(sys.argv) >= 3:
+            # Cerca: python rocketbook_cli.py search "riunione proget* tag:Manuale"
+            text = " ".join(sys.argv[2:])
+            results = store.search_notes(text)
+            print(f"\n🔎 Risultati per '{text}' ({len(results)}):")
+            for i, (collection, note) in enumerate(results, 1):
+                print(f"  {i}. {note['title']} ({note['date']}) [{collection}]")
+            
+        elif cmd == "compact":
+            # Compatta lo storico (snapshot + journal, o checkpoint del WAL)
+            count = store.get_note_store().compact()
+            print(f"🗜️ Storico compattato: {count} note")
             
         elif cmd == "push":
-            # Solo push
-            push_to_github()
+            # Solo push (immediato, svuota anche la coda); ripubblica anche i file modificati a mano
+            from rocketbook.publish import push_to_github
+            push_to_github(rescan=True)
+            flush_metrics('cli')
             
         elif cmd == "list":
-            # Lista note
-            notes = load_rocketbook_data()
+            # Lista note: python rocketbook_cli.py list [quante | all]
+            limit = sys.argv[2] if len(sys.argv) > 2 else EXPORT_LIMIT
+            notes = load_rocketbook_data(None if limit == "all" else int(limit))
             print(f"\n📓 Note Rocketbook ({len(notes)}):")
             for i, note in enumerate(notes, 1):
                 print(f"  {i}. {note['title']} ({note['date']})")
@@ -230,13 +106,32 @@ def main():
             print("  add 'Titolo' [data] [url]  - Aggiungi nota")
             print("  sync                       - Sincronizza da Gmail")
             print("  push                       - Push su GitHub")
-            print("  list                       - Lista note")
+            print("  compact                    - Compatta lo storico delle note")
+            print("  list [n|all]               - Lista note (default ultime 10)")
+            print("  search 'parole pre* tag:X' - Cerca in titoli, anteprime e tag")
     else:
         # Default: sync + push
         sync_from_gmail()
+        from rocketbook.publish import push_to_github
         push_to_github()
+        flush_metrics('cli')
     
     print("=" * 50)
 
+def main():
+    """
+    Funzione principale; `--profile[=cprofile|sample]` e `--profile-memory` in qualsiasi
+    posizione profilano il comando.
+    """
+    flags = [arg for arg in sys.argv[1:] if arg.split("=", 1)[0] == "--profile"]
+    profile = (flags[-1].partition("=")[2] or "cprofile") if flags else None
+    if profile and profile not in PROFILE_MODES:
+        print(f"❌ --profile: modalità sconosciuta '{profile}' (usa {' o '.join(PROFILE_MODES)})")
+        return
+    memory = "--profile-memory" in sys.argv[1:]
+    sys.argv = [arg for arg in sys.argv if arg not in flags and arg != "--profile-memory"]
+    with profiled(profile, "cli", memory=memory):
+        run_command()
+
 if __name__ == "__main__":
     main()